@@ -1,4 +1,20 @@
 """Provide CLI."""
 
-from . import autogen, configs, info, install, list, merge, run, update
+from . import (
+    autogen,
+    client,
+    configs,
+    constraints,
+    diff,
+    info,
+    install,
+    list,
+    merge,
+    queue,
+    run,
+    serve,
+    slim,
+    update,
+    worker,
+)
 from ._base import command
@@ -37,6 +37,7 @@ def command(cfg):
     # set all the other defaults, they might depend on paths
     configs.configs["paths"] = configs.paths(configs.configs["paths"])
     configs.configs["commands"] = configs.commands(configs.configs["paths"])
+    configs.configs["resources"] = configs.resources()
 
     # final update
     configs.nestupdate(configs.configs, base_configs)
@@ -1,22 +1,25 @@
 """Autogenerate pinecards from NNPDF metadata."""
 
+import concurrent.futures
+
 import click
 import rich
 
 from .. import configs
-from ..external.nnlojet import generate_pinecard_from_nnpdf
+from ..external.nnlojet import expand_datasets, generate_pinecard_from_nnpdf
 from ._base import command
 
 
 @command.command("autogen")
-@click.argument("dataset", nargs=1)
+@click.argument("datasets", nargs=-1, required=True)
 @click.option(
     "--target",
     help="Target program. Currently only NNLOJET supported",
     default="NNLOJET",
 )
 @click.option(
-    "--name", help="Name of the pinecard (NNLOJET_<name>), defaults to name=dataset"
+    "--name",
+    help="Name of the pinecard (NNLOJET_<name>), defaults to name=dataset (single dataset only)",
 )
 @click.option(
     "--select-obs",
@@ -24,18 +27,64 @@ from ._base import command
     type=str,
     nargs=2,
 )
-def runcards(dataset, target, select_obs=None, name=None):
-    """Generate a runcard from an NNPDF dataset."""
-    if name is None:
-        name = dataset.upper()
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of worker processes (default: the configured core budget)",
+)
+def runcards(datasets, target, select_obs=None, name=None, jobs=None):
+    """Generate runcards from NNPDF datasets.
 
-    output = configs.configs["paths"]["runcards"] / f"{target}_{name}"
+    DATASETS are NNPDF dataset names, or shell-style patterns matching them
+    (e.g. 'LHCB_Z0_*').
+    """
+    cache = configs.configs["paths"]["cache"]
+    datasets = expand_datasets(datasets, cache=cache)
 
-    if target == "NNLOJET":
-        output_runcards = generate_pinecard_from_nnpdf(
-            dataset, output_path=output, observables=select_obs
-        )
+    if name is not None and len(datasets) > 1:
+        raise click.UsageError("--name can only be used with a single dataset")
+    if jobs is None:
+        jobs = configs.cores()
+
+    outputs = {
+        dataset: configs.configs["paths"]["runcards"]
+        / f"{target}_{name or dataset.upper()}"
+        for dataset in datasets
+    }
+
+    output_runcards = []
+    failures = {}
+    with concurrent.futures.ProcessPoolExecutor(min(jobs, len(datasets))) as pool:
+        futures = {
+            pool.submit(main, dataset, target, output, select_obs, cache): dataset
+            for dataset, output in outputs.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                output_runcards.extend(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                failures[futures[future]] = e
 
     rich.print("Pinecards written to: ")
-    rich.print("    " + "\n".join(str(i) for i in output_runcards))
+    rich.print("    " + "\n    ".join(str(i) for i in sorted(output_runcards)))
     rich.print("metadata.txt might be empty or incomplete, please modifiy it manually")
+
+    if failures:
+        rich.print(f"[red]Failed for {len(failures)} datasets:[/]")
+        for dataset, error in failures.items():
+            rich.print(f"    {dataset}: {error!r}")
+        raise click.ClickException(
+            f"{len(failures)} of {len(datasets)} datasets failed: "
+            + ", ".join(sorted(failures))
+        )
+
+
+def main(dataset, target, output, select_obs=None, cache=None):
+    """Generate the runcards for a single dataset."""
+    if target == "NNLOJET":
+        return generate_pinecard_from_nnpdf(
+            dataset, output_path=output, observables=select_obs, cache=cache
+        )
+    raise ValueError(f"Target '{target}' not supported")
@@ -0,0 +1,172 @@
+"""Send requests to the service."""
+
+import pathlib
+
+import click
+import rich
+import rich.table
+
+from .. import ipc, tools
+from ._base import command
+from .serve import socket_path
+
+
+def _absolute(path):
+    """Resolve a path for the service, which has a different working directory."""
+    return str(pathlib.Path(path).absolute())
+
+
+def _request(ctx, op, **payload):
+    """Send a request to the service listening on the selected socket."""
+    try:
+        return ipc.request(ctx.obj or socket_path(), op, **payload)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise click.ClickException(f"No service is listening ({e})") from e
+    except RuntimeError as e:
+        raise click.ClickException(str(e)) from e
+
+
+@command.group("client")
+@click.option(
+    "--socket",
+    "path",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="Path of the socket of the service",
+)
+@click.pass_context
+def subcommand(ctx, path):
+    """Execute commands through the service started by ``serve``."""
+    ctx.obj = path
+
+
+@subcommand.command()
+@click.argument("pinecard")
+@click.argument("theory-path", type=click.Path(exists=True))
+@click.option(
+    "--pdf",
+    help="PDF to compare the original results to the grid",
+    default="NNPDF40MC_nnlo_as_01180_qed",
+)
+@click.option("--dry", is_flag=True, help="Don't execute the underlying code")
+@click.option(
+    "--finalize",
+    type=click.Path(exists=True),
+    help="Run the postprocess step given a runfolder",
+)
+@click.option(
+    "--slim",
+    type=float,
+    default=None,
+    help="Remove the channels and orders contributing less than the given relative threshold",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rerun all the stages, even if a previous run can be reused",
+)
+@click.option(
+    "--evolve",
+    is_flag=True,
+    help="Evolve the grids into FK tables, after the postprocessing",
+)
+@click.pass_context
+def run(ctx, pinecard, theory_path, pdf, dry, finalize, slim, force, evolve):
+    """Compute the grids of PINECARD, as the ``run`` command."""
+    if pathlib.Path(pinecard).exists():
+        pinecard = _absolute(pinecard)
+    response = _request(
+        ctx,
+        "run",
+        pinecard=pinecard,
+        theory=_absolute(theory_path),
+        pdf=pdf,
+        dry=dry,
+        finalize=None if finalize is None else _absolute(finalize),
+        slim=slim,
+        force=force,
+        evolve=evolve,
+    )
+    print(f"Output stored in {response['output']}")
+
+
+@subcommand.command()
+@click.argument("grids", nargs=-1)
+@click.pass_context
+def merge(ctx, grids):
+    """Merge multiple PineAPPL grids, as the ``merge`` command."""
+    response = _request(
+        ctx, "merge", grids=[_absolute(grid) for grid in grids], output=_absolute(".")
+    )
+    rich.print(f"Grid merged and compressed, stored in '{response['grid']}'.")
+
+
+@subcommand.command()
+@click.argument("datasets", nargs=-1)
+@click.pass_context
+def update(ctx, datasets):
+    """Update datasets metadata, as the ``update`` command."""
+    response = _request(
+        ctx, "update", datasets=[_absolute(dataset) for dataset in datasets]
+    )
+    for path in response["datasets"]:
+        rich.print(f"'{path}'\n\tgrid metadata updated")
+
+
+@subcommand.command()
+@click.argument("grid", type=click.Path(exists=True))
+@click.argument("pdf")
+@click.option(
+    "--scale-variations",
+    is_flag=True,
+    help="Compute the nine points scale variations",
+)
+@click.pass_context
+def convolve(ctx, grid, pdf, scale_variations):
+    """Convolve GRID with the PDF member (``<set>`` or ``<set>/<member>``)."""
+    predictions = _request(
+        ctx,
+        "convolve",
+        grid=_absolute(grid),
+        pdf=pdf,
+        scale_variations=scale_variations,
+    )["predictions"]
+    if scale_variations:
+        central = tools.nine_points.index((1.0, 1.0, 1.0))
+        table = rich.table.Table("bin", "central", "min", "max")
+        for i, values in enumerate(predictions):
+            table.add_row(
+                str(i),
+                f"{values[central]:.6e}",
+                f"{min(values):.6e}",
+                f"{max(values):.6e}",
+            )
+    else:
+        table = rich.table.Table("bin", "prediction")
+        for i, value in enumerate(predictions):
+            table.add_row(str(i), f"{value:.6e}")
+    rich.print(table)
+
+
+@subcommand.command()
+@click.pass_context
+def status(ctx):
+    """Show the requests being executed by the service."""
+    response = _request(ctx, "status", timeout=30.0)
+    table = rich.table.Table("id", "operation", "elapsed")
+    for active in response["active"]:
+        table.add_row(str(active["id"]), active["op"], f"{active['elapsed']:.1f} s")
+    rich.print(table)
+    rich.print(
+        f"{response['served']} requests served in {response['uptime']:.0f} s, "
+        f"up to {response['jobs']} concurrently, "
+        f"PDFs loaded: {', '.join(response['pdfs']) or 'none'}"
+    )
+
+
+@subcommand.command()
+@click.pass_context
+def stop(ctx):
+    """Stop the service, once the requests being executed are completed."""
+    _request(ctx, "shutdown", timeout=30.0)
+    rich.print("Service stopping")
@@ -0,0 +1,105 @@
+"""Generate many positivity and integrability grids at once."""
+
+import pathlib
+import time
+
+import click
+import rich
+import rich.table
+
+from .. import configs, constraints, tools
+from ..external import interface
+from . import run
+from ._base import command
+
+
+@command.command("constraints")
+@click.argument("theory_path", type=click.Path(exists=True))
+@click.argument("cards", nargs=-1)
+@click.option(
+    "--pdf",
+    help="PDF used to check the grids",
+    default="NNPDF40MC_nnlo_as_01180_qed",
+)
+@click.option(
+    "--check/--no-check",
+    default=True,
+    help="Compare the grids to the direct computation with the PDF",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of grids written in parallel (default: resources::cores)",
+)
+def subcommand(theory_path, cards, pdf, check, jobs):
+    """Generate the grids of many positivity and integrability CARDS at once.
+
+    CARDS are pinecards (names or paths) or YAML files, possibly with multiple
+    documents, each with its ``name`` and ``kind`` (``positivity`` or
+    ``integrability``). All the positivity and integrability pinecards are used,
+    if none is given.
+
+    The theory card in THEORY_PATH sets the scale of the integrability grids.
+    """
+    main(cards, run.load_theory(theory_path), pdf if check else None, jobs)
+
+
+def card_paths(cards):
+    """Resolve the cards, as paths or pinecards names."""
+    runcards = configs.configs["paths"]["runcards"]
+    if not cards:
+        return constraints.discover(runcards)
+    return [
+        pathlib.Path(card) if pathlib.Path(card).exists() else runcards / card
+        for card in cards
+    ]
+
+
+def main(cards, theory, pdf=None, jobs=None):
+    """Generate the grids of many cards in a single output folder.
+
+    Parameters
+    ----------
+    cards : list(str)
+        pinecards names or paths, or YAML files
+    theory : dict
+        theory card
+    pdf : str or None
+        PDF used to check the grids (no check if `None`)
+    jobs : int or None
+        number of grids written in parallel
+
+    Returns
+    -------
+    pathlib.Path
+        output folder
+
+    """
+    loaded = constraints.load_cards(card_paths(cards))
+    if pdf is not None:
+        run.install_reqs(interface.External, pdf)
+
+    dest = tools.create_output_folder("constraints", theory["ID"])
+    t0 = time.perf_counter()
+    reports = constraints.generate(loaded, dest, theory, pdf, jobs)
+    print_reports(reports)
+    tools.print_time(t0, f"Generation of {len(reports)} grids")
+
+    print(f"Output stored in {dest}")
+    return dest
+
+
+def print_reports(reports):
+    """Print the summary of the generated grids."""
+    table = rich.table.Table("grid", "kind", "bins", "max rel. difference")
+    for report in reports:
+        difference = report["difference"]
+        table.add_row(
+            report["name"],
+            report["kind"],
+            str(report["bins"]),
+            "-" if difference is None else f"{difference:.2e}",
+        )
+    rich.print(table)
@@ -0,0 +1,377 @@
+"""Compare PineAPPL grids, structurally and numerically."""
+
+import concurrent.futures
+import dataclasses
+import functools
+import itertools
+import pathlib
+
+import click
+import numpy as np
+import pineappl
+import rich
+import rich.table
+
+from .. import configs
+from . import merge
+from ._base import command
+
+SUFFIXES = (".pineappl", ".pineappl.lz4")
+"""Extensions of the grids matched in folders."""
+
+
+@command.command("diff")
+@click.argument("first", type=click.Path(exists=True))
+@click.argument("second", type=click.Path(exists=True))
+@click.option(
+    "--rtol", type=float, default=1e-8, help="Relative tolerance on the values"
+)
+@click.option(
+    "--atol", type=float, default=0.0, help="Absolute tolerance on the values"
+)
+@click.option(
+    "-n",
+    "--max-differences",
+    type=int,
+    default=10,
+    help="Stop comparing a pair after this number of differences (0 for no limit)",
+)
+@click.option(
+    "--ignore-metadata",
+    multiple=True,
+    help="Metadata key not compared (can be repeated)",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of pairs compared in parallel (default: resources::cores)",
+)
+def subcommand(first, second, rtol, atol, max_differences, ignore_metadata, jobs):
+    """Compare the grids FIRST and SECOND.
+
+    FIRST and SECOND can also be folders, in which case the grids with the same
+    name are compared. The comparison covers bins, orders, channels,
+    convolutions, metadata, subgrid nodes and values, and it exits with a
+    failure if any difference is found.
+    """
+    pairs, unmatched = match(pathlib.Path(first), pathlib.Path(second))
+    for path in unmatched:
+        rich.print(f"[yellow]No counterpart for '{path}'[/]")
+
+    reports = main(
+        pairs,
+        rtol=rtol,
+        atol=atol,
+        limit=max_differences or None,
+        ignore=ignore_metadata,
+        jobs=jobs,
+    )
+    print_reports(reports)
+    if unmatched or any(report["differences"] for report in reports):
+        raise SystemExit(1)
+
+
+def _grids(folder):
+    """Grids in a folder, by name."""
+    return {p.name: p for p in folder.iterdir() if p.name.endswith(SUFFIXES)}
+
+
+def match(first, second):
+    """Pair the grids to be compared.
+
+    Parameters
+    ----------
+    first : pathlib.Path
+        grid, or folder of grids
+    second : pathlib.Path
+        grid, or folder of grids (same kind as ``first``)
+
+    Returns
+    -------
+    list(tuple(pathlib.Path, pathlib.Path))
+        pairs of grids
+    list(pathlib.Path)
+        grids only found in one of the folders
+
+    """
+    if first.is_dir() != second.is_dir():
+        raise click.UsageError("Compare either two grids or two folders")
+    if not first.is_dir():
+        return [(first, second)], []
+
+    first_grids, second_grids = _grids(first), _grids(second)
+    pairs = [
+        (first_grids[name], second_grids[name])
+        for name in sorted(first_grids)
+        if name in second_grids
+    ]
+    unmatched = [
+        path
+        for this, other in ((first_grids, second_grids), (second_grids, first_grids))
+        for name, path in sorted(this.items())
+        if name not in other
+    ]
+    return pairs, unmatched
+
+
+@dataclasses.dataclass
+class Difference:
+    """Difference between two grids.
+
+    Parameters
+    ----------
+    kind : str
+        compared property (``bins``, ``orders``, ``channels``,
+        ``convolutions``, ``metadata``, ``nodes`` or ``values``)
+    where : str
+        location of the difference (e.g. bin, or subgrid)
+    detail : str
+        description of the difference
+
+    """
+
+    kind: str
+    where: str
+    detail: str
+
+
+class _Enough(Exception):
+    """Raised when a difference beyond the maximum number is found."""
+
+
+class _Collector:
+    """Collect the differences, up to a maximum number."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.differences = []
+
+    def add(self, kind, where, detail):
+        if self.limit is not None and len(self.differences) >= self.limit:
+            raise _Enough
+        self.differences.append(Difference(kind, where, detail))
+
+
+def _short(value, width=60):
+    """Shorten the representation of a value."""
+    text = repr(value)
+    return text if len(text) <= width else text[: width - 3] + "..."
+
+
+def _listings(found, kind, first, second):
+    """Compare two lists of entries, returning whether they are equal."""
+    if first == second:
+        return True
+    only_first = [entry for entry in first if entry not in second]
+    only_second = [entry for entry in second if entry not in first]
+    if not only_first and not only_second:
+        found.add(kind, "", "same entries, in a different order")
+    else:
+        found.add(
+            kind,
+            "",
+            f"only in the first: {_short(only_first)}, "
+            f"only in the second: {_short(only_second)}",
+        )
+    return False
+
+
+def _bins(found, first, second, rtol, atol):
+    """Compare the bins, returning whether they are the same."""
+    if first.bins() != second.bins():
+        found.add("bins", "", f"{first.bins()} != {second.bins()} bins")
+        return False
+
+    same = True
+    for name in ("bin_limits", "bin_normalizations"):
+        values = [np.asarray(getattr(grid, name)()) for grid in (first, second)]
+        if values[0].shape != values[1].shape:
+            found.add(
+                "bins", "", f"{name}: shapes {values[0].shape} != {values[1].shape}"
+            )
+            same = False
+            continue
+        close = np.isclose(values[0], values[1], rtol=rtol, atol=atol)
+        close = close.reshape(len(close), -1).all(axis=1)
+        for bin_ in np.flatnonzero(~close):
+            found.add(
+                "bins",
+                f"bin {bin_}",
+                f"{name}: {values[0][bin_].tolist()} != {values[1][bin_].tolist()}",
+            )
+            same = False
+    return same
+
+
+def _convolutions(grid):
+    """Hadron and kind of the convolutions of a grid."""
+    return [
+        (conv.pid, conv.convolution_types.polarized, conv.convolution_types.time_like)
+        for conv in grid.convolutions
+    ]
+
+
+def _structure(found, first, second, rtol, atol):
+    """Compare the structure, returning whether the subgrids are comparable."""
+    same = _bins(found, first, second, rtol, atol)
+    same &= _listings(
+        found,
+        "orders",
+        [order.as_tuple() for order in first.orders()],
+        [order.as_tuple() for order in second.orders()],
+    )
+    same &= _listings(found, "channels", first.channels(), second.channels())
+    _listings(found, "convolutions", _convolutions(first), _convolutions(second))
+    return same
+
+
+def _subgrids(found, first, second, rtol, atol):
+    """Compare nodes and values of the subgrids, with the same structure."""
+    orders = [order.as_tuple() for order in first.orders()]
+    for order, bin_, channel in itertools.product(
+        range(len(orders)), range(first.bins()), range(len(first.channels()))
+    ):
+        subgrids = (
+            first.subgrid(order, bin_, channel),
+            second.subgrid(order, bin_, channel),
+        )
+        empty = [subgrid.is_empty() for subgrid in subgrids]
+        if all(empty):
+            continue
+        where = f"order {orders[order]}, bin {bin_}, channel {channel}"
+        if any(empty):
+            which = "first" if empty[0] else "second"
+            found.add("values", where, f"empty only in the {which} grid")
+            continue
+
+        nodes = [[np.asarray(n) for n in subgrid.node_values] for subgrid in subgrids]
+        if [n.shape for n in nodes[0]] != [n.shape for n in nodes[1]] or not all(
+            np.allclose(a, b, rtol=rtol, atol=atol) for a, b in zip(*nodes)
+        ):
+            found.add(
+                "nodes",
+                where,
+                f"shapes {subgrids[0].shape} and {subgrids[1].shape}, "
+                "or values, differ",
+            )
+            continue
+
+        values = [subgrid.to_array(subgrid.shape) for subgrid in subgrids]
+        close = np.isclose(values[0], values[1], rtol=rtol, atol=atol)
+        if not close.all():
+            delta = np.abs(values[0] - values[1])
+            scale = np.maximum(np.abs(values[0]), np.abs(values[1]))
+            relative = np.max(np.divide(delta, scale, where=scale != 0, out=delta))
+            found.add(
+                "values",
+                where,
+                f"{np.count_nonzero(~close)} of {close.size} values differ, "
+                f"max rel. difference {relative:.2e}",
+            )
+
+
+def compare(first, second, rtol=1e-8, atol=0.0, limit=None, ignore=()):
+    """Compare two grids, structurally and numerically.
+
+    The structure (bins, orders, channels and convolutions) and the metadata
+    are compared first, then the nodes and values of each subgrid (only if the
+    bins, orders and channels are the same).
+    The comparison stops at the first difference beyond ``limit``, such that
+    it is only ``truncated`` if there are more than ``limit`` differences.
+
+    Parameters
+    ----------
+    first : os.PathLike
+        first grid
+    second : os.PathLike
+        second grid
+    rtol : float
+        relative tolerance, on the values, nodes and bin limits
+    atol : float
+        absolute tolerance, on the values, nodes and bin limits
+    limit : int or None
+        maximum number of differences (no limit if `None`)
+    ignore : list(str)
+        metadata keys not compared
+
+    Returns
+    -------
+    dict
+        ``first`` and ``second`` grids, ``differences`` found (a list of
+        :class:`Difference`) and whether the comparison was ``truncated``
+
+    """
+    grids = [pineappl.grid.Grid.read(str(path)) for path in (first, second)]
+    found = _Collector(limit)
+    truncated = False
+    try:
+        comparable = _structure(found, *grids, rtol, atol)
+
+        metadata = [grid.metadata for grid in grids]
+        for key, _ in merge.metadata_differences(
+            metadata[0], metadata[1:], ignore=ignore
+        ):
+            found.add(
+                "metadata",
+                key,
+                f"{_short(metadata[0].get(key))} != {_short(metadata[1].get(key))}",
+            )
+
+        if comparable:
+            _subgrids(found, *grids, rtol, atol)
+    except _Enough:
+        truncated = True
+
+    return {
+        "first": first,
+        "second": second,
+        "differences": found.differences,
+        "truncated": truncated,
+    }
+
+
+def main(pairs, rtol=1e-8, atol=0.0, limit=None, ignore=(), jobs=None):
+    """Compare many pairs of grids in parallel.
+
+    Parameters
+    ----------
+    pairs : list(tuple(os.PathLike, os.PathLike))
+        grids to compare
+    jobs : int or None
+        number of worker processes (default: the configured core budget)
+
+    The other parameters are described in :func:`compare`.
+
+    Returns
+    -------
+    list(dict)
+        comparison of each pair, see :func:`compare`
+
+    """
+    function = functools.partial(
+        compare, rtol=rtol, atol=atol, limit=limit, ignore=tuple(ignore)
+    )
+    jobs = min(configs.cores() if jobs is None else jobs, len(pairs))
+    if jobs <= 1:
+        return [function(*pair) for pair in pairs]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(function, *zip(*pairs)))
+
+
+def print_reports(reports):
+    """Print the differences of each pair."""
+    for report in reports:
+        differences = report["differences"]
+        title = f"'{report['first']}' vs '{report['second']}'"
+        if not differences:
+            rich.print(f"[green]Identical[/] {title}")
+            continue
+
+        table = rich.table.Table("kind", "where", "difference", title=title)
+        for difference in differences:
+            table.add_row(difference.kind, difference.where, difference.detail)
+        rich.print(table)
+        if report["truncated"]:
+            rich.print(f"[yellow]Stopped after {len(differences)} differences[/]")
@@ -1,16 +1,51 @@
 """Install utilities."""
 
+import pathlib
+
 import click
 
-from .. import install
+from .. import configs, install, snapshot
 from ._base import command
 
 
-@command.group("install")
-def subcommand():
+@command.group("install", invoke_without_command=True)
+@click.option(
+    "--export-snapshot",
+    type=click.Path(dir_okay=False),
+    help="Pack the prefix in a relocatable snapshot",
+)
+@click.option(
+    "--import-snapshot",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Unpack a snapshot in the prefix",
+)
+@click.pass_context
+def subcommand(ctx, export_snapshot, import_snapshot):
     """Install utilities."""
     install.init_prefix()
 
+    if import_snapshot is not None:
+        manifest = snapshot.load(pathlib.Path(import_snapshot))
+        print(
+            f"✓ Imported snapshot of '{manifest['exported_from']}' "
+            f"in '{manifest['prefix']}'"
+        )
+        for problem in snapshot.problems(manifest, configs.configs["paths"]["prefix"]):
+            print(f"✗ {problem}")
+    if export_snapshot is not None:
+        manifest = snapshot.dump(pathlib.Path(export_snapshot))
+        print(
+            f"✓ Exported {len(manifest['files'])} files to '{export_snapshot}' "
+            f"({len(manifest['relocate'])} to relocate)"
+        )
+
+    if (
+        ctx.invoked_subcommand is None
+        and export_snapshot is None
+        and import_snapshot is None
+    ):
+        click.echo(ctx.get_help())
+
 
 @subcommand.command()
 @click.option("--capi", is_flag=True, default=True, help="install PineAPPL CAPI")
@@ -42,8 +77,33 @@ def lhapdf():
     install.lhapdf()
 
 
+@subcommand.command("all")
+@click.option(
+    "-j", "--jobs", type=int, default=None, help="Concurrent installation steps"
+)
+def all_(jobs):
+    """Install all the programs, building the independent ones concurrently."""
+    install.update_environ()
+    for name, outcome in install.toolchain(
+        ["lhapdf", "pineappl", "mg5amc", "vrap"], jobs=jobs
+    ).items():
+        print(f"{'✓' if outcome else '✗'} {name}")
+
+
 @subcommand.command()
 def nnlojet():
     """Install NNLOJET."""
     install.update_environ()
     install.nnlojet()
+
+
+@subcommand.command()
+@click.argument("names", nargs=-1, required=True)
+@click.option("-j", "--jobs", type=int, default=None, help="Concurrent installations")
+def pdfs(names, jobs):
+    """Install the PDF sets NAMES."""
+    install.update_environ()
+    for name in names:
+        install.lhapdf_conf(name)
+    for name, installed in install.pdfs(names, jobs=jobs).items():
+        print(f"{'✓' if installed else '✗'} {name}")
@@ -1,6 +1,5 @@
 """Merge multiple PineAPPL grids into a single one."""
 
-import itertools
 import pathlib
 import re
 import shutil
@@ -9,7 +8,7 @@ import click
 import pineappl
 import rich
 
-from .. import tools
+from .. import metrics, tools
 from ._base import command
 
 
@@ -20,8 +19,22 @@ def subcommand(grids):
     main(grids)
 
 
-def main(grids):
-    """Merge multiple PineAPPL grids into a single one."""
+def main(grids, output=None):
+    """Merge multiple PineAPPL grids into a single one.
+
+    Parameters
+    ----------
+    grids : list(os.PathLike)
+        grids to be merged
+    output : os.PathLike or None
+        folder of the merged grid (the current one, if `None`)
+
+    Returns
+    -------
+    pathlib.Path
+        merged and compressed grid
+
+    """
     if len(grids) < 2:
         raise ValueError("At least 2 grids needed for a merge.")
 
@@ -29,7 +42,9 @@ def main(grids):
     grids = [pineappl.grid.Grid.read(str(grid)) for grid in grids]
 
     common = tools.common_substring(*(grid.name for grid in grid_paths)).strip("_")
-    mgrid_path = pathlib.Path(common).with_suffix(".pineappl")
+    mgrid_path = pathlib.Path(output or ".") / pathlib.Path(common).with_suffix(
+        ".pineappl"
+    )
     rich.print(f"Merging into -> '{mgrid_path}'")
 
     # merge all grids in a single one
@@ -41,9 +56,7 @@ def main(grids):
         rich.print(f"Merging '{path}'...")
         mgrid.merge_from_file(str(path))
     mgrid.write(str(mgrid_path))
-
-    # get all keys, possibly ones that are exclusive to a single grid
-    keys = set(itertools.chain(*(grid.key_values().keys() for grid in grids)))
+    metrics.inc("merged_bytes_total", sum(p.stat().st_size for p in grid_paths))
 
     # concatenate results
     tmpresults = []
@@ -74,17 +87,43 @@ def main(grids):
     )
     shutil.move(str(mgridtmp), str(mgrid_path))
 
-    mkeys = mgrid.key_values()
-    for key in keys:
-        if key == "results":
-            continue
-
-        mvalue = mkeys.get(key)
-        for grid in grids:
-            if mvalue != grid.key_values().get(key):
-                # TODO: what do we do in this case?
-                rich.print(f"'{key}' differs [gray]for '{grid}'[/]")
+    for key, index in metadata_differences(
+        mgrid.key_values(), [grid.key_values() for grid in grids]
+    ):
+        # TODO: what do we do in this case?
+        rich.print(f"'{key}' differs [gray]for '{grid_paths[index]}'[/]")
 
     cpath = tools.compress(mgrid_path)
     mgrid_path.unlink()
     rich.print(f"Grid merged and compressed, stored in '{cpath}'.")
+    return cpath
+
+
+def metadata_differences(reference, others, ignore=("results",)):
+    """Compare the metadata of grids with a reference.
+
+    All the keys are considered, including the ones exclusive to a single
+    grid.
+
+    Parameters
+    ----------
+    reference : dict
+        reference metadata
+    others : list(dict)
+        metadata to compare
+    ignore : list(str)
+        keys not compared
+
+    Returns
+    -------
+    list(tuple(str, int))
+        differing key, and index of the metadata where it differs
+
+    """
+    keys = set(reference).union(*others) - set(ignore)
+    return [
+        (key, index)
+        for key in sorted(keys)
+        for index, other in enumerate(others)
+        if reference.get(key) != other.get(key)
+    ]
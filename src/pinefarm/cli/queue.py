@@ -0,0 +1,107 @@
+"""Distribute runs over several nodes."""
+
+import pathlib
+
+import click
+import rich
+import rich.table
+
+from .. import configs, history, workqueue
+from ._base import command
+from .run import load_theory
+
+
+def _settings():
+    """Queue configurations, with defaults."""
+    return configs.configs.get("queue", {})
+
+
+def address():
+    """Address of the coordinator."""
+    return _settings().get("address", workqueue.DEFAULT_ADDRESS)
+
+
+@command.group("queue")
+def subcommand():
+    """Coordinate the runs executed by the workers."""
+
+
+@subcommand.command()
+@click.option("--address", "addr", default=None, help="host:port to listen on")
+def serve(addr):
+    """Start the coordinator."""
+    settings = _settings()
+    database = configs.configs["paths"]["cache"] / "queue.sqlite"
+    coordinator = workqueue.Coordinator(
+        database,
+        lease=settings.get("lease", workqueue.LEASE),
+        attempts=settings.get("attempts", workqueue.ATTEMPTS),
+    )
+    addr = addr or address()
+    with workqueue.Server(coordinator, addr) as server:
+        rich.print(f"Serving the queue in {database} on {addr}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+@subcommand.command()
+@click.argument("pinecards", nargs=-1, required=True)
+@click.option(
+    "-t",
+    "--theory",
+    "theory_paths",
+    multiple=True,
+    required=True,
+    type=click.Path(exists=True),
+    help="Theory card (can be repeated)",
+)
+@click.option(
+    "--pdf",
+    help="PDF to compare the original results to the grid",
+    default="NNPDF40MC_nnlo_as_01180_qed",
+)
+@click.option("--address", "addr", default=None, help="host:port of the coordinator")
+def submit(pinecards, theory_paths, pdf, addr):
+    """Queue PINECARDS, for each of the given theories."""
+    theories = [load_theory(path) for path in theory_paths]
+    # leased longest first, by the cost of the previous runs on this node
+    estimates = {
+        pinecard: history.cost(pathlib.Path(pinecard).name) for pinecard in pinecards
+    }
+    jobs = [
+        {
+            "pinecard": pinecard,
+            "theory": theory,
+            "pdf": pdf,
+            "estimate": estimates[pinecard],
+        }
+        for pinecard in pinecards
+        for theory in theories
+    ]
+    ids = workqueue.request(addr or address(), "submit", jobs=jobs)["ids"]
+    rich.print(f"Submitted {len(ids)} jobs: {', '.join(map(str, ids))}")
+
+
+@subcommand.command()
+@click.option("--address", "addr", default=None, help="host:port of the coordinator")
+def status(addr):
+    """Show the status of the queued jobs."""
+    jobs = workqueue.request(addr or address(), "status")["jobs"]
+    table = rich.table.Table(
+        "id", "pinecard", "theory", "status", "worker", "attempts", "time", "output"
+    )
+    for job in jobs:
+        total = (job["timings"] or {}).get("total")
+        table.add_row(
+            str(job["id"]),
+            job["pinecard"],
+            str(job["theory"]),
+            job["status"],
+            job["worker"] or "",
+            str(job["attempts"]),
+            "" if total is None else f"{total:.1f} s",
+            job["output"] or "",
+        )
+    rich.print(table)
@@ -1,24 +1,45 @@
 """Compute a grid and compare using a given PDF."""
 
+import concurrent.futures
+import contextlib
 import logging
 import pathlib
-import sys
+import tempfile
+import threading
 import time
 
 import click
 import rich
 import yaml
 
-from .. import configs, info, install, log, table, tools
+from .. import (
+    configs,
+    dashboard,
+    events,
+    evolution,
+    history,
+    info,
+    install,
+    log,
+    metrics,
+    slimming,
+    stages,
+    table,
+    tools,
+)
 from ..external import mg5
 from ._base import command
+from .slim import print_report
 
 logger = logging.getLogger(__name__)
 
+_install_lock = threading.Lock()
+"""Serialize the installation of the requirements among concurrent runs."""
+
 
 @command.command("run")
 @click.argument("pinecard")
-@click.argument("theory-path", type=click.Path(exists=True))
+@click.argument("theory-paths", nargs=-1, required=True, type=click.Path(exists=True))
 @click.option(
     "--pdf",
     help="PDF to compare the original results to the grid",
@@ -30,11 +51,53 @@ logger = logging.getLogger(__name__)
     type=click.Path(exists=True),
     help="Run the postprocess step given a runfolder",
 )
-def subcommand(pinecard, theory_path, pdf, dry, finalize=None):
+@click.option(
+    "--slim",
+    type=float,
+    default=None,
+    help="Remove the channels and orders contributing less than the given relative threshold",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Rerun all the stages, even if a previous run can be reused",
+)
+@click.option(
+    "--evolve",
+    is_flag=True,
+    help="Evolve the grids into FK tables, after the postprocessing",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=None,
+    help="Number of theories computed concurrently (default: the configured core budget)",
+)
+@click.option(
+    "--dashboard",
+    "live",
+    is_flag=True,
+    help="Show a live dashboard of the jobs, instead of the programs output",
+)
+def subcommand(
+    pinecard,
+    theory_paths,
+    pdf,
+    dry,
+    finalize=None,
+    slim=None,
+    force=False,
+    evolve=False,
+    jobs=None,
+    live=False,
+):
     """Compute the grids as defined in the given pinecard.
 
     Given a PINECARD and a THEORY-PATH, pinefarm will execute the
     appropiate external program to generate the grids.
+    If several THEORY-PATHS are given, the theory-independent preparation is
+    shared, and the theories are computed concurrently.
 
     The given PDF will be used to compare the original results (from the generator) with PineAPPL interpolation - this checks any interpolation issues.
     Setting the DRY flag prevents the generator from actually running.
@@ -49,44 +112,292 @@ def subcommand(pinecard, theory_path, pdf, dry, finalize=None):
     ----------
         pinecard: str
             pinecard name
-        theory_path: pathlib.Path
-            path to a theory card
+        theory_paths: list(pathlib.Path)
+            paths to the theory cards
         pdf: str
             pdf name
         dry: bool
             run only the preparation step
         finalize: str
             path to the runfolder in which to run the post processing step
+        slim: float
+            threshold for the removal of negligible contributions
+        force: bool
+            do not reuse the stages of previous runs
+        evolve: bool
+            evolve the grids into FK tables
+        jobs: int
+            number of theories computed concurrently
+        live: bool
+            show a live dashboard of the jobs
     """
+    if finalize is not None and len(theory_paths) > 1:
+        raise click.UsageError("--finalize can only be used with a single theory card")
+
+    view = dashboard.Dashboard().live() if live else contextlib.nullcontext()
+    with metrics.exporting(), view:
+        if len(theory_paths) == 1:
+            main(
+                pinecard,
+                theory_paths[0],
+                pdf,
+                dry=dry,
+                finalize=finalize,
+                slim=slim,
+                force=force,
+                evolve=evolve,
+            )
+        else:
+            sweep(
+                pinecard,
+                theory_paths,
+                pdf,
+                dry=dry,
+                slim=slim,
+                force=force,
+                evolve=evolve,
+                jobs=jobs,
+            )
+
+
+def main(
+    pinecard,
+    theory_path,
+    pdf,
+    dry=False,
+    finalize=None,
+    slim=None,
+    force=False,
+    evolve=False,
+):
+    """Compute the grids as defined in the given pinecard.
+
+    All the state is kept in the returned runner, such that several runs can
+    be driven concurrently in the same process.
+
+    Parameters
+    ----------
+    pinecard : str or pathlib.Path
+        pinecard name or path
+    theory_path : os.PathLike
+        path to a theory card
+    pdf : str
+        pdf name
+    dry : bool
+        run only the preparation step
+    finalize : os.PathLike or None
+        path to the runfolder in which to run the post processing step
+    slim : float or None
+        threshold for the removal of negligible contributions
+    force : bool
+        do not reuse the stages of previous runs
+    evolve : bool
+        evolve the grids into FK tables
+
+    Returns
+    -------
+    interface.External
+        runner instance
+
+    """
+    if finalize is not None:
+        finalize = pathlib.Path(finalize)
+
+    runner = build_runner(pinecard, load_theory(theory_path), pdf, finalize)
+    install_reqs(runner, pdf)
+
+    # Reuse the stages of a previous run with the same inputs (if any)
+    skip = ()
+    if finalize is None and not dry and not force:
+        skip = stages.reuse(runner, stages.manifest(runner, slim, evolve))
+
+    # Run the preparation step of the runner (if any)
+    if finalize is None and not skip:
+        if not prepare(runner, dry):
+            return runner
+
+    run_dataset(runner, slim=slim, skip=skip, evolve=evolve)
+    return runner
+
+
+def sweep(
+    pinecard,
+    theory_paths,
+    pdf,
+    dry=False,
+    slim=None,
+    force=False,
+    evolve=False,
+    jobs=None,
+):
+    """Compute the grids of a pinecard for several theories.
+
+    The installation, the PDF provisioning and the theory-independent inputs
+    (see :meth:`interface.External.prepare_shared`) are only prepared once,
+    while the theories are computed concurrently, in separate output folders.
+
+    Parameters
+    ----------
+    pinecard : str or pathlib.Path
+        pinecard name or path
+    theory_paths : list(os.PathLike)
+        paths to the theory cards
+    pdf : str
+        pdf name
+    dry : bool
+        run only the preparation step
+    slim : float or None
+        threshold for the removal of negligible contributions
+    force : bool
+        do not reuse the stages of previous runs
+    evolve : bool
+        evolve the grids into FK tables
+    jobs : int or None
+        number of theories computed concurrently (by default, the configured
+        core budget)
+
+    Returns
+    -------
+    dict
+        runner instance for each theory ID
+
+    Raises
+    ------
+    click.ClickException
+        if any theory failed (after all the others are completed)
+
+    """
+    if jobs is None:
+        jobs = configs.cores()
+
+    theories = [load_theory(path) for path in theory_paths]
+    ids = [theory["ID"] for theory in theories]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Theory IDs are not unique: {ids}")
+
+    runners = {theory["ID"]: build_runner(pinecard, theory, pdf) for theory in theories}
+    first = next(iter(runners.values()))
+    install_reqs(first, pdf)
+
+    skips = {}
+    for tid, runner in runners.items():
+        skips[tid] = ()
+        if not dry and not force:
+            skips[tid] = stages.reuse(runner, stages.manifest(runner, slim, evolve))
+
+    def compute(runner, skip, shared):
+        if not skip and not prepare(runner, dry, shared):
+            return
+        run_dataset(runner, slim=slim, skip=skip, evolve=evolve)
+
+    failures = {}
+    with tempfile.TemporaryDirectory(
+        prefix=f"{first.name}-shared-", dir=first.dest.parent
+    ) as shared:
+        shared = pathlib.Path(shared)
+        pending = [tid for tid, skip in skips.items() if not skip]
+        if pending and not dry:
+            rich.print(f"Preparing the shared inputs for {len(pending)} theories")
+            first.prepare_shared(shared)
+
+        with concurrent.futures.ThreadPoolExecutor(min(jobs, len(runners))) as pool:
+            futures = {
+                pool.submit(compute, runners[tid], skips[tid], shared): tid
+                for tid in longest_first(runners)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    failures[futures[future]] = e
+
+    rich.print("Output folders:")
+    for tid, runner in runners.items():
+        rich.print(f"    theory {tid}: {runner.dest}")
+    if failures:
+        rich.print(f"[red]Failed for {len(failures)} theories:[/]")
+        for tid, error in failures.items():
+            rich.print(f"    theory {tid}: {error!r}")
+        raise click.ClickException(
+            f"{len(failures)} of {len(runners)} theories failed: "
+            + ", ".join(str(tid) for tid in failures)
+        )
+
+    return runners
+
+
+def longest_first(runners):
+    """Order the runs by decreasing predicted wall time.
+
+    The runs without a prediction are considered the longest ones.
+
+    Parameters
+    ----------
+    runners : dict
+        runner instances, by key
+
+    Returns
+    -------
+    list
+        keys of the runners, in order
+
+    """
+
+    def wall(key):
+        prediction = history.predict(runners[key])
+        return float("inf") if prediction is None else prediction["wall"]
+
+    return sorted(runners, key=wall, reverse=True)
+
+
+def load_theory(theory_path):
+    """Read a theory card from file."""
+    with open(theory_path) as f:
+        theory_card = yaml.safe_load(f)
+        # Fix (possible) problems with CKM matrix loading
+        if isinstance(theory_card.get("CKM"), str):
+            theory_card["CKM"] = [float(i) for i in theory_card["CKM"].split()]
+    return theory_card
+
+
+def build_runner(pinecard, theory_card, pdf, output_folder=None):
+    """Instantiate the runner for a pinecard.
+
+    Parameters
+    ----------
+    pinecard : str or pathlib.Path
+        pinecard name or path
+    theory_card : dict
+        theory card
+    pdf : str
+        pdf name
+    output_folder : pathlib.Path or None
+        path of an already generated output folder
+
+    Returns
+    -------
+    interface.External
+        runner instance
+
+    """
+    runcards_path = configs.configs["paths"]["runcards"]
     # Check whether pinecard is a path. If it is, override the configuration.
     if (pinpath := pathlib.Path(pinecard)).exists():
         # If this pinecard is not in the runcards folder, warn the user but let it continue
-        if pinpath.parent.absolute() != (
-            rcards := configs.configs["paths"]["runcards"]
-        ):
+        if pinpath.parent.absolute() != runcards_path:
             logger.warning(
-                f"The pinecard ({pinecard}) is not in the runcards ({rcards}) folder, overriding config."
+                f"The pinecard ({pinecard}) is not in the runcards ({runcards_path}) folder, overriding config."
             )
-            configs.configs["paths"]["runcards"] = pinpath.parent
+            runcards_path = pinpath.parent
         pinecard = pinpath
     # Otherwise, use the configuration to fill the path
     else:
-        pinecard = configs.configs["paths"]["runcards"] / pinecard
+        pinecard = runcards_path / pinecard
 
     # Check for existence
     if not pinecard.exists():
         raise FileNotFoundError(f"The pinecard {pinecard} cannot be found")
 
-    if finalize is not None:
-        finalize = pathlib.Path(finalize)
-
-    # read theory card from file
-    with open(theory_path) as f:
-        theory_card = yaml.safe_load(f)
-        # Fix (possible) problems with CKM matrix loading
-        if isinstance(theory_card.get("CKM"), str):
-            theory_card["CKM"] = [float(i) for i in theory_card["CKM"].split()]
-
     # _in principle_ the pinecard is just the name, but a path should also be accepted
     dataset = pinecard.name
 
@@ -113,29 +424,55 @@ def subcommand(pinecard, theory_path, pdf, dry, finalize=None):
     rich.print(dataset)
 
     try:
-        datainfo = info.label(dataset)
+        datainfo = info.label(dataset, runcards_path)
     except UnboundLocalError as e:
         raise UnboundLocalError(f"Runcard {dataset} could not be found") from e
 
     rich.print(f"Computing [{datainfo.color}]{dataset}[/]...")
 
-    runner = datainfo.external(dataset, theory_card, pdf, output_folder=finalize)
-    install_reqs(runner, pdf)
+    return datainfo.external(
+        dataset,
+        theory_card,
+        pdf,
+        runcards_path=runcards_path,
+        output_folder=output_folder,
+    )
 
-    # Run the preparation step of the runner (if any)
-    if finalize is None:
-        runner_stop = runner.preparation()
-        if dry or runner_stop:
-            rich.print(
-                f"""Running in dry mode, exiting now.
+
+def prepare(runner, dry=False, shared=None):
+    """Run the preparation step of the runner (if any).
+
+    Parameters
+    ----------
+    runner : interface.External
+        runner instance
+    dry : bool
+        stop after the preparation step
+    shared : pathlib.Path or None
+        folder with the inputs shared among theories, to be imported first
+
+    Returns
+    -------
+    bool
+        whether the run should continue
+
+    """
+    if shared is not None and not dry:
+        runner.import_shared(shared)
+
+    runner_stop = runner.preparation()
+    if dry:
+        print_prediction(runner)
+    if dry or runner_stop:
+        rich.print(
+            f"""Running in dry mode, exiting now.
     The preparation step can be found in:
         {runner.dest}"""
-            )
-            sys.exit(0)
-
-        ###### <this part will eventually go to -prepare->
+        )
+        return False
 
-    run_dataset(runner)
+    ###### <this part will eventually go to -prepare->
+    return True
 
 
 def install_reqs(runner, pdf):
@@ -144,67 +481,157 @@ def install_reqs(runner, pdf):
     Parameters
     ----------
     runner : interface.External
-        runner instance
+        runner instance (or class, since only its ``install`` is used)
     pdf : str
         pdf name
 
     """
     t0 = time.perf_counter()
 
+    with _install_lock:
+        _install_reqs(runner, pdf)
+
+    tools.print_time(t0, "Installation")
+
+
+def _install_reqs(runner, pdf):
+    """Install requirements, not thread-safe."""
     install.init_prefix()
     install.update_environ()
     runner.install()
 
     # install chosen PDF set
     install.lhapdf_conf(pdf)
+    if not install.pdf(pdf):
+        raise FileNotFoundError(f"The PDF set '{pdf}' could not be installed")
 
-    # lhapdf_management determine paths at import time, so it is important to
-    # late import it, in particular after environ has been updated by `install.lhlhapdf_conf`
-    import lhapdf_management  # pylint: disable=import-error,import-outside-toplevel
 
-    try:
-        lhapdf_management.pdf_update()
-    # survive even if it's not possible to write 'pdfsets.index'
-    except PermissionError:
-        pass
-    lhapdf_management.pdf_install(pdf)
+def print_prediction(runner):
+    """Print the resources predicted from the history of the previous runs."""
+    prediction = history.predict(runner)
+    if prediction is None:
+        rich.print("No previous run to predict the resources from")
+        return
 
-    tools.print_time(t0, "Installation")
+    source = "dataset" if prediction["dataset"] else f"{type(runner).__name__} runs"
+    memory = prediction["memory"]
+    memory = "unknown" if memory is None else f"{memory / 2**20:.0f} MiB"
+    rich.print(
+        f"Predicted wall time: {prediction['wall']:.1f} s, "
+        f"peak memory: {memory} "
+        f"(from {prediction['samples']} previous stages of the same {source})"
+    )
 
 
-def run_dataset(runner):
+def run_dataset(runner, slim=None, skip=(), evolve=False):
     """Execute runner and apply common post process.
 
     Parameters
     ----------
     runner : interface.External
         runner instance
+    slim : float or None
+        if given, threshold for the removal of negligible contributions
+    skip : tuple(str)
+        stages already completed (see :mod:`pinefarm.stages`)
+    evolve : bool
+        evolve the grids into FK tables (see :mod:`pinefarm.evolution`)
+
+    Returns
+    -------
+    dict
+        wall time (in seconds) of each executed stage
 
     """
+    with events.job(runner.dest.name):
+        try:
+            timings = _run_dataset(runner, slim, skip, evolve)
+        except BaseException as e:
+            events.emit("failed", error=repr(e))
+            raise
+        events.emit("finished")
+    return timings
+
+
+def _run_dataset(runner, slim, skip, evolve):
+    """Execute the stages, see :func:`run_dataset`."""
     t0 = time.perf_counter()
+    timings = {}
 
     tools.print_time(t0, "Grid calculation")
 
+    hashes = stages.manifest(runner, slim, evolve)
+
     with log.Tee(runner.dest / "errors.log", stdout=False, stderr=True):
         # if output folder specified, do not rerun
         if runner.timestamp is None:
-            runner.run()
-
-            # collect results in the output pineappl grid
-            runner.generate_pineappl()
-
-            table.print_table(
-                table.convolute_grid(
-                    runner.grid, runner.pdf, integrated=isinstance(runner, mg5.Mg5)
-                ),
-                runner.results(),
-                runner.dest,
+            if "generate" not in skip:
+                events.emit("stage", stage="generate")
+                with history.measure(runner, "generate", timings):
+                    runner.run()
+
+                    # collect results in the output pineappl grid
+                    runner.generate_pineappl()
+                    for grid in runner.grids.values():
+                        if grid.exists():
+                            metrics.set_value(
+                                "grid_bytes", grid.stat().st_size, grid=grid.name
+                            )
+
+                    if slim is not None:
+                        for grid in runner.grids.values():
+                            if grid.exists():
+                                print_report(
+                                    grid,
+                                    slimming.slim(
+                                        grid,
+                                        runner.pdf,
+                                        slim,
+                                        cache=configs.configs["paths"]["cache"],
+                                    ),
+                                )
+                stages.record(runner.dest, "generate", hashes)
+
+            if "annotate" not in skip:
+                events.emit("stage", stage="annotate")
+                with history.measure(runner, "annotate", timings):
+                    for observable, grid in runner.grids.items():
+                        if not grid.exists():
+                            continue
+                        table.print_table(
+                            table.convolute_grid(
+                                grid,
+                                runner.pdf,
+                                integrated=isinstance(runner, mg5.Mg5),
+                                cache=configs.configs["paths"]["cache"],
+                            ),
+                            runner.observable_results(observable),
+                            runner.dest,
+                            runner.results_log(observable).name,
+                        )
+
+                    runner.annotate_versions()
+                stages.record(runner.dest, "annotate", hashes)
+
+        if "postprocess" not in skip:
+            events.emit("stage", stage="postprocess")
+            with history.measure(runner, "postprocess", timings):
+                runner.postprocess()
+            stages.record(runner.dest, "postprocess", hashes)
+
+        if evolve and "evolve" not in skip:
+            events.emit("stage", stage="evolve")
+            with history.measure(runner, "evolve", timings):
+                fktables, reused = evolution.evolve(
+                    sorted(runner.dest.glob("*.pineappl.lz4")),
+                    runner.theory,
+                    runner.dest / stages.FKTABLES,
+                )
+            rich.print(
+                f"Evolved {len(fktables)} grids into FK tables "
+                f"({reused} operators reused from the cache)"
             )
-
-            # TODO: annotate_version should be a post-processing step
-            # however at the moment only works in 1-grid cases
-            runner.annotate_versions()
-
-        runner.postprocess()
+            stages.record(runner.dest, "evolve", hashes)
 
     print(f"Output stored in {runner.dest}")
+    return timings
@@ -0,0 +1,50 @@
+"""Serve requests from a long-lived process."""
+
+import pathlib
+
+import click
+import rich
+
+from .. import configs, daemon, metrics
+from ._base import command
+
+
+def _settings():
+    """Service configurations, with defaults."""
+    return configs.configs.get("serve", {})
+
+
+def socket_path():
+    """Path of the socket of the service."""
+    path = _settings().get("socket")
+    if path is None:
+        return configs.configs["paths"]["cache"] / "serve.sock"
+    return pathlib.Path(path)
+
+
+@command.command("serve")
+@click.option(
+    "--socket",
+    "path",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="Path of the socket to listen on",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=None,
+    help="Requests executed concurrently (default: resources::cores)",
+)
+def subcommand(path, jobs):
+    """Serve the requests of the ``client`` commands, keeping modules and PDFs loaded."""
+    path = path or socket_path()
+    service = daemon.Service(jobs or _settings().get("jobs"))
+    with metrics.exporting(), daemon.Server(service, path) as server:
+        rich.print(f"Serving on {path} ({service.jobs} concurrent requests)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    rich.print(f"Served {service.served} requests")
@@ -0,0 +1,55 @@
+"""Remove negligible contributions from PineAPPL grids."""
+
+import pathlib
+
+import click
+import rich
+
+from .. import configs, slimming
+from ._base import command
+
+
+@command.command("slim")
+@click.argument("grids", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "--pdf",
+    help="PDF used to estimate the contributions",
+    default="NNPDF40MC_nnlo_as_01180_qed",
+)
+@click.option(
+    "-t",
+    "--threshold",
+    type=float,
+    default=1e-6,
+    help="Relative contribution below which channels and orders are removed",
+)
+def subcommand(grids, pdf, threshold):
+    """Remove negligible channels and orders from GRIDS (in place)."""
+    for grid in grids:
+        main(pathlib.Path(grid), pdf, threshold)
+
+
+def main(grid, pdf, threshold):
+    """Slim a single grid and print the report."""
+    report = slimming.slim(
+        grid, pdf, threshold, cache=configs.configs["paths"]["cache"]
+    )
+    print_report(grid, report)
+    return report
+
+
+def print_report(grid, report):
+    """Print a slimming report."""
+    size = report["bytes"]
+    timing = report["time"]
+    rich.print(f"[b]{grid}[/]")
+    rich.print(
+        f"  channels: {report['channels']}"
+        f" (-{len(report['deleted_channels'])} negligible,"
+        f" -{report['merged_channels']} merged)"
+    )
+    rich.print(
+        f"  orders: {report['orders']} (-{len(report['deleted_orders'])} negligible)"
+    )
+    rich.print(f"  size: {size[0]} -> {size[1]} bytes")
+    rich.print(f"  convolution: {timing[0] * 1e3:.2f} -> {timing[1] * 1e3:.2f} ms")
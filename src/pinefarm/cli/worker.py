@@ -0,0 +1,25 @@
+"""Execute the runs of a queue."""
+
+import click
+
+from .. import metrics, workqueue
+from ._base import command
+from .queue import address
+
+
+@command.command("worker")
+@click.option("--address", "addr", default=None, help="host:port of the coordinator")
+@click.option("--name", default=None, help="Worker name (default: host name and PID)")
+@click.option(
+    "--poll",
+    type=float,
+    default=5.0,
+    help="Interval (in seconds) between requests, while the queue is empty",
+)
+@click.option("--drain", is_flag=True, help="Exit as soon as the queue is empty")
+def subcommand(addr, name, poll, drain):
+    """Pull jobs from the coordinator and run them."""
+    worker = workqueue.Worker(addr or address(), name=name, poll=poll)
+    with metrics.exporting():
+        processed = worker.run(drain=drain)
+    print(f"Processed {processed} jobs")
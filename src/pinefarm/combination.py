@@ -0,0 +1,165 @@
+"""Statistical combination of independent runs."""
+
+import concurrent.futures
+import contextlib
+import math
+import pathlib
+import tempfile
+
+import numpy as np
+import pineappl
+
+from . import configs, metrics
+
+
+def trim_mask(values, errors, threshold, fraction):
+    """Find outliers among independent determinations of the same quantities.
+
+    A determination is considered an outlier if it deviates from the median
+    by more than ``threshold`` times its own error, but at most the
+    ``fraction`` of the most deviating determinations (rounded up) are
+    discarded for each quantity.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        determinations, the first axis runs over the independent runs
+    errors : numpy.ndarray
+        errors on the determinations, same shape as ``values``
+    threshold : float
+        maximum deviation allowed, in units of the error
+    fraction : float
+        maximum fraction of determinations to be discarded
+
+    Returns
+    -------
+    numpy.ndarray
+        boolean mask, ``True`` for the determinations to be discarded
+
+    """
+    nruns = values.shape[0]
+    kmax = math.ceil(fraction * nruns)
+    if kmax == 0 or nruns < 3:
+        return np.zeros_like(values, dtype=bool)
+
+    deviation = np.abs(values - np.median(values, axis=0))
+    deviation = np.divide(
+        deviation, errors, out=np.zeros_like(deviation), where=errors > 0
+    )
+    # rank 0 is the most deviating determination
+    rank = np.argsort(np.argsort(-deviation, axis=0), axis=0)
+    return (deviation > threshold) & (rank < kmax)
+
+
+def weighted_average(values, errors, trim=None):
+    """Combine independent determinations with inverse-variance weights.
+
+    Quantities for which all the errors vanish (e.g. empty bins) are combined
+    with equal weights.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        determinations, the first axis runs over the independent runs
+    errors : numpy.ndarray
+        errors on the determinations, same shape as ``values``
+    trim : tuple(float, float) or None
+        ``(threshold, fraction)`` for outliers removal, see :func:`trim_mask`
+        (no trimming if `None`)
+
+    Returns
+    -------
+    numpy.ndarray
+        combined values
+    numpy.ndarray
+        combined errors
+    numpy.ndarray
+        normalized weights of each determination, same shape as ``values``
+
+    """
+    values = np.asarray(values, dtype=float)
+    errors = np.asarray(errors, dtype=float)
+
+    keep = np.ones_like(values, dtype=bool)
+    if trim is not None:
+        keep &= ~trim_mask(values, errors, *trim)
+
+    weights = np.divide(
+        1.0, errors**2, out=np.zeros_like(errors), where=keep & (errors > 0)
+    )
+    total = weights.sum(axis=0)
+    # fall back to equal weights where no error is available
+    weights = np.where(total > 0, weights, keep.astype(float))
+    total = weights.sum(axis=0)
+    weights /= np.where(total > 0, total, 1.0)
+
+    mean = np.sum(weights * values, axis=0)
+    error = np.sqrt(np.sum(weights**2 * errors**2, axis=0))
+    return mean, error, weights
+
+
+def _scale(path, factors, output):
+    """Scale a grid bin by bin, storing the result in a new file."""
+    grid = pineappl.grid.Grid.read(str(path))
+    grid.scale_by_bin(list(factors))
+    grid.write(str(output))
+
+
+def _merge_pair(first, second, output):
+    """Sum two grids, storing the result in a new file."""
+    grid = pineappl.grid.Grid.read(str(first))
+    grid.merge(pineappl.grid.Grid.read(str(second)))
+    grid.write(str(output))
+
+
+def merge_grids(paths, output, factors=None, jobs=None, pool=None):
+    """Sum grids with a parallel pairwise reduction.
+
+    Without a ``pool``, worker processes are only started if at least two pairs
+    can be merged concurrently, and the grids are summed serially otherwise.
+
+    Parameters
+    ----------
+    paths : list(os.PathLike)
+        grids to be summed
+    output : os.PathLike
+        path of the resulting grid
+    factors : list(list(float)) or None
+        bin-dependent factors by which each grid is scaled before summing
+        (e.g. the weights of :func:`weighted_average`)
+    jobs : int or None
+        number of worker processes (default: the configured core budget),
+        ignored if ``pool`` is given
+    pool : concurrent.futures.Executor or None
+        executor shared among several merges (e.g. of all the channels and
+        observables of a run)
+
+    """
+    paths = [pathlib.Path(p) for p in paths]
+    if not paths:
+        raise ValueError("No grid to be merged.")
+    metrics.inc("merged_bytes_total", sum(p.stat().st_size for p in paths))
+
+    with contextlib.ExitStack() as stack:
+        tmp = pathlib.Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        if pool is None:
+            jobs = min(configs.cores() if jobs is None else jobs, len(paths) // 2)
+            if jobs > 1:
+                pool = stack.enter_context(concurrent.futures.ProcessPoolExecutor(jobs))
+        mapper = map if pool is None else pool.map
+
+        if factors is not None:
+            scaled = [tmp / f"scaled_{i}.pineappl" for i in range(len(paths))]
+            list(mapper(_scale, paths, factors, scaled))
+            paths = scaled
+
+        level = 0
+        while len(paths) > 1:
+            npairs = len(paths) // 2
+            merged = [tmp / f"merged_{level}_{i}.pineappl" for i in range(npairs)]
+            list(mapper(_merge_pair, paths[0::2], paths[1::2], merged))
+            # an odd grid out is carried to the next level
+            paths = merged + paths[2 * npairs :]
+            level += 1
+
+        pineappl.grid.Grid.read(str(paths[0])).write(str(output))
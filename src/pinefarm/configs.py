@@ -210,6 +210,8 @@ def paths(paths: dict) -> dict:
     paths["cargo"] = prefix / "cargo"
     paths["lhapdf"] = prefix / "lhapdf"
     paths["lhapdf_data_alternative"] = prefix / "share" / "LHAPDF"
+    paths["cache"] = prefix / "cache"
+    paths["lhapdf_mirror"] = prefix / "share" / "LHAPDF-mirror"
 
     return paths
 
@@ -220,6 +222,12 @@ def commands(paths: dict) -> dict:
 
     commands["mg5"] = paths["mg5amc"] / "bin" / "mg5_aMC"
     commands["vrap"] = paths["prefix"] / "bin" / "Vrap"
+    nnlojet = shutil.which("NNLOJET")
+    commands["nnlojet"] = (
+        pathlib.Path(nnlojet)
+        if nnlojet is not None
+        else paths["prefix"] / "bin" / "NNLOJET"
+    )
     pineappl = shutil.which("pineappl")
     commands["pineappl"] = (
         pathlib.Path(pineappl)
@@ -230,6 +238,20 @@ def commands(paths: dict) -> dict:
     return commands
 
 
+def resources() -> dict:
+    """Set default computing resources."""
+    resources = {}
+
+    resources["cores"] = os.cpu_count() or 1
+
+    return resources
+
+
+def cores() -> int:
+    """Return the core budget available to a single command."""
+    return max(int(configs.get("resources", {}).get("cores", 1)), 1)
+
+
 def force_paths():
     """Convert values in chosen sections to paths."""
     for sec in PATHS_SECTIONS:
@@ -0,0 +1,254 @@
+"""Bulk generation of the positivity and integrability grids.
+
+Building the grid of a constraint takes milliseconds, such that running each
+of them through the full ``run`` pipeline is dominated by its overhead
+(configuration, installation checks, output folder, comparison and metadata
+rewrites).
+Here, many cards are read at once, their grids are built and checked in a
+single process, with a single PDF handle, and written in parallel, each with
+all its metadata in a single write.
+"""
+
+import concurrent.futures
+import dataclasses
+import pathlib
+import typing
+
+import numpy as np
+import pineappl
+import yaml
+
+from . import __version__, configs, pdftable
+from .external import integrability, interface, positivity
+
+RUNCARDS = {"positivity.yaml": "positivity", "integrability.yaml": "integrability"}
+"""Runcard file of each kind of constraint."""
+
+
+@dataclasses.dataclass
+class Card:
+    """Constraint card.
+
+    Parameters
+    ----------
+    name : str
+        name of the grid
+    kind : str
+        ``positivity`` or ``integrability``
+    runcard : dict
+        content of the runcard
+    pinecard : pathlib.Path or None
+        pinecard folder, if the card is the only one of a pinecard
+
+    """
+
+    name: str
+    kind: str
+    runcard: dict
+    pinecard: typing.Optional[pathlib.Path] = None
+
+
+def discover(folder):
+    """List the positivity and integrability pinecards in a folder."""
+    return sorted(
+        p for p in folder.iterdir() if any((p / name).exists() for name in RUNCARDS)
+    )
+
+
+def load_file(path):
+    """Read the cards from a YAML file, possibly with multiple documents.
+
+    Each document is a runcard, with in addition its ``name`` and ``kind``.
+    The kind is implied by the runcards named as in :data:`RUNCARDS`, and the
+    name by the pinecard containing them, if they consist of a single document.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        YAML file
+
+    Returns
+    -------
+    list(Card)
+        cards in the file
+
+    """
+    with open(path) as fd:
+        documents = [doc for doc in yaml.safe_load_all(fd) if doc is not None]
+    single = path.name in RUNCARDS and len(documents) == 1
+
+    cards = []
+    for doc in documents:
+        runcard = dict(doc)
+        name = runcard.pop("name", path.parent.name if single else None)
+        kind = runcard.pop("kind", RUNCARDS.get(path.name))
+        if name is None:
+            raise ValueError(f"Card without name in '{path}'")
+        if kind not in RUNCARDS.values():
+            raise ValueError(f"Unknown kind '{kind}' of card '{name}' in '{path}'")
+        cards.append(Card(name, kind, runcard, path.parent if single else None))
+    return cards
+
+
+def load_cards(paths):
+    """Collect the cards from pinecards and YAML files.
+
+    Parameters
+    ----------
+    paths : list(pathlib.Path)
+        pinecards folders, or YAML files (see :func:`load_file`)
+
+    Returns
+    -------
+    list(Card)
+        all the cards
+
+    """
+    cards = []
+    for path in paths:
+        if path.is_dir():
+            runcards = [path / name for name in RUNCARDS if (path / name).exists()]
+            if not runcards:
+                raise ValueError(
+                    f"'{path}' is not a positivity or integrability pinecard"
+                )
+            if (path / "postrun.sh").exists():
+                raise ValueError(
+                    f"The postrun script of '{path}' is not supported in bulk mode"
+                )
+            path = runcards[0]
+        cards.extend(load_file(path))
+
+    names = [card.name for card in cards]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate cards: {', '.join(duplicates)}")
+    return cards
+
+
+def build(card, q2=None):
+    """Build the grid of a card.
+
+    Parameters
+    ----------
+    card : Card
+        constraint card
+    q2 : float or None
+        scale of the integrability pseudo-observables
+
+    Returns
+    -------
+    pineappl.grid.Grid
+        grid
+
+    """
+    if card.kind == "positivity":
+        return positivity.build_grid(card.runcard)
+    if q2 is None:
+        raise ValueError(f"Integrability card '{card.name}' requires the theory Q0")
+    return integrability.build_grid(card.runcard, q2)
+
+
+def check(grid, card, pdf, q2=None):
+    """Compare the grid of a card to the direct computation.
+
+    Parameters
+    ----------
+    grid : pineappl.grid.Grid
+        grid of the card
+    card : Card
+        constraint card
+    pdf : lhapdf.PDF
+        loaded PDF member
+    q2 : float or None
+        scale of the integrability pseudo-observables
+
+    Returns
+    -------
+    float
+        maximum relative difference among the bins
+
+    """
+    if card.kind == "positivity":
+        expected = positivity.predictions(pdf, card.runcard)
+    else:
+        expected = integrability.predictions(pdf, card.runcard, q2)
+    expected = expected["result"].to_numpy()
+    values = grid.convolve(
+        pdg_convs=grid.convolutions, xfxs=[pdf.xfxQ2], alphas=pdf.alphasQ2
+    )
+    # absolute difference, for the vanishing results
+    scale = np.where(expected != 0, np.abs(expected), 1.0)
+    return float(np.max(np.abs(values - expected) / scale))
+
+
+def metadata(card, pdf=None):
+    """Metadata of a grid, as added by the ``run`` pipeline."""
+    entries = {"pinefarm": __version__, "pineappl": pineappl.version}
+    if card.kind == "integrability":
+        entries["integrability_version"] = integrability.VERSION
+    if pdf is not None:
+        entries["results_pdf"] = pdf
+    if card.pinecard is not None:
+        entries["pinecard"] = interface.archive_pinecard(card.pinecard)
+        entries.update(interface.pinecard_metadata(card.pinecard))
+    return entries
+
+
+def generate(cards, dest, theory, pdf=None, jobs=None):
+    """Build, check and write the grids of many cards.
+
+    Parameters
+    ----------
+    cards : list(Card)
+        constraint cards
+    dest : pathlib.Path
+        output folder
+    theory : dict
+        theory card (``Q0`` is the scale of the integrability
+        pseudo-observables)
+    pdf : str or None
+        PDF used to check the grids (no check if `None`)
+    jobs : int or None
+        number of grids written in parallel (default: the configured core
+        budget)
+
+    Returns
+    -------
+    list(dict)
+        ``name``, ``kind``, number of ``bins``, maximum relative
+        ``difference`` from the direct computation (`None` if not checked) and
+        path of the ``grid`` of each card
+
+    """
+    q2 = theory["Q0"] ** 2 if "Q0" in theory else None
+    handle = None
+    if pdf is not None:
+        handle = pdftable.load(pdf)
+
+    grids = []
+    reports = []
+    for card in cards:
+        grid = build(card, q2)
+        for key, value in metadata(card, pdf).items():
+            grid.set_metadata(key, value)
+        grids.append(grid)
+        reports.append(
+            {
+                "name": card.name,
+                "kind": card.kind,
+                "bins": grid.bins(),
+                "difference": None if handle is None else check(grid, card, handle, q2),
+                "grid": dest / f"{card.name}.pineappl.lz4",
+            }
+        )
+
+    def write(grid, report):
+        grid.write_lz4(str(report["grid"]))
+
+    if jobs is None:
+        jobs = configs.cores()
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        list(pool.map(write, grids, reports))
+
+    return reports
@@ -0,0 +1,329 @@
+"""Long-lived service executing requests on a local Unix socket.
+
+Each CLI invocation pays for the imports, the configuration detection, the
+environment setup and the PDF loading, which dominate the wall time of small
+jobs (constraints, DIS, metadata updates, merges).
+The service keeps all of them warm, and executes the requests concurrently,
+through the same functions used by the CLI commands.
+
+The protocol is the same as the one of the :mod:`work queue
+<pinefarm.workqueue>`: JSON messages, one per line, each request being answered
+by a single response on the same connection.
+
+Paths in the requests are resolved by the service, so the clients have to send
+absolute paths.
+Requests are sent with the ``client`` commands, or with the thin client in
+:mod:`pinefarm.ipc`.
+"""
+
+import json
+import os
+import socketserver
+import threading
+import time
+import traceback
+
+import numpy as np
+import pineappl
+
+from . import configs, install, ipc, pdftable, tools
+
+
+class _Locked:
+    """PDF member whose methods are called holding its lock.
+
+    The members are shared by the requests executed concurrently.
+    """
+
+    def __init__(self, member, lock):
+        self._member = member
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attribute = getattr(self._member, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+
+        return call
+
+
+class Service:
+    """Execute the requests, keeping the PDF sets loaded.
+
+    Parameters
+    ----------
+    jobs : int or None
+        maximum number of requests executed concurrently (default: the
+        configured core budget)
+
+    """
+
+    OPERATIONS = ("run", "merge", "update", "convolve", "status", "shutdown")
+    """Operations available to the clients."""
+    CONTROL = ("status", "shutdown")
+    """Operations not limited by the concurrency budget."""
+
+    def __init__(self, jobs=None):
+        self.jobs = configs.cores() if jobs is None else jobs
+        self.started = time.time()
+        self.served = 0
+        self._slots = threading.BoundedSemaphore(self.jobs)
+        self._lock = threading.Lock()
+        self._active = {}
+        self._pdfs = {}
+        self._counter = 0
+
+        install.init_prefix()
+        install.update_environ()
+
+    def pdf(self, name):
+        """Load a PDF member, installing the set if needed.
+
+        Parameters
+        ----------
+        name : str
+            ``<set>`` or ``<set>/<member>``
+
+        Returns
+        -------
+        lhapdf.PDF
+            loaded member
+        threading.Lock
+            lock guarding the member, to be held while using it
+
+        """
+        # pylint: disable=import-outside-toplevel
+        set_name, _, member = name.partition("/")
+        name = f"{set_name}/{int(member or 0)}"
+        with self._lock:
+            if name in self._pdfs:
+                return self._pdfs[name]
+
+        from .cli import run
+        from .external import interface
+
+        run.install_reqs(interface.External, set_name)
+        import lhapdf  # pylint: disable=import-error
+
+        loaded = (lhapdf.mkPDF(set_name, int(member or 0)), threading.Lock())
+        with self._lock:
+            return self._pdfs.setdefault(name, loaded)
+
+    def shared_pdf(self, name):
+        """Provide a loaded PDF member to the runs (see :func:`pinefarm.pdftable.load`)."""
+        return _Locked(*self.pdf(name))
+
+    def run(
+        self,
+        pinecard,
+        theory,
+        pdf,
+        dry=False,
+        finalize=None,
+        slim=None,
+        force=False,
+        evolve=False,
+    ):
+        """Compute the grids of a pinecard, as the ``run`` command.
+
+        The PDF members are the ones kept loaded by the service.
+
+        Returns
+        -------
+        dict
+            ``output`` folder of the run
+
+        """
+        from .cli import run  # pylint: disable=import-outside-toplevel
+
+        with pdftable.provided(self.shared_pdf):
+            runner = run.main(
+                pinecard,
+                theory,
+                pdf,
+                dry=dry,
+                finalize=finalize,
+                slim=slim,
+                force=force,
+                evolve=evolve,
+            )
+        return {"output": str(runner.dest)}
+
+    def merge(self, grids, output):
+        """Merge grids, as the ``merge`` command, in the ``output`` folder.
+
+        Returns
+        -------
+        dict
+            path of the merged ``grid``
+
+        """
+        from .cli import merge  # pylint: disable=import-outside-toplevel
+
+        return {"grid": str(merge.main(grids, output=output))}
+
+    def update(self, datasets):
+        """Update the metadata of the grids, as the ``update`` command.
+
+        Returns
+        -------
+        dict
+            updated ``datasets``
+
+        """
+        from .cli import update  # pylint: disable=import-outside-toplevel
+
+        update.main(datasets)
+        return {"datasets": datasets}
+
+    def convolve(self, grid, pdf, scale_variations=False):
+        """Convolve a grid with a PDF member.
+
+        Parameters
+        ----------
+        grid : str
+            grid path
+        pdf : str
+            ``<set>`` or ``<set>/<member>``
+        scale_variations : bool
+            compute the nine points scale variations, instead of the central
+            predictions only
+
+        Returns
+        -------
+        dict
+            ``predictions`` for each bin (a list of the scale variations, if
+            requested)
+
+        """
+        loaded = pineappl.grid.Grid.read(grid)
+        xi = tools.nine_points if scale_variations else [(1.0, 1.0, 1.0)]
+        member, lock = self.pdf(pdf)
+        with lock:
+            values = loaded.convolve(
+                pdg_convs=loaded.convolutions,
+                xfxs=[member.xfxQ2] * len(loaded.convolutions),
+                alphas=member.alphasQ2,
+                xi=xi,
+            )
+        values = np.asarray(values).reshape(-1, len(xi))
+        if not scale_variations:
+            values = values[:, 0]
+        return {"predictions": values.tolist()}
+
+    def status(self):
+        """Describe the state of the service.
+
+        Returns
+        -------
+        dict
+            ``active`` requests, number of ``served`` ones, ``uptime``, loaded
+            ``pdfs`` and concurrency budget (``jobs``)
+
+        """
+        now = time.time()
+        with self._lock:
+            active = [
+                {"id": rid, "op": op, "elapsed": now - start}
+                for rid, (op, start) in sorted(self._active.items())
+            ]
+            return {
+                "active": active,
+                "served": self.served,
+                "uptime": now - self.started,
+                "pdfs": sorted(self._pdfs),
+                "jobs": self.jobs,
+            }
+
+    def shutdown(self):
+        """Accept the shutdown request (performed by the server)."""
+        return {"ok": True}
+
+    def _execute(self, op, message):
+        """Execute an operation, keeping track of it."""
+        with self._lock:
+            self._counter += 1
+            rid = self._counter
+            self._active[rid] = (op, time.time())
+        try:
+            return getattr(self, op)(**message)
+        finally:
+            with self._lock:
+                del self._active[rid]
+                self.served += 1
+
+    def dispatch(self, message):
+        """Execute a request and produce the response."""
+        op = message.pop("op", None)
+        if op not in self.OPERATIONS:
+            return {"error": f"Unknown operation '{op}'"}
+        try:
+            if op in self.CONTROL:
+                return getattr(self, op)(**message)
+            with self._slots:
+                return self._execute(op, message)
+        except Exception:  # pylint: disable=broad-except
+            return {"error": traceback.format_exc()}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer the requests of a single connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                op = message.get("op")
+                response = self.server.service.dispatch(message)
+            except json.JSONDecodeError as e:
+                op, response = None, {"error": repr(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+            if op == "shutdown":
+                # shutting down from a thread not serving the requests
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server exposing a service.
+
+    The socket is only accessible by the owner (it is created with a
+    restrictive umask), and it is removed when the server is closed.
+    A stale socket (left by a service not running any longer) is replaced.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, service, path):
+        self.service = service
+        self.path = path
+        if path.exists():
+            try:
+                ipc.request(path, "status", timeout=5.0)
+            except OSError:
+                path.unlink()
+            else:
+                raise RuntimeError(f"A service is already listening on '{path}'")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(path), _Handler)
+
+    def server_bind(self):
+        """Bind the socket with a private umask."""
+        # restricted since its creation, never accessible by other users
+        mask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(mask)
+
+    def server_close(self):
+        """Close the server and remove the socket."""
+        super().server_close()
+        if self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,184 @@
+"""Live dashboard of the running jobs.
+
+The dashboard subscribes to the events emitted by the runs (see
+:mod:`pinefarm.events`), and shows for each job the current stage, the
+elapsed time, and the progress of the external program, with its rate and the
+estimated time to completion, together with the load of the node.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+import rich.console
+import rich.live
+import rich.table
+
+from . import events, log
+
+
+def node_load():
+    """Load of the node.
+
+    Returns
+    -------
+    float or None
+        CPU load (1 minute load average, per core)
+    float or None
+        fraction of the memory in use
+
+    """
+    try:
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        cpu = None
+
+    memory = None
+    try:
+        with open("/proc/meminfo") as fd:
+            info = {
+                line.split(":")[0]: int(line.split()[1]) for line in fd if ":" in line
+            }
+        memory = 1.0 - info["MemAvailable"] / info["MemTotal"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return cpu, memory
+
+
+def _duration(seconds):
+    """Format a duration."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{seconds:02d}s"
+
+
+class Job:
+    """State of a single job, as known from its events."""
+
+    def __init__(self, name, start):
+        self.name = name
+        self.start = start
+        self.end = None
+        self.stage = "starting"
+        self.status = "running"
+        self.progress = None
+        self._rate_start = None
+
+    def update(self, event):
+        """Update the state with a new event."""
+        if event.kind == "stage":
+            self.stage = event.data["stage"]
+            self.progress = None
+            self._rate_start = None
+        elif event.kind == "progress":
+            done = event.data["done"]
+            label = event.data.get("label", "")
+            if self._rate_start is None or self._rate_start[2] != label:
+                self._rate_start = (event.time, done, label)
+            self.progress = (done, event.data["total"], label, event.time)
+        elif event.kind in ("finished", "failed"):
+            self.status = event.kind
+            self.end = event.time
+
+    def rate(self):
+        """Return the steps completed per minute, if measurable."""
+        if self.progress is None or self._rate_start is None:
+            return None
+        t0, done0, _ = self._rate_start
+        done, _, _, t = self.progress
+        if t <= t0 or done <= done0:
+            return None
+        return (done - done0) / (t - t0) * 60
+
+    def row(self, now):
+        """Cells of the dashboard table."""
+        elapsed = _duration((self.end or now) - self.start)
+        progress = rate = eta = ""
+        if self.progress is not None:
+            done, total, label, _ = self.progress
+            progress = f"{label} {done}/{total}".strip()
+            steps = self.rate()
+            if steps is not None:
+                rate = f"{steps:.2f}/min"
+                eta = _duration((total - done) / steps * 60)
+        color = {"running": "", "finished": "green", "failed": "red"}[self.status]
+        stage = self.stage if self.status == "running" else self.status
+        return (
+            self.name,
+            f"[{color}]{stage}[/]" if color else stage,
+            elapsed,
+            progress,
+            rate,
+            eta,
+        )
+
+
+class Dashboard:
+    """Collect the events of the jobs, and render them."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """Update the jobs with a new event (see :func:`events.subscribe`)."""
+        if event.job is None:
+            return
+        with self._lock:
+            if event.job not in self.jobs:
+                self.jobs[event.job] = Job(event.job, event.time)
+            self.jobs[event.job].update(event)
+
+    def render(self):
+        """Render the dashboard as a table."""
+        now = time.time()
+        table = rich.table.Table(
+            "job", "stage", "elapsed", "progress", "rate", "eta", expand=True
+        )
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            table.add_row(*job.row(now))
+
+        finished = sum(job.status == "finished" for job in jobs)
+        hours = max(now - self.start, 1.0) / 3600
+        cpu, memory = node_load()
+        load = " · ".join(
+            [
+                f"{finished}/{len(jobs)} jobs finished ({finished / hours:.1f}/h)",
+                "CPU " + ("n/a" if cpu is None else f"{cpu:.0%}"),
+                "memory " + ("n/a" if memory is None else f"{memory:.0%}"),
+            ]
+        )
+        table.caption = load
+        return table
+
+    @contextlib.contextmanager
+    def live(self, refresh=1.0):
+        """Show the dashboard, while the context is active.
+
+        The output of the runs is only sent to their log files in the meanwhile,
+        in order not to garble the dashboard.
+
+        Parameters
+        ----------
+        refresh : float
+            interval between updates (in seconds)
+
+        """
+        console = rich.console.Console(file=log.terminal())
+        with events.subscribed(self), log.muted():
+            with rich.live.Live(
+                get_renderable=self.render,
+                console=console,
+                refresh_per_second=1.0 / refresh,
+                redirect_stdout=False,
+                redirect_stderr=False,
+            ):
+                yield self
@@ -0,0 +1,90 @@
+"""Events emitted by the runs, to monitor their progress.
+
+The runs emit events for the start of each stage and for the progress of the
+external programs (e.g. completed integration channels or seeds), which are
+forwarded to all the subscribers (e.g. :class:`pinefarm.dashboard.Dashboard`).
+
+Each event is attributed to the job active in the current context (thread or
+task), see :func:`job`.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import threading
+import time
+import typing
+
+_job = contextvars.ContextVar("job", default=None)
+"""Job active in the current context."""
+_subscribers = []
+_lock = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class Event:
+    """Event emitted by a run.
+
+    The known kinds are:
+
+    - ``stage``: a new stage started (``stage``)
+    - ``progress``: ``done`` out of ``total`` steps of a stage completed, with
+      a ``label`` describing the steps
+    - ``finished``: the job completed successfully
+    - ``failed``: the job failed (``error``)
+
+    """
+
+    job: typing.Optional[str]
+    kind: str
+    data: dict
+    time: float
+
+
+def subscribe(callback):
+    """Register a callback, called with each :class:`Event`.
+
+    Callbacks are called in the thread emitting the event, so they should be
+    fast and thread-safe.
+
+    """
+    with _lock:
+        _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    """Remove a registered callback."""
+    with _lock:
+        _subscribers.remove(callback)
+
+
+@contextlib.contextmanager
+def subscribed(callback):
+    """Register a callback, only within the context."""
+    subscribe(callback)
+    try:
+        yield callback
+    finally:
+        unsubscribe(callback)
+
+
+@contextlib.contextmanager
+def job(name):
+    """Attribute the events emitted in the context to the job ``name``."""
+    token = _job.set(name)
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+def emit(kind, **data):
+    """Emit an event, attributed to the current job."""
+    with _lock:
+        subscribers = list(_subscribers)
+    if not subscribers:
+        return
+    event = Event(job=_job.get(), kind=kind, data=data, time=time.time())
+    for callback in subscribers:
+        callback(event)
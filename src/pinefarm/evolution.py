@@ -0,0 +1,372 @@
+"""Evolution of the grids into FK tables, with EKO.
+
+The evolution operator of a grid only depends on the theory, on the nodes of
+the grid (momentum fractions and factorization scales) and on the kind of the
+convolutions, such that grids sharing them (e.g. several observables of the
+same dataset, or datasets with the same interpolation and scales) also share
+the operator.
+The operators are stored in the cache (``eko`` folder in ``paths::cache``),
+keyed by the hash of all these inputs, and reused across runs and datasets,
+while the least recently used ones are evicted when the cache exceeds
+``evolve::cache_size`` bytes.
+
+The operators missing from the cache are computed in worker processes, and
+then the grids are evolved in worker processes as well.
+"""
+
+import concurrent.futures
+import contextlib
+import dataclasses
+import json
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+import pineappl
+
+from . import __version__, configs, stages, tools
+
+CACHE_SIZE = 20 * 2**30
+"""Default maximum size of the operators cache (in bytes)."""
+OPERATOR = {
+    "interpolation_polynomial_degree": 4,
+    "interpolation_is_log": True,
+    "ev_op_iterations": 1,
+    "ev_op_max_order": 10,
+    "n_integration_cores": 1,
+    "debug_skip_singlet": False,
+    "debug_skip_non_singlet": False,
+}
+"""Operator card settings, completed with the nodes of each grid."""
+ASSUMPTIONS = "Nf6Ind"
+"""Assumptions used to optimize the FK tables."""
+
+
+def theory_card(theory):
+    """Complete a theory card with the defaults of the NNPDF theories.
+
+    Parameters
+    ----------
+    theory : dict
+        theory card
+
+    Returns
+    -------
+    dict
+        full theory card (in the legacy format understood by EKO), without
+        the unset entries
+
+    """
+    from nnpdf_data import theory as nnpdf_theory  # pylint: disable=C0415
+
+    fields = {field.name for field in dataclasses.fields(nnpdf_theory.TheoryCard)}
+    card = nnpdf_theory.TheoryCard(**{k: v for k, v in theory.items() if k in fields})
+    if card.XIF != 1.0:
+        raise ValueError(
+            f"Theory {card.ID}: factorization scale variations are not supported"
+        )
+    return {k: v for k, v in card.asdict().items() if v is not None}
+
+
+def order_mask(grid, theory):
+    """Orders of the grid included by the theory."""
+    return pineappl.boc.Order.create_mask(
+        grid.orders(), theory["PTO"] + 1, theory["QED"], True
+    )
+
+
+def operator_card(info, convolution):
+    """Build the operator card for the nodes of a grid.
+
+    Parameters
+    ----------
+    info : pineappl.evolution.EvolveInfo
+        nodes of the grid
+    convolution : pineappl.convolutions.Conv
+        convolution to be evolved
+
+    Returns
+    -------
+    dict
+        operator card (in the legacy format)
+
+    """
+    xgrid = sorted(float(x) for x in info.x1)
+    card = dict(OPERATOR)
+    card["interpolation_polynomial_degree"] = min(
+        OPERATOR["interpolation_polynomial_degree"], len(xgrid) - 1
+    )
+    card["interpolation_xgrid"] = xgrid
+    card["mugrid"] = sorted(float(np.sqrt(mu2)) for mu2 in info.fac1)
+    card["polarized"] = convolution.convolution_types.polarized
+    card["time_like"] = convolution.convolution_types.time_like
+    return card
+
+
+def key(theory, card):
+    """Hash identifying an operator."""
+    import eko  # pylint: disable=import-outside-toplevel
+
+    relevant = {k: v for k, v in theory.items() if k not in ("ID", "Comments")}
+    return stages.digest(eko.version.__version__, relevant, card)[:32]
+
+
+def cache_folder():
+    """Folder of the operators cache."""
+    return configs.configs["paths"]["cache"] / "eko"
+
+
+def operator(theory, card, folder):
+    """Compute an operator, unless already in the cache.
+
+    The computation is guarded by a file lock, such that concurrent runs
+    needing the same operator compute it only once.
+
+    Parameters
+    ----------
+    theory : dict
+        full theory card
+    card : dict
+        operator card
+    folder : pathlib.Path
+        cache folder
+
+    Returns
+    -------
+    pathlib.Path
+        path of the operator
+
+    """
+    import eko  # pylint: disable=import-outside-toplevel
+    from eko.io import runcards  # pylint: disable=import-outside-toplevel
+
+    folder.mkdir(parents=True, exist_ok=True)
+    digest = key(theory, card)
+    path = folder / f"{digest}.tar"
+    with tools.file_lock(folder / f".{digest}.lock"):
+        if path.exists():
+            # mark as recently used
+            os.utime(path)
+            return path
+
+        legacy = runcards.Legacy(theory, card)
+        with tempfile.TemporaryDirectory(dir=folder) as tmp:
+            partial = pathlib.Path(tmp) / path.name
+            eko.solve(legacy.new_theory, legacy.new_operator, partial)
+            os.replace(partial, path)
+    return path
+
+
+def evict(folder, limit, keep=()):
+    """Remove the least recently used operators, beyond the size limit.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        cache folder
+    limit : int
+        maximum total size (in bytes)
+    keep : list(pathlib.Path)
+        operators never removed (e.g. those in use)
+
+    Returns
+    -------
+    list(pathlib.Path)
+        removed operators
+
+    """
+    operators = sorted(folder.glob("*.tar"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in operators)
+    removed = []
+    for path in operators:
+        if total <= limit:
+            break
+        if path in keep:
+            continue
+        total -= path.stat().st_size
+        path.unlink()
+        removed.append(path)
+    return removed
+
+
+def alphas(operator_, ren1, xir):
+    """Strong coupling on the renormalization scales, as used by EKO.
+
+    Parameters
+    ----------
+    operator_ : eko.EKO
+        operator, carrying the theory and operator cards
+    ren1 : list(float)
+        renormalization scales of the grid
+    xir : float
+        renormalization scale ratio
+
+    Returns
+    -------
+    list(float)
+        values of the strong coupling
+
+    """
+    # pylint: disable=import-outside-toplevel
+    from eko import matchings
+    from eko.io import runcards
+    from eko.runner import commons
+
+    tcard = operator_.theory_card
+    ocard = operator_.operator_card
+    strong = commons.couplings(tcard, ocard)
+    masses = np.array(runcards.masses(tcard, ocard.configs.evolution_method))
+    atlas = matchings.Atlas(
+        matching_scales=(np.power(tcard.heavy.matching_ratios, 2.0) * masses).tolist(),
+        origin=(tcard.couplings.ref[0] ** 2, tcard.couplings.ref[1]),
+    )
+    scales = [xir * xir * mu2 for mu2 in ren1]
+    return [
+        4.0 * np.pi * strong.a_s(mu2, nf_to=matchings.nf_default(mu2, atlas))
+        for mu2 in scales
+    ]
+
+
+def _slices(operator_, convolution):
+    """Operator slices, as consumed by the evolution of the grids."""
+    from eko import basis_rotation  # pylint: disable=import-outside-toplevel
+
+    x = operator_.xgrid.raw
+    pids = basis_rotation.flavor_basis_pids
+    for (mu2, _), op in operator_.items():
+        info = pineappl.evolution.OperatorSliceInfo(
+            fac0=operator_.mu20,
+            pids0=pids,
+            x0=x,
+            fac1=mu2,
+            pids1=pids,
+            x1=x,
+            pid_basis=pineappl.pids.PidBasis.Pdg,
+            convolution_types=convolution.convolution_types,
+        )
+        yield info, op.operator
+
+
+def evolve_grid(path, theory, operators, fktable):
+    """Evolve a grid into an FK table.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        grid
+    theory : dict
+        full theory card
+    operators : list(pathlib.Path)
+        operator of each convolution of the grid
+    fktable : pathlib.Path
+        FK table to write
+
+    Returns
+    -------
+    pathlib.Path
+        FK table
+
+    """
+    import eko  # pylint: disable=import-outside-toplevel
+
+    grid = pineappl.grid.Grid.read(str(path))
+    mask = order_mask(grid, theory)
+    info = grid.evolve_info(mask)
+    xir = theory["XIR"]
+
+    with contextlib.ExitStack() as stack:
+        ekos = [stack.enter_context(eko.EKO.read(op)) for op in operators]
+        fk = grid.evolve(
+            slices=[_slices(op, conv) for op, conv in zip(ekos, grid.convolutions)],
+            order_mask=mask,
+            xi=(xir, 1.0, 1.0),
+            ren1=info.ren1,
+            alphas=alphas(ekos[0], info.ren1, xir),
+        )
+    fk.optimize(pineappl.fk_table.FkAssumptions(ASSUMPTIONS))
+
+    for entry, value in grid.metadata.items():
+        fk.set_metadata(entry, value)
+    fk.set_metadata("theory", json.dumps(theory))
+    fk.set_metadata("eko_version", eko.version.__version__)
+    fk.set_metadata("pinefarm", __version__)
+    fk.write_lz4(str(fktable))
+    return fktable
+
+
+def _map(function, *arguments, jobs):
+    """Map over worker processes (serially, if not worth it)."""
+    jobs = min(jobs, len(arguments[0]))
+    if jobs <= 1:
+        return list(map(function, *arguments))
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(function, *arguments))
+
+
+def evolve(grids, theory, dest, jobs=None):
+    """Evolve grids into FK tables, reusing the cached operators.
+
+    Parameters
+    ----------
+    grids : list(pathlib.Path)
+        grids to evolve
+    theory : dict
+        theory card
+    dest : pathlib.Path
+        folder of the FK tables (named as the grids)
+    jobs : int or None
+        number of worker processes (default: the configured core budget)
+
+    Returns
+    -------
+    list(pathlib.Path)
+        FK tables
+    int
+        number of operators reused from the cache
+
+    """
+    jobs = configs.cores() if jobs is None else jobs
+    theory = theory_card(theory)
+    folder = cache_folder()
+    folder.mkdir(parents=True, exist_ok=True)
+
+    keys = []
+    cards = {}
+    for path in grids:
+        grid = pineappl.grid.Grid.read(str(path))
+        info = grid.evolve_info(order_mask(grid, theory))
+        keys.append([])
+        for convolution in grid.convolutions:
+            card = operator_card(info, convolution)
+            digest = key(theory, card)
+            cards[digest] = card
+            keys[-1].append(digest)
+
+    reused = sum((folder / f"{digest}.tar").exists() for digest in cards)
+    paths = dict(
+        zip(
+            cards,
+            _map(
+                operator,
+                [theory] * len(cards),
+                list(cards.values()),
+                [folder] * len(cards),
+                jobs=jobs,
+            ),
+        )
+    )
+
+    dest.mkdir(parents=True, exist_ok=True)
+    fktables = _map(
+        evolve_grid,
+        list(grids),
+        [theory] * len(grids),
+        [[paths[digest] for digest in digests] for digests in keys],
+        [dest / path.name for path in grids],
+        jobs=jobs,
+    )
+
+    limit = configs.configs.get("evolve", {}).get("cache_size", CACHE_SIZE)
+    evict(folder, limit, keep=list(paths.values()))
+    return fktables, reused
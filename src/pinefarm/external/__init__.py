@@ -8,7 +8,7 @@ eager import and thus unnecessary installations of external codes.
 from ..configs import configs
 
 
-def decide_external_tool(dsname: str):
+def decide_external_tool(dsname: str, runcards_path=None):
     """Decide the external tool to be used.
 
     The decisions are based on the existence of a `.yaml` file with a specific name.
@@ -17,6 +17,8 @@ def decide_external_tool(dsname: str):
     ----------
     dsname:
         name of the pinecard
+    runcards_path:
+        folder containing the pinecard (default: ``paths::runcards``)
 
     Returns
     -------
@@ -25,6 +27,9 @@ def decide_external_tool(dsname: str):
     color:
         color code of the interface
     """
+    if runcards_path is None:
+        runcards_path = configs["paths"]["runcards"]
+
     # The decisions are usually based on the existence of a `.yaml` file with a specific name
     # or a prefix in the pinecard
     if dsname.startswith("NNLOJET"):
@@ -33,28 +38,28 @@ def decide_external_tool(dsname: str):
         return NNLOJET, "blue"
 
     # DIS with yadism
-    if (configs["paths"]["runcards"] / dsname / "observable.yaml").exists():
+    if (runcards_path / dsname / "observable.yaml").exists():
         from . import yad  # pylint: disable=import-outside-toplevel
 
         return yad.Yadism, "red"
 
-    if (configs["paths"]["runcards"] / dsname / "vrap.yaml").exists():
+    if (runcards_path / dsname / "vrap.yaml").exists():
         from . import vrap  # pylint: disable=import-outside-toplevel
 
         return vrap.Vrap, "green"
 
-    if (configs["paths"]["runcards"] / dsname / "positivity.yaml").exists():
+    if (runcards_path / dsname / "positivity.yaml").exists():
         from . import positivity  # pylint: disable=import-outside-toplevel
 
         return positivity.Positivity, "yellow"
 
-    if (configs["paths"]["runcards"] / dsname / "integrability.yaml").exists():
+    if (runcards_path / dsname / "integrability.yaml").exists():
         from . import integrability  # pylint: disable=import-outside-toplevel
 
         return integrability.Integrability, "brown"
 
     # Try with Madgraph...
-    if (configs["paths"]["runcards"] / dsname / "launch.txt").exists():
+    if (runcards_path / dsname / "launch.txt").exists():
         from . import mg5  # pylint: disable=import-outside-toplevel
 
         return mg5.Mg5, "blue"
@@ -10,9 +10,12 @@ import pineappl
 import yaml
 from eko import basis_rotation as br
 
+from .. import pdftable
 from . import interface
 
 _RUNCARD = "integrability.yaml"
+VERSION = "1.0"
+"""Version of the integrability grids."""
 
 
 def evolution_to_flavour(evol_fl):
@@ -39,6 +42,141 @@ class _IntegrabilityRuncard:
         return dataclasses.asdict(self)
 
 
+def build_grid(runcard, q2):
+    """Build the grid of an integrability pseudo-observable.
+
+    Parameters
+    ----------
+    runcard : dict
+        content of ``integrability.yaml``
+    q2 : float
+        scale of the pseudo-observable (the squared initial scale of the theory)
+
+    Returns
+    -------
+    pineappl.grid.Grid
+        optimized grid, with the runcard stored in the metadata
+
+    """
+    info = _IntegrabilityRuncard(**runcard)
+    xgrid = np.array(info.xgrid)
+    # a single bin, integrating over the whole x grid
+    bin_limits = [0.0, 1.0]
+
+    ## Generate the grid
+    channels = [([fl], w) for fl, w in evolution_to_flavour(info.flavour)]
+    channels = [pineappl.boc.Channel(channels)]
+    # Set default parameters
+    orders = [pineappl.boc.Order(0, 0, 0, 0, 0)]
+    convolution_types = pineappl.convolutions.ConvType(
+        polarized=info.convolution_type == "PolPDF", time_like=False
+    )
+    convolutions = [
+        pineappl.convolutions.Conv(convolution_types=convolution_types, pid=2212)
+    ]
+    kinematics = [pineappl.boc.Kinematics.Scale(0), pineappl.boc.Kinematics.X(0)]
+    scale_funcs = pineappl.boc.Scales(
+        ren=pineappl.boc.ScaleFuncForm.Scale(0),
+        fac=pineappl.boc.ScaleFuncForm.Scale(0),
+        frg=pineappl.boc.ScaleFuncForm.NoScale(0),
+    )
+    bin_limits = pineappl.boc.BinsWithFillLimits.from_fill_limits(
+        fill_limits=bin_limits
+    )
+    interpolations = [
+        pineappl.interpolation.Interp(
+            min=1,
+            max=1e2,
+            nodes=50,
+            order=3,
+            reweight_meth=pineappl.interpolation.ReweightingMethod.NoReweight,
+            map=pineappl.interpolation.MappingMethod.ApplGridH0,
+            interpolation_meth=pineappl.interpolation.InterpolationMethod.Lagrange,
+        ),  # Interpolation on the Scale
+        pineappl.interpolation.Interp(
+            min=1e-9,
+            max=1,
+            nodes=40,
+            order=3,
+            reweight_meth=pineappl.interpolation.ReweightingMethod.ApplGridX,
+            map=pineappl.interpolation.MappingMethod.ApplGridF2,
+            interpolation_meth=pineappl.interpolation.InterpolationMethod.Lagrange,
+        ),  # Interpolation on momentum fraction x
+    ]
+    # Initialize and parametrize grid
+    grid = pineappl.grid.Grid(
+        pid_basis=pineappl.pids.PidBasis.Evol,
+        channels=channels,
+        orders=orders,
+        bins=bin_limits,
+        convolutions=convolutions,
+        interpolations=interpolations,
+        kinematics=kinematics,
+        scale_funcs=scale_funcs,
+    )
+    subgrid = pineappl.subgrid.ImportSubgridV1(
+        array=np.full((1, xgrid.size), xgrid),
+        node_values=[[q2], xgrid],
+    )
+    grid.set_subgrid(0, 0, 0, subgrid.into())
+
+    limits = [[(q2, q2), (float(xgrid[0]), float(xgrid[-1]))]]
+
+    # set the correct observables
+    normalizations = [1.0]
+    bin_configs = pineappl.boc.BinsWithFillLimits.from_limits_and_normalizations(
+        limits=limits,
+        normalizations=normalizations,
+    )
+    grid.set_bwfl(bin_configs)
+
+    # set the initial state PDF ids for the grid
+    grid.set_metadata(
+        "runcard",
+        json.dumps(info.asdict()),
+    )
+
+    grid.optimize()
+    return grid
+
+
+def predictions(pdf, runcard, q2):
+    """Compute the pseudo-observable directly from a PDF.
+
+    Parameters
+    ----------
+    pdf : lhapdf.PDF
+        loaded PDF member
+    runcard : dict
+        content of ``integrability.yaml``
+    q2 : float
+        scale of the pseudo-observable
+
+    Returns
+    -------
+    pandas.DataFrame
+        standardized dataframe with results (see
+        :meth:`pinefarm.external.interface.External.results`)
+
+    """
+    info = _IntegrabilityRuncard(**runcard)
+    final_result = 0.0
+    q2 = q2 * np.ones_like(info.xgrid)
+
+    for fl, w in evolution_to_flavour(info.flavour):
+        final_result += w * np.sum(pdf.xfxQ2(fl, info.xgrid, q2))
+
+    final_cv = [final_result]
+
+    d = {
+        "result": final_cv,
+        "error": np.zeros_like(final_cv),
+        "sv_min": np.zeros_like(final_cv),
+        "sv_max": np.zeros_like(final_cv),
+    }
+    return pd.DataFrame(data=d)
+
+
 class Integrability(interface.External):
     """Interface provider."""
 
@@ -60,108 +198,12 @@ class Integrability(interface.External):
 
     def generate_pineappl(self):
         """Generate the pineappl grid for the integrability observable."""
-        xgrid = np.array(self._info.xgrid)
-        bins_length = len(xgrid)
-        bin_limits = [float(i) for i in range(0, bins_length + 1)]
-
-        ## Generate the grid
-        channels = [([fl], w) for fl, w in self._evo2fl]
-        channels = [pineappl.boc.Channel(channels)]
-        # Set default parameters
-        orders = [pineappl.boc.Order(0, 0, 0, 0, 0)]
-        convolution_types = pineappl.convolutions.ConvType(
-            polarized=self.polarized, time_like=False
-        )
-        convolutions = [
-            pineappl.convolutions.Conv(convolution_types=convolution_types, pid=2212)
-        ]
-        kinematics = [pineappl.boc.Kinematics.Scale(0), pineappl.boc.Kinematics.X(0)]
-        scale_funcs = pineappl.boc.Scales(
-            ren=pineappl.boc.ScaleFuncForm.Scale(0),
-            fac=pineappl.boc.ScaleFuncForm.Scale(0),
-            frg=pineappl.boc.ScaleFuncForm.NoScale(0),
-        )
-        bin_limits = pineappl.boc.BinsWithFillLimits.from_fill_limits(
-            fill_limits=bin_limits
-        )
-        interpolations = [
-            pineappl.interpolation.Interp(
-                min=1,
-                max=1e2,
-                nodes=50,
-                order=3,
-                reweight_meth=pineappl.interpolation.ReweightingMethod.NoReweight,
-                map=pineappl.interpolation.MappingMethod.ApplGridH0,
-                interpolation_meth=pineappl.interpolation.InterpolationMethod.Lagrange,
-            ),  # Interpolation on the Scale
-            pineappl.interpolation.Interp(
-                min=1e-9,
-                max=1,
-                nodes=40,
-                order=3,
-                reweight_meth=pineappl.interpolation.ReweightingMethod.ApplGridX,
-                map=pineappl.interpolation.MappingMethod.ApplGridF2,
-                interpolation_meth=pineappl.interpolation.InterpolationMethod.Lagrange,
-            ),  # Interpolation on momentum fraction x
-        ]
-        # Initialize and parametrize grid
-        grid = pineappl.grid.Grid(
-            pid_basis=pineappl.pids.PidBasis.Evol,
-            channels=channels,
-            orders=orders,
-            bins=bin_limits,
-            convolutions=convolutions,
-            interpolations=interpolations,
-            kinematics=kinematics,
-            scale_funcs=scale_funcs,
-        )
-        subgrid = pineappl.subgrid.ImportSubgridV1(
-            array=np.full((1, xgrid.size), xgrid),
-            node_values=[[self._q2], xgrid],
-        )
-        grid.set_subgrid(0, 0, 0, subgrid.into())
-
-        limits = [[(self._q2, self._q2), (xgrid, xgrid)]]
-
-        # set the correct observables
-        normalizations = [1.0] * bins_length
-        bin_configs = pineappl.boc.BinsWithFillLimits.from_limits_and_normalizations(
-            limits=limits,
-            normalizations=normalizations,
-        )
-        grid.set_bwfl(bin_configs)
-
-        # set the initial state PDF ids for the grid
-        grid.set_metadata(
-            "runcard",
-            json.dumps(self._info.asdict()),
-        )
-
-        # dump file
-        grid.optimize()
-        grid.write(self.grid)
+        build_grid(self._info.asdict(), self._q2).write(self.grid)
 
     def collect_versions(self):
         """Add the version defined by this file."""
-        return {"integrability_version": "1.0"}
+        return {"integrability_version": VERSION}
 
     def results(self):
         """Apply PDF to grid."""
-        import lhapdf  # pylint: disable=import-error
-
-        pdf = lhapdf.mkPDF(self.pdf)
-        final_result = 0.0
-        q2 = self._q2 * np.ones_like(self._info.xgrid)
-
-        for fl, w in self._evo2fl:
-            final_result += w * np.sum(pdf.xfxQ2(fl, self._info.xgrid, q2))
-
-        final_cv = [final_result]
-
-        d = {
-            "result": final_cv,
-            "error": np.zeros_like(final_cv),
-            "sv_min": np.zeros_like(final_cv),
-            "sv_max": np.zeros_like(final_cv),
-        }
-        return pd.DataFrame(data=d)
+        return predictions(pdftable.load(self.pdf), self._info.asdict(), self._q2)
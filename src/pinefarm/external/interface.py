@@ -10,7 +10,28 @@ import tempfile
 
 import pineappl
 
-from .. import __version__, configs, install, tools
+from .. import __version__, configs, install, stages, tools
+
+
+def archive_pinecard(source) -> str:
+    """Load a pinecard directory as b64encoded .tar.gz file."""
+    # shutils wants to create a true file, so we go through a temp dir
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        p = pathlib.Path(tmpdirname) / "pinecard"
+        shutil.make_archive(p, format="gztar", root_dir=source)
+        with open(p.with_suffix(".tar.gz"), "rb") as fd:
+            return base64.b64encode(fd.read()).decode("ascii")
+
+
+def pinecard_metadata(source):
+    """Read the metadata entries listed in the ``metadata.txt`` of a pinecard."""
+    metadata = source / "metadata.txt"
+    entries = {}
+    if metadata.exists():
+        for line in metadata.read_text().splitlines():
+            k, v = line.split("=")
+            entries[k] = v
+    return entries
 
 
 class External(abc.ABC):
@@ -73,6 +94,22 @@ class External(abc.ABC):
         """Target PineAPPL grid name."""
         return self.dest / f"{self.name}.pineappl"
 
+    @property
+    def grids(self):
+        """Target PineAPPL grids, indexed by observable.
+
+        Runners generating a single grid only have :attr:`grid`, indexed by
+        the dataset name.
+
+        """
+        return {self.name: self.grid}
+
+    def results_log(self, observable):
+        """Comparison table for the grid of a given observable."""
+        if len(self.grids) == 1:
+            return self.dest / "results.log"
+        return self.dest / f"results_{observable}.log"
+
     @property
     def gridtmp(self):
         """Intermediate PineAPPL grid name."""
@@ -84,6 +121,38 @@ class External(abc.ABC):
             output_grid = self.grid
         shutil.move(str(self.gridtmp), str(output_grid))
 
+    def generation_inputs(self):
+        """Inputs determining the generated grids.
+
+        Returns
+        -------
+        dict
+            theory and pinecard files (except for the ones only affecting the
+            postprocessing)
+
+        """
+        return {
+            "theory": self.theory,
+            "pinecard": stages.files_digest(
+                self.source, exclude=stages.POSTPROCESS_FILES
+            ),
+        }
+
+    def features(self):
+        """Size features of the run, known before running it.
+
+        They are used to predict the resources of the run from the history of
+        the previous ones (see :mod:`pinefarm.history`), in particular the
+        ``size`` feature, if any, is the one on which the cost mostly depends.
+
+        Returns
+        -------
+        dict
+            JSON-serializable features
+
+        """
+        return {"pto": self.theory.get("PTO")}
+
     @staticmethod
     def install():
         """Install all needed programs."""
@@ -94,6 +163,34 @@ class External(abc.ABC):
         """Run the preparation method of the runner."""
         return False
 
+    def prepare_shared(self, folder):
+        """Prepare the inputs not depending on the theory.
+
+        In a theory sweep, this is executed only once, by one of the runners,
+        and the outcome is imported by all of them with :meth:`import_shared`.
+        By default, nothing is shared.
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            folder in which the shared inputs are stored
+
+        """
+
+    def import_shared(self, folder):
+        """Import the inputs prepared by :meth:`prepare_shared`.
+
+        By default, the content of the shared folder is copied in the output
+        folder (preserving symbolic links).
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+            folder in which the shared inputs are stored
+
+        """
+        shutil.copytree(folder, self.dest, symlinks=True, dirs_exist_ok=True)
+
     @abc.abstractmethod
     def run(self):
         """Execute the program."""
@@ -122,6 +219,22 @@ class External(abc.ABC):
 
         """
 
+    def observable_results(self, observable):  # pylint: disable=unused-argument
+        """Results as computed by the program, for a given observable.
+
+        Parameters
+        ----------
+        observable : str
+            observable, as in :attr:`grids`
+
+        Returns
+        -------
+        pandas.DataFrame
+            standardized dataframe with results, as in :meth:`results`
+
+        """
+        return self.results()
+
     @abc.abstractmethod
     def collect_versions(self) -> dict:
         """Collect necessary version informations.
@@ -136,16 +249,13 @@ class External(abc.ABC):
 
     def load_pinecard(self) -> str:
         """Load directory as b64encoded .tar.gz file."""
-        # shutils wants to create a true file, so we go through a temp dir
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            p = pathlib.Path(tmpdirname) / "pinecard"
-            shutil.make_archive(p, format="gztar", root_dir=self.source)
-            with open(p.with_suffix(".tar.gz"), "rb") as fd:
-                return base64.b64encode(fd.read()).decode("ascii")
+        return archive_pinecard(self.source)
 
     def annotate_versions(self):
-        """Add version informations as meta data."""
-        results_log = self.dest / "results.log"
+        """Add version informations as meta data to every generated grid."""
+        grids = {obs: grid for obs, grid in self.grids.items() if grid.exists()}
+        if not grids:
+            return
 
         versions = self.collect_versions()
         # the pinefarm version will also pin pineappl_py version and all the
@@ -157,10 +267,14 @@ class External(abc.ABC):
         entries = {}
         entries.update(versions)
         entries["results_pdf"] = self.pdf
-        tools.update_grid_metadata(
-            self.grid, self.gridtmp, entries, {"results": results_log}
-        )
-        self.update_with_tmp()
+        for observable, grid in grids.items():
+            tools.update_grid_metadata(
+                grid,
+                self.gridtmp,
+                entries,
+                {"results": self.results_log(observable)},
+            )
+            self.update_with_tmp(grid)
 
     def postprocess(self):
         """Postprocess grid(s).
@@ -173,42 +287,40 @@ class External(abc.ABC):
             GRID: if only one grid is available, path to the grid
             PINECARD: path to the pinecard folder
         """
-        if self.grid.exists():
-            os.environ["GRID"] = str(self.grid)
-            grids = [self.grid]
-        else:
+        # the variables are only set for the script, not for the whole process
+        env = dict(os.environ)
+        grids = [grid for grid in self.grids.values() if grid.exists()]
+        if len(grids) == 1:
+            env["GRID"] = str(grids[0])
+        elif not grids:
             grids = list(self.dest.glob("*.pineappl*"))
 
         if not grids:
             raise ValueError("Tried to run postprocessing in a folder with no grids?")
 
-        os.environ["PINECARD"] = self.source.as_posix()
+        env["PINECARD"] = self.source.as_posix()
 
         # apply postrun, if present and executable
         postrun = self.source / "postrun.sh"
         if postrun.exists():
             if os.access(postrun, os.X_OK):
                 shutil.copy2(self.source / "postrun.sh", self.dest)
-                subprocess.run("./postrun.sh", cwd=self.dest, check=True)
+                subprocess.run("./postrun.sh", cwd=self.dest, env=env, check=True)
             else:
                 raise ValueError(f"Postrun file present but not executable: {postrun}")
 
         # Add the metadata to *every single grid in the folder*
         # some of these might be just intermediate, apply it anyway
-        metadata = self.source / "metadata.txt"
-        entries = {}
-        if metadata.exists():
-            for line in metadata.read_text().splitlines():
-                k, v = line.split("=")
-                entries[k] = v
+        entries = pinecard_metadata(self.source)
 
         for ext in ["*.pineappl.lz4", "*.pineappl"]:
             for grid in self.dest.glob(ext):
                 tools.update_grid_metadata(grid, self.gridtmp, entries)
                 self.update_with_tmp(grid)
 
-        # compress if we have a single grid
-        if self.grid.exists():
-            compressed_path = tools.compress(self.grid)
-            if compressed_path.exists():
-                self.grid.unlink()
+        # compress the target grids
+        for grid in self.grids.values():
+            if grid.exists():
+                compressed_path = tools.compress(grid)
+                if compressed_path.exists():
+                    grid.unlink()
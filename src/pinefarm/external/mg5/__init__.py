@@ -1,15 +1,28 @@
 """Madgraph interface."""
 
+import concurrent.futures
+import contextvars
+import functools
 import json
-import pathlib
 import re
+import shutil
 import subprocess
 
 import numpy as np
 import pandas as pd
 import pineappl
 
-from ... import configs, install, log, tools
+from ... import (
+    combination,
+    configs,
+    install,
+    log,
+    metrics,
+    objcache,
+    pdftable,
+    stages,
+    tools,
+)
 from .. import interface
 from . import paths
 
@@ -21,6 +34,14 @@ import model loop_qcd_qed_sm_Gmu
 quit
 """
 "Instructions to set the correct model for MG5aMC\\@NLO."
+PROGRESS = re.compile(r"Idle:\s*(\d+),\s*Running:\s*(\d+),\s*Completed:\s*(\d+)")
+"Status of the integration jobs, as printed by MG5aMC\\@NLO."
+PARALLEL_SEEDS = re.compile(r"^#parallel_seeds\s+(\d+)\s*$", re.M)
+"Number of independent runs requested in the launch file."
+SEEDS = "seeds"
+"Folder of the independent runs, one per seed."
+LAUNCH_SETTING = re.compile(r"^\s*set\s+(nevents|req_acc_FO)\s+(\S+)", re.M | re.I)
+"Settings of the launch file determining the cost of a run."
 
 
 def url():
@@ -28,6 +49,127 @@ def url():
     return URL
 
 
+def progress(line):
+    """Parse the completion of the integration channels from the MG5 output."""
+    m = PROGRESS.search(line)
+    if m is None:
+        return None
+    idle, running, completed = (int(n) for n in m.groups())
+    return {
+        "done": completed,
+        "total": idle + running + completed,
+        "label": "channels",
+    }
+
+
+def set_option(card, name, value):
+    """Set an option in a MG5 configuration card, uncommenting it if needed."""
+    setting = f"{name} = {value}"
+    text = card.read_text() if card.exists() else ""
+    text, found = re.subn(
+        rf"^#?\s*{name}\s*=.*$", lambda _: setting, text, count=1, flags=re.M
+    )
+    card.write_text(text if found else f"{text}\n{setting}\n")
+
+
+def seed_launch(launch, seed):
+    """Set the seed of the run in the content of a launch file."""
+    setting = f"set iseed {seed}"
+    if re.search(r"^\s*set\s+iseed\b", launch, flags=re.M):
+        return re.sub(r"^\s*set\s+iseed\b.*$", setting, launch, flags=re.M)
+    launch, found = re.subn(
+        r"^(\s*launch\b.*)$", rf"\1\n{setting}", launch, count=1, flags=re.M
+    )
+    if not found:
+        raise ValueError("No 'launch' command found in the launch file")
+    return launch
+
+
+def launch_features(launch):
+    """Size features of a run, from the content of its launch file.
+
+    The cost of a run scales with the number of events times the number of
+    seeds or, for fixed-order runs, with the inverse square of the required
+    accuracy (if no number of events is set).
+
+    """
+    settings = {}
+    for m in LAUNCH_SETTING.finditer(launch):
+        try:
+            settings[m[1].lower()] = float(m[2])
+        except ValueError:
+            # not a plain number, e.g. a variable of the launch file
+            continue
+    m = PARALLEL_SEEDS.search(launch)
+    seeds = int(m[1]) if m is not None else 1
+    features = {"seeds": seeds}
+    if settings.get("nevents"):
+        features["events"] = int(settings["nevents"])
+        features["size"] = seeds * features["events"]
+    elif settings.get("req_acc_fo"):
+        features["accuracy"] = settings["req_acc_fo"]
+        features["size"] = seeds / features["accuracy"] ** 2
+    return features
+
+
+def hwu_table(mg5_dir):
+    """Read the bins of all the histograms from the HwU file of a run."""
+    madatnlo = next(iter(mg5_dir.glob("Events/run_01*/MADatNLO.HwU"))).read_text()
+    table = filter(
+        lambda line: re.match("^  [+-]", line) is not None, madatnlo.splitlines()
+    )
+    return np.array([[float(x) for x in line.split()] for line in table])
+
+
+def combine_tables(tables):
+    """Combine the HwU tables of independent runs.
+
+    All the columns are averaged with the inverse-variance weights of the
+    central results, and the errors are combined accordingly.
+
+    Parameters
+    ----------
+    tables : list(numpy.ndarray)
+        HwU tables of the runs (see :func:`hwu_table`)
+
+    Returns
+    -------
+    numpy.ndarray
+        combined table
+    numpy.ndarray
+        weight of each run, for each bin
+
+    """
+    tables = np.array(tables)
+    _, errors, weights = combination.weighted_average(tables[:, :, 2], tables[:, :, 3])
+    combined = tables[0].copy()
+    combined[:, 2:] = np.sum(weights[:, :, np.newaxis] * tables[:, :, 2:], axis=0)
+    combined[:, 3] = errors
+    return combined, weights
+
+
+def merge_histograms(mg5_dir):
+    """Merge the grids of all the histograms of a run, in histogram order.
+
+    The histograms are numbered as the blocks of the HwU file, such that they
+    have to be merged in numeric order (and not by name, which would place
+    ``amcblast_obs_10`` before ``amcblast_obs_2``) for the bins of the grid to
+    match the rows of :func:`hwu_table`.
+
+    """
+    paths = sorted(
+        mg5_dir.glob("Events/run_01*/amcblast_obs_*.pineappl"),
+        key=lambda p: int(p.stem.rsplit("_", 1)[1]),
+    )
+    # read the first one from file
+    grid = pineappl.grid.Grid.read(str(paths[0]))
+    # subsequently merge all the others (disk -> memory)
+    for path in paths[1:]:
+        grid.merge(pineappl.grid.Grid.read(str(path)))
+    metrics.inc("merged_bytes_total", sum(p.stat().st_size for p in paths))
+    return grid
+
+
 class Mg5(interface.External):
     """Interface provider."""
 
@@ -44,32 +186,66 @@ class Mg5(interface.External):
         """Return output dir."""
         return self.dest / self.name
 
+    @property
+    def run_dirs(self):
+        """Process folders of the runs, one for each seed."""
+        seeds = sorted(
+            (self.dest / SEEDS).glob(f"seed_*/{self.name}"),
+            key=lambda p: int(p.parent.name.split("_")[1]),
+        )
+        return seeds or [self.mg5_dir]
+
+    def generation_inputs(self):
+        """Include the PDF, and the patches and cuts shipped with pinefarm."""
+        inputs = super().generation_inputs()
+        inputs["pdf"] = self.pdf
+        for folder in (paths.cuts_code, paths.cuts_variables, paths.patches):
+            inputs[folder.name] = stages.files_digest(folder)
+        inputs["cut_type"] = stages.files_digest(
+            paths.subpkg, include=["cut_type.json"]
+        )
+        inputs["variables"] = stages.files_digest(
+            paths.subpkg.parents[1], include=["variables.json"]
+        )
+        return inputs
+
+    def features(self):
+        """Add the events (or accuracy) and seeds of the launch file."""
+        features = super().features()
+        features.update(launch_features((self.source / "launch.txt").read_text()))
+        return features
+
     @staticmethod
     def install():
         """Execute installer."""
-        install.pineappl()
-        install.mg5amc()
+        install.toolchain(["pineappl", "mg5amc"])
 
     @property
     def pdf_id(self):
         """Convert PDF to SetIndex."""
-        import lhapdf  # pylint: disable=import-error
+        return pdftable.load(self.pdf).info().get_entry("SetIndex")
 
-        return lhapdf.mkPDF(self.pdf).info().get_entry("SetIndex")
+    def prepare_process(self, folder):
+        """Generate the process code, independent of the theory.
 
-    def run(self):
-        """Execute program."""
+        Parameters
+        ----------
+        folder : pathlib.Path
+            folder in which the MG5 output is created
+
+        """
         # copy the output file to the directory and replace the variables
         output = (self.source / "output.txt").read_text().replace("@OUTPUT@", self.name)
-        output_file = self.dest / "output.txt"
+        output_file = folder / "output.txt"
         output_file.write_text(output)
 
         # create output folder
         log.subprocess(
             [str(configs.configs["commands"]["mg5"]), str(output_file)],
-            cwd=self.dest,
-            out=(self.dest / "output.log"),
+            cwd=folder,
+            out=(folder / "output.log"),
         )
+        mg5_dir = folder / self.name
 
         # copy patches if there are any; use xargs to properly signal failures
         for p in self.source.iterdir():
@@ -78,19 +254,112 @@ class Mg5(interface.External):
                     "patch -p1".split(),
                     input=p.read_text(),
                     text=True,
-                    cwd=self.mg5_dir,
+                    cwd=mg5_dir,
                 )
 
         # enforce proper analysis
         # - copy analysis.f
         analysis = (self.source / "analysis.f").read_text()
-        (self.mg5_dir / "FixedOrderAnalysis" / f"{self.name}.f").write_text(analysis)
+        (mg5_dir / "FixedOrderAnalysis" / f"{self.name}.f").write_text(analysis)
         # - update analysis card
-        analysis_card = self.mg5_dir / "Cards" / "FO_analyse_card.dat"
+        analysis_card = mg5_dir / "Cards" / "FO_analyse_card.dat"
         analysis_card.write_text(
             analysis_card.read_text().replace("analysis_HwU_template", self.name)
         )
 
+    def prepare_shared(self, folder):
+        """Generate the process code once for all the theories."""
+        self.prepare_process(folder)
+
+    def use_object_cache(self):
+        """Route the Fortran compilations through the compiled-object cache.
+
+        The objects are stored in the ``fortran`` folder of the cache, shared
+        by all the runs, such that only the sources modified by the cuts and
+        patches are compiled again.
+
+        """
+        mg5 = configs.configs.get("mg5", {})
+        if not mg5.get("object_cache", True):
+            return
+        compiler = shutil.which(mg5.get("fortran_compiler", "gfortran"))
+        if compiler is None:
+            return
+
+        wrapper = self.dest / "fortran-compiler"
+        wrapper.write_text(
+            objcache.wrapper(compiler, configs.configs["paths"]["cache"] / "fortran")
+        )
+        wrapper.chmod(0o755)
+        set_option(
+            self.mg5_dir / "Cards" / "amcatnlo_configuration.txt",
+            "fortran_compiler",
+            wrapper,
+        )
+
+    def launch_seeds(self, launch, seeds):
+        """Launch independent runs with different seeds, concurrently.
+
+        Each run gets its own copy of the process folder, and an equal share of
+        the cores. With more seeds than cores, each run gets a single core, and
+        at most as many runs as cores are executed at the same time.
+
+        Parameters
+        ----------
+        launch : str
+            content of the launch file
+        seeds : int
+            number of runs
+
+        """
+        budget = configs.cores()
+        cores = max(budget // seeds, 1)
+        channels = {}
+
+        def seed_progress(seed, line):
+            status = progress(line)
+            if status is None:
+                return None
+            # report the channels of all the runs together
+            channels[seed] = (status["done"], status["total"])
+            done, total = (sum(n) for n in zip(*list(channels.values())))
+            return dict(status, done=done, total=total)
+
+        def launch_seed(seed):
+            folder = self.dest / SEEDS / f"seed_{seed}"
+            folder.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(
+                self.mg5_dir, folder / self.name, symlinks=True, dirs_exist_ok=True
+            )
+            set_option(
+                folder / self.name / "Cards" / "amcatnlo_configuration.txt",
+                "nb_core",
+                cores,
+            )
+            launch_file = folder / "launch.txt"
+            launch_file.write_text(seed_launch(launch, seed))
+            log.subprocess(
+                [str(configs.configs["commands"]["mg5"]), str(launch_file)],
+                cwd=folder,
+                out=folder / "launch.log",
+                progress=functools.partial(seed_progress, seed),
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(min(seeds, budget)) as pool:
+            # each thread inherits the job the events are attributed to
+            futures = [
+                pool.submit(contextvars.copy_context().run, launch_seed, seed)
+                for seed in range(1, seeds + 1)
+            ]
+            for future in futures:
+                future.result()
+
+    def run(self):
+        """Execute program."""
+        # the process code might have been imported from a theory sweep
+        if not self.mg5_dir.exists():
+            self.prepare_process(self.dest)
+
         # copy the launch file to the directory and replace the variables
         launch = (self.source / "launch.txt").read_text().replace("@OUTPUT@", self.name)
 
@@ -181,11 +450,17 @@ class Mg5(interface.External):
                 self.patches.append(patch)
                 tools.patch(patch_file.read_text(), self.mg5_dir)
 
-        # launch run
+        # launch run, or independent runs with different seeds
+        self.use_object_cache()
+        m = PARALLEL_SEEDS.search(launch)
+        if m is not None and int(m[1]) > 1:
+            self.launch_seeds(launch, int(m[1]))
+            return
         log.subprocess(
             [str(configs.configs["commands"]["mg5"]), str(launch_file)],
             cwd=self.dest,
             out=self.dest / "launch.log",
+            progress=progress,
         )
 
     def generate_pineappl(self):
@@ -196,22 +471,25 @@ class Mg5(interface.External):
             self.grid.unlink()
 
         # merge the final bins
-        mg5_grids = sorted(
-            str(p.absolute())
-            for p in self.mg5_dir.glob("Events/run_01*/amcblast_obs_*.pineappl")
-        )
-        # read the first one from file
-        grid = pineappl.grid.Grid.read(mg5_grids[0])
-        # subsequently merge all the others (disk -> memory)
-        for path in mg5_grids[1:]:
-            grid.merge_from_file(path)
+        run_dirs = self.run_dirs
+        if len(run_dirs) == 1:
+            grid = merge_histograms(run_dirs[0])
+        else:
+            # combine the seeds, weighting each bin as the central result
+            _, weights = combine_tables([hwu_table(d) for d in run_dirs])
+            seed_grids = [d.parent / "grid.pineappl" for d in run_dirs]
+            for run_dir, seed_grid in zip(run_dirs, seed_grids):
+                merge_histograms(run_dir).write(str(seed_grid))
+            combined = self.dest / SEEDS / "combined.pineappl"
+            combination.merge_grids(seed_grids, combined, factors=weights)
+            grid = pineappl.grid.Grid.read(str(combined))
 
         # optimize the grids
         grid.optimize()
 
         # add results to metadata
         runcard = next(
-            iter(self.mg5_dir.glob("Events/run_01*/run_01*_tag_1_banner.txt"))
+            iter(run_dirs[0].glob("Events/run_01*/run_01*_tag_1_banner.txt"))
         )
         grid.set_key_value("runcard", runcard.read_text())
         # add generated cards to metadata
@@ -235,15 +513,8 @@ class Mg5(interface.External):
 
     def results(self):
         """Collect PDF results."""
-        madatnlo = next(
-            iter(self.mg5_dir.glob("Events/run_01*/MADatNLO.HwU"))
-        ).read_text()
-        table = filter(
-            lambda line: re.match("^  [+-]", line) is not None, madatnlo.splitlines()
-        )
-        df = pd.DataFrame(
-            np.array([[float(x) for x in line.split()] for line in table])
-        )
+        tables = [hwu_table(run_dir) for run_dir in self.run_dirs]
+        df = pd.DataFrame(tables[0] if len(tables) == 1 else combine_tables(tables)[0])
         # start column from 1
         df.columns += 1
         df["result"] = df[3]
@@ -1,4 +1,4 @@
 """NNLOJET interface."""
 
-from .nnpdf_interface import generate_pinecard_from_nnpdf
+from .nnpdf_interface import expand_datasets, generate_pinecard_from_nnpdf
 from .runner import NNLOJET
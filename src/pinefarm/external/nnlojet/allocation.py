@@ -0,0 +1,112 @@
+r"""Allocation of the production events among NNLOJET channels.
+
+The statistical error of each channel scales as :math:`\sigma_c = s_c /
+\sqrt{N_c}`, where :math:`N_c` is the number of events and :math:`s_c` the
+per-event standard deviation, while its cost is :math:`t_c N_c`, with
+:math:`t_c` the time per event.
+Both :math:`s_c` and :math:`t_c` are estimated from the warmup, and the
+variance of the sum of all channels for a given total cost :math:`B` is
+minimized by
+
+.. math::
+
+    N_c = B \frac{s_c / \sqrt{t_c}}{\sum_j s_j \sqrt{t_j}}
+
+Conversely, for a target error :math:`\epsilon` on the total, the required
+budget is :math:`B = (\sum_j s_j \sqrt{t_j})^2 / \epsilon^2`.
+"""
+
+import dataclasses
+import math
+
+from .combine import CROSS, Table, _outputs
+
+MIN_EVENTS = 1000
+"""Minimum number of events per production seed."""
+
+
+@dataclasses.dataclass
+class Warmup:
+    """Summary of the warmup of a channel."""
+
+    channel: str
+    cross: float
+    error: float
+    events: int
+    time: float
+
+    @classmethod
+    def load(cls, channel_dir, events, time):
+        """Read the cross section computed in the warmup of a channel.
+
+        Parameters
+        ----------
+        channel_dir : pathlib.Path
+            folder in which the warmup has been run
+        events : int
+            total number of events generated in the warmup
+        time : float
+            wall time (in seconds) of the warmup
+
+        """
+        dats = _outputs(channel_dir, CROSS, ".dat")
+        if not dats:
+            raise FileNotFoundError(f"No warmup cross section in '{channel_dir}'")
+        table = Table.load(dats[0])
+        return cls(
+            channel=channel_dir.name,
+            cross=float(table.values[0, 0]),
+            error=float(table.errors[0, 0]),
+            events=events,
+            time=time,
+        )
+
+    @property
+    def deviation(self):
+        """Standard deviation of a single event."""
+        return self.error * math.sqrt(self.events)
+
+    @property
+    def cost(self):
+        """Time per event (in seconds)."""
+        return max(self.time, 1e-6) / self.events
+
+
+def allocate(warmups, max_events, cpu_hours=None, precision=None):
+    """Distribute production events and seeds among channels.
+
+    Parameters
+    ----------
+    warmups : list(Warmup)
+        warmup summary of each channel
+    max_events : int
+        maximum number of events of a single production seed
+    cpu_hours : float or None
+        total CPU budget for the production
+    precision : float or None
+        target relative precision on the sum of all the channels, used if no
+        budget is given
+
+    Returns
+    -------
+    dict
+        number of ``events`` per seed and number of ``seeds``, for each channel
+
+    """
+    norm = sum(w.deviation * math.sqrt(w.cost) for w in warmups)
+    if cpu_hours is not None:
+        budget = cpu_hours * 3600.0
+    elif precision is not None:
+        target = precision * abs(sum(w.cross for w in warmups))
+        budget = norm**2 / target**2 if target > 0 else 0.0
+    else:
+        raise ValueError("Either a CPU budget or a target precision is needed")
+
+    allocation = {}
+    for w in warmups:
+        total = budget * w.deviation / math.sqrt(w.cost) / norm if norm > 0 else 0.0
+        seeds = max(math.ceil(total / max_events), 1)
+        events = max(math.ceil(total / seeds), MIN_EVENTS)
+        allocation[w.channel] = {"events": events, "seeds": seeds}
+
+    return allocation
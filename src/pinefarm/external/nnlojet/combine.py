@@ -0,0 +1,260 @@
+"""Combination of the NNLOJET outputs into the final results.
+
+The outputs of the production seeds of each channel are first averaged, then
+the channels are summed into the levels (``LO``, ``R``, ``V``, ...) and finally
+the levels are summed into the orders (``LO``, ``NLO``, ``NNLO``), following
+the same rules used to generate the ``combine.ini`` file.
+"""
+
+import concurrent.futures
+import contextlib
+import dataclasses
+import logging
+
+import numpy as np
+
+from ... import combination, configs
+from .runcardgen import COMBINE_OUTPUT_FOLDER, _channel_selection
+
+logger = logging.getLogger(__name__)
+
+TRIM = (3.5, 0.01)
+"""Outliers removal ``(threshold, fraction)``, as in the ``combine.ini`` defaults."""
+CROSS = "cross"
+"""Name of the NNLOJET total cross section observable."""
+SECTIONS = ("Parts", "Merge", "Final")
+"""Combination steps, named as the ``combine.ini`` sections."""
+
+
+@dataclasses.dataclass
+class Table:
+    """Content of an NNLOJET ``.dat`` file.
+
+    The values columns come with an associated error column (``<label>_Err``),
+    while the bins columns (if any) come first.
+
+    """
+
+    labels: list
+    bins: np.ndarray
+    values: np.ndarray
+    errors: np.ndarray
+
+    @classmethod
+    def load(cls, path):
+        """Load an NNLOJET ``.dat`` file."""
+        labels = None
+        with open(path) as fd:
+            for line in fd:
+                if line.startswith("#labels:"):
+                    labels = [lab.split("[")[0] for lab in line[8:].split()]
+                    break
+        if labels is None:
+            raise ValueError(f"No labels found in '{path}'")
+
+        data = np.loadtxt(path, comments="#", ndmin=2)
+        errors = [i for i, lab in enumerate(labels) if lab.endswith("_Err")]
+        values = [i - 1 for i in errors]
+        nbins = min(values)
+        return cls(
+            labels=labels[:nbins] + [labels[i] for i in values],
+            bins=data[:, :nbins],
+            values=data[:, values],
+            errors=data[:, errors],
+        )
+
+    def dump(self, path):
+        """Write the table in NNLOJET ``.dat`` format."""
+        nbins = self.bins.shape[1]
+        labels = self.labels[:nbins]
+        for lab in self.labels[nbins:]:
+            labels += [lab, f"{lab}_Err"]
+        header = " ".join(f"{lab}[{i}]" for i, lab in enumerate(labels, 1))
+
+        data = np.empty((self.values.shape[0], len(labels)))
+        data[:, :nbins] = self.bins
+        data[:, nbins::2] = self.values
+        data[:, nbins + 1 :: 2] = self.errors
+        np.savetxt(path, data, header=f"labels: {header}", comments="#")
+
+    def __add__(self, other):
+        """Sum independent contributions."""
+        return Table(
+            labels=self.labels,
+            bins=self.bins,
+            values=self.values + other.values,
+            errors=np.sqrt(self.errors**2 + other.errors**2),
+        )
+
+
+def _outputs(folder, observable, suffix):
+    """Find the NNLOJET outputs for a given observable in a folder."""
+    return sorted(
+        p for p in folder.glob(f"*{suffix}") if observable in p.name.split(".")
+    )
+
+
+def _seed_outputs(seed_dirs, observable, grids):
+    """Pair the ``.dat`` table and the ``.pine`` grid of each seed.
+
+    The seeds missing any of them (e.g. because they crashed) are skipped,
+    with a warning. The grid is only required if ``grids`` is set.
+
+    """
+    outputs = []
+    for seed in seed_dirs:
+        found = {"table": _outputs(seed, observable, ".dat")}
+        if grids:
+            found["grid"] = _outputs(seed, observable, ".pine")
+        missing = [kind for kind, paths in found.items() if not paths]
+        if missing:
+            logger.warning(
+                f"Skipping the incomplete seed '{seed}': no {' and no '.join(missing)}"
+                f" for '{observable}'"
+            )
+            continue
+        outputs.append((found["table"][0], found["grid"][0] if grids else None))
+    return outputs
+
+
+def combine_seeds(channel_dir, observable, grid=None, pool=None):
+    """Average the outputs of all the production seeds of a channel.
+
+    Only the seeds with all the outputs are combined, see :func:`_seed_outputs`.
+
+    Parameters
+    ----------
+    channel_dir : pathlib.Path
+        folder of the channel, containing the ``seed_*`` folders
+    observable : str
+        name of the observable
+    grid : pathlib.Path or None
+        if given, path where to store the averaged grid
+    pool : concurrent.futures.Executor or None
+        executor used to merge the grids
+
+    Returns
+    -------
+    Table
+        averaged results
+
+    """
+    outputs = _seed_outputs(
+        sorted(channel_dir.glob("seed_*")), observable, grid is not None
+    )
+    if not outputs:
+        raise FileNotFoundError(
+            f"No complete seed for '{observable}' in '{channel_dir}'"
+        )
+    tables = [Table.load(dat) for dat, _ in outputs]
+
+    values, errors, weights = combination.weighted_average(
+        [t.values for t in tables], [t.errors for t in tables], trim=TRIM
+    )
+    logger.info(f"Combined {len(tables)} seeds of '{observable}' in {channel_dir}")
+
+    if grid is not None:
+        # weight each bin as the central scale result
+        combination.merge_grids(
+            [pine for _, pine in outputs],
+            grid,
+            factors=weights[:, :, 0],
+            pool=pool,
+        )
+
+    return dataclasses.replace(tables[0], values=values, errors=errors)
+
+
+def combine(metadata, channels, dest):
+    """Combine all the outputs of a local NNLOJET run.
+
+    The results are stored in the ``combined`` subfolder of ``dest``, with one
+    ``<name>.<observable>.dat`` file (and ``.pineappl`` grid, for histograms
+    with grids) for each channel, level and order, respectively in the
+    ``Parts``, ``Merge`` and ``Final`` folders.
+
+    Parameters
+    ----------
+    metadata : YamlLOJET
+        information from the pinecard
+    channels : list(str)
+        levels to be included
+    dest : pathlib.Path
+        output folder of the run
+
+    Returns
+    -------
+    dict
+        final results, for each order and observable
+
+    """
+    output = dest / COMBINE_OUTPUT_FOLDER
+    for section in SECTIONS:
+        (output / section).mkdir(exist_ok=True, parents=True)
+
+    combinations = _channel_selection(metadata, channels)
+    allowed_levels = {lev for levels in combinations.values() for lev in levels}
+    merge_dict = metadata.active_channels(active_channels=allowed_levels)
+
+    observables = {CROSS: False}
+    observables.update({h.name: h.pineappl for h in metadata.histograms})
+
+    final = {order: {} for order in combinations}
+    # a single pool for all the grids merged
+    jobs = configs.cores()
+    executor = (
+        concurrent.futures.ProcessPoolExecutor(jobs)
+        if jobs > 1
+        else contextlib.nullcontext()
+    )
+    with executor as pool:
+        for observable, has_grid in observables.items():
+
+            def path(section, name, suffix):
+                return output / section / f"{name}.{observable}{suffix}"
+
+            def grid(section, name):
+                return path(section, name, ".pineappl") if has_grid else None
+
+            def combine_grids(section, name, source, parts):
+                if has_grid:
+                    combination.merge_grids(
+                        [grid(source, p) for p in parts], grid(section, name), pool=pool
+                    )
+
+            # [Parts]: average the seeds
+            parts = {}
+            for channel_list in merge_dict.values():
+                for channel in channel_list:
+                    parts[channel] = combine_seeds(
+                        dest / channel,
+                        observable,
+                        grid=grid("Parts", channel),
+                        pool=pool,
+                    )
+
+            # [Merge]: sum the channels of each level
+            levels = {}
+            for level, channel_list in merge_dict.items():
+                levels[level] = sum(
+                    (parts[c] for c in channel_list[1:]), parts[channel_list[0]]
+                )
+                combine_grids("Merge", level, "Parts", channel_list)
+
+            # [Final]: sum the levels of each order
+            for order, order_levels in combinations.items():
+                if not all(lev in levels for lev in order_levels):
+                    continue
+                final[order][observable] = sum(
+                    (levels[lev] for lev in order_levels[1:]), levels[order_levels[0]]
+                )
+                combine_grids("Final", order, "Merge", order_levels)
+
+            for section, tables in zip(SECTIONS[:2], (parts, levels)):
+                for name, table in tables.items():
+                    table.dump(path(section, name, ".dat"))
+            for order, tables in final.items():
+                if observable in tables:
+                    tables[observable].dump(path("Final", order, ".dat"))
+
+    return final
@@ -17,9 +17,18 @@ Some examples:
 ```
 """
 
+import dataclasses
+import fnmatch
+import importlib.metadata
+import pathlib
+import pickle
+import tempfile
 from copy import deepcopy
 
+import nnpdf_data
 import numpy as np
+import pandas as pd
+import yaml as pyyaml
 from nnpdf_data import load_dataset_metadata
 from ruamel.yaml import YAML, CommentedMap
 
@@ -31,11 +40,135 @@ yaml.indent(sequence=4, offset=2, mapping=4)
 HISTOGRAM_VARIABLES = {"y", "etay", "eta", "pT", "pT2", "M2"}
 
 
-def _legacy_nnpdf_translation(df, proc_type):
-    """When reading variables with k1/k2/k3 tries to figure out to which variables it corresponds."""
-    from validphys.filters import KIN_LABEL  # pylint: disable=E0401
+@dataclasses.dataclass
+class NNPDFDataset:
+    """Information loaded from an NNPDF dataset, as needed to generate a pinecard."""
+
+    process: str
+    process_type: str
+    cm_energy: float
+    experiment: str
+    operation: str
+    hepdata: str
+    arxiv: str
+    tables: list
+    kinematics: pd.DataFrame
+    legacy_labels: list = None
+
+
+def nnpdf_data_version():
+    """Version of the installed ``nnpdf_data`` package."""
+    return importlib.metadata.version("nnpdf_data")
+
+
+def _cached(cache, name, load):
+    """Load an object from the cache, computing and storing it if not available.
+
+    The cache is keyed by the ``nnpdf_data`` version, and ignored if `None`.
+
+    """
+    if cache is None:
+        return load()
+
+    path = pathlib.Path(cache) / "nnpdf_data" / nnpdf_data_version() / f"{name}.pkl"
+    if path.exists():
+        with open(path, "rb") as fd:
+            return pickle.load(fd)
+
+    obj = load()
+    path.parent.mkdir(exist_ok=True, parents=True)
+    # write atomically, since other processes might be reading the same entry
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as fd:
+        pickle.dump(obj, fd)
+    pathlib.Path(fd.name).replace(path)
+    return obj
+
+
+def load_nnpdf_dataset(nnpdf_dataset, cache=None):
+    """Load the information about an NNPDF dataset.
+
+    Parameters
+    ----------
+    nnpdf_dataset : str
+        name of the dataset
+    cache : os.PathLike or None
+        folder in which the loaded information is cached (no cache if `None`)
+
+    Returns
+    -------
+    NNPDFDataset
+        dataset information
+
+    """
+
+    def load():
+        metadata = load_dataset_metadata(nnpdf_dataset)
+        kin_df = metadata.load_kinematics(drop_minmax=False)
+
+        legacy_labels = None
+        if "k1" in kin_df.columns.get_level_values(0):
+            from validphys.filters import KIN_LABEL  # pylint: disable=E0401
+
+            legacy_labels = list(KIN_LABEL[metadata.process_type])
+
+        return NNPDFDataset(
+            process=metadata.process,
+            process_type=metadata.process_type,
+            cm_energy=metadata.cm_energy,
+            experiment=metadata.experiment,
+            operation=metadata.theory.operation,
+            hepdata=metadata._parent.hepdata.url,
+            arxiv=metadata._parent.arXiv.url,
+            tables=metadata.tables,
+            kinematics=kin_df,
+            legacy_labels=legacy_labels,
+        )
 
-    new_vars = list(KIN_LABEL[proc_type])
+    return _cached(cache, nnpdf_dataset, load)
+
+
+def available_datasets(cache=None):
+    """List the names of all the datasets available in ``nnpdf_data``."""
+
+    def load():
+        commondata = pathlib.Path(nnpdf_data.__file__).parent / "commondata"
+        names = []
+        for metadata in sorted(commondata.glob("*/metadata.yaml")):
+            with open(metadata, encoding="utf-8") as fd:
+                try:
+                    content = pyyaml.safe_load(fd)
+                except pyyaml.YAMLError:
+                    # skip malformed metadata, it could not be loaded anyhow
+                    continue
+            for obs in content.get("implemented_observables", []):
+                names.append(f"{metadata.parent.name}_{obs['observable_name']}")
+        return names
+
+    return _cached(cache, "index", load)
+
+
+def expand_datasets(patterns, cache=None):
+    """Expand shell-style patterns into the matching dataset names.
+
+    Names not containing any wildcard are passed through unchanged.
+
+    """
+    datasets = []
+    for pattern in patterns:
+        if any(c in pattern for c in "*?["):
+            matches = fnmatch.filter(available_datasets(cache), pattern.upper())
+            if not matches:
+                raise ValueError(f"No dataset matching '{pattern}'")
+            datasets.extend(matches)
+        else:
+            datasets.append(pattern)
+    # remove duplicates, preserving the order
+    return list(dict.fromkeys(datasets))
+
+
+def _legacy_nnpdf_translation(df, legacy_labels):
+    """When reading variables with k1/k2/k3 tries to figure out to which variables it corresponds."""
+    new_vars = list(legacy_labels)
     # Reorganize a bit the names to avoid extra problems
     if "M_ll" in new_vars:
         new_vars[new_vars.index("M_ll2")] = "M2"
@@ -231,18 +364,18 @@ def _generate_nnlojet_pinecard(runname, process, energy, experiment, histograms)
 
 
 def generate_pinecard_from_nnpdf(
-    nnpdf_dataset, scale="etz", output_path=".", observables=None
+    nnpdf_dataset, scale="etz", output_path=".", observables=None, cache=None
 ):
     """Generate a NNLOJET pinecard from an NNPDF dataset.
 
     Takes as input an NNPDF dataset, which will be loaded with the
-    nnpdf_data package.
+    nnpdf_data package (see :func:`load_nnpdf_dataset` for the ``cache``).
 
     If a list of observables is provided, only those in the list will be loaded
     from the dataframe.
     """
-    metadata = load_dataset_metadata(nnpdf_dataset)
-    kin_df = metadata.load_kinematics(drop_minmax=False)
+    metadata = load_nnpdf_dataset(nnpdf_dataset, cache=cache)
+    kin_df = metadata.kinematics.copy()
 
     if observables is not None:
         # If a list of observables is provided, select them from the dataframe
@@ -264,7 +397,7 @@ def generate_pinecard_from_nnpdf(
     # Is it legacy?
     if "k1" in kin_variables:
         # Time to translate!
-        _legacy_nnpdf_translation(kin_df, metadata.process_type)
+        _legacy_nnpdf_translation(kin_df, metadata.legacy_labels)
         kin_variables = kin_df.columns.get_level_values(0)
 
     hist_vars = list(HISTOGRAM_VARIABLES.intersection(kin_variables))
@@ -326,15 +459,15 @@ def generate_pinecard_from_nnpdf(
             "3D distributions not implemented or process not recognized"
         )
 
-    is_normalized = metadata.theory.operation.lower() == "ratio"
+    is_normalized = metadata.operation.lower() == "ratio"
     if is_normalized:
         print(
             "\033[91m [WARNING] \033[0m This dataset is probably normalized, you might be missing the runcard for the fiducial cross section"
         )
 
     # Prepare the metadata for the data
-    hepdata = metadata._parent.hepdata.url
-    arxiv = metadata._parent.arXiv.url.split("/")[-1]
+    hepdata = metadata.hepdata
+    arxiv = metadata.arxiv.split("/")[-1]
     tables = metadata.tables
     if not hepdata.startswith("https:"):
         # Try to autoguess the doi
@@ -140,6 +140,8 @@ class YamlLOJET:
     techcut: float = 1e-7
     pdf: str = "NNPDF40_nnlo_as_01180"
     manual: bool = False
+    cpu_hours: float = None
+    target_precision: float = None
 
     def __post_init__(self):
         self.histograms = [Histogram(**i) for i in self.histograms]
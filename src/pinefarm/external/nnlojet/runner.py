@@ -1,16 +1,87 @@
 """Provides a runner for NNLOJET."""
 
+import concurrent.futures
+import re
+import shutil
+import subprocess
+import time
+
+import pandas as pd
+import pineappl
 import rich
-from yaml import safe_load
+from yaml import safe_dump, safe_load
 
+from ... import configs, events, install
 from .. import interface
-from .runcardgen import YamlLOJET, generate_combine_ini, generate_runcard
+from . import allocation, combine
+from .runcardgen import (
+    COMBINE_OUTPUT_FOLDER,
+    YamlLOJET,
+    generate_combine_ini,
+    generate_runcard,
+)
 
 # Reasonable default for warmup and production for DY
 _DEFAULTS = {
     "warmup": {"iterations": 10, "events": int(5e6)},
-    "production": {"iterations": 1, "events": int(1e6)},
+    "production": {"iterations": 1, "events": int(1e6), "seeds": 10},
 }
+RUNCARD = "runcard"
+"""Base name of the runcards generated for a local run."""
+ORDERS = ["LO", "NLO", "NNLO"]
+"""Final combinations, indexed by perturbative order."""
+
+
+def execute(runcard, cwd):
+    """Run NNLOJET on a runcard, logging the output next to it.
+
+    Parameters
+    ----------
+    runcard : pathlib.Path
+        path to the NNLOJET runcard
+    cwd : pathlib.Path
+        folder in which NNLOJET is run
+
+    Returns
+    -------
+    float
+        wall time of the run (in seconds)
+
+    """
+    t0 = time.perf_counter()
+    with open(cwd / f"{runcard.stem}.log", "w") as fd:
+        subprocess.run(
+            [str(configs.configs["commands"]["nnlojet"]), "-run", runcard.name],
+            cwd=cwd,
+            stdout=fd,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+    return time.perf_counter() - t0
+
+
+def seed_runcard(runcard, seed, output):
+    """Copy a production runcard, changing the seed of the run.
+
+    Parameters
+    ----------
+    runcard : pathlib.Path
+        production runcard to copy
+    seed : int
+        seed for the new runcard
+    output : pathlib.Path
+        folder in which the new runcard is written
+
+    Returns
+    -------
+    pathlib.Path
+        path to the new runcard
+
+    """
+    text = re.sub(r"iseed\s*=\s*\d+", f"iseed = {seed}", runcard.read_text())
+    seeded = output / runcard.name
+    seeded.write_text(text)
+    return seeded
 
 
 class NNLOJET(interface.External):
@@ -43,24 +114,15 @@ class NNLOJET(interface.External):
                 if isinstance(key, str) and key.upper() in self.theory:
                     scdict[scale] = self.theory[key.upper()]
 
-        # Select channels according to PTO
-        order = self.theory.get("PTO")
-        channels = ["LO"]
-        if order > 0:
-            channels += ["R", "V"]
-        if order > 1:
-            channels += ["RR", "RV", "VV"]
-        if order > 2:
-            raise NotImplementedError("N3LO still not working")
-
         pinedata = YamlLOJET(**self._yaml_dict)
         # Given the allowed channel, generate the possible channel choices
-        active_channels = pinedata.active_channels(channels)
+        active_channels = pinedata.active_channels(self.levels)
 
         self.dest.mkdir(exist_ok=True, parents=True)
 
         # If running manually, generate the whole set of runcards with reasonable defaults
-        # otherwise, generate just a LO runcard for it to be used with the NNLOJET workflow
+        # and run them locally (if possible), otherwise, generate just a LO runcard
+        # for it to be used with the NNLOJET workflow
         if pinedata.manual:
             for level_name, level_channels in active_channels.items():
                 rich.print(f"Preparing {len(level_channels)} runcards for {level_name}")
@@ -73,11 +135,16 @@ class NNLOJET(interface.External):
                             pinedata,
                             channel,
                             output=self.dest,
+                            runcard_name=RUNCARD,
                             is_warmup=is_warmup,
                             events=nev,
                             iterations=nit,
                         )
             generate_combine_ini(pinedata, active_channels, self.dest)
+
+            if install.is_exe(configs.configs["commands"]["nnlojet"]):
+                return False
+            rich.print("NNLOJET executable not found, the runcards can be run manually")
         else:
             runcard_path = self.dest / f"{pinedata.runname}.run"
             rfull = generate_runcard(pinedata, "LO", runcard_path=runcard_path)
@@ -91,18 +158,247 @@ class NNLOJET(interface.External):
 
         return True
 
+    def features(self):
+        """Add the number of channels and of events of each channel.
+
+        The events are the ones of the default warmup and production, which
+        might be redistributed by the allocation (with the same channels), so
+        its CPU budget is also added, if any.
+
+        """
+        features = super().features()
+        pinedata = YamlLOJET(**self._yaml_dict)
+        features["channels"] = sum(
+            len(channels) for channels in pinedata.active_channels(self.levels).values()
+        )
+        features["events"] = sum(
+            settings["events"] * settings["iterations"] * settings.get("seeds", 1)
+            for settings in _DEFAULTS.values()
+        )
+        features["size"] = features["channels"] * features["events"]
+        if pinedata.cpu_hours is not None:
+            features["cpu_hours"] = pinedata.cpu_hours
+        return features
+
+    @property
+    def levels(self):
+        """Select channels according to PTO."""
+        order = self.theory.get("PTO")
+        channels = ["LO"]
+        if order > 0:
+            channels += ["R", "V"]
+        if order > 1:
+            channels += ["RR", "RV", "VV"]
+        if order > 2:
+            raise NotImplementedError("N3LO still not working")
+        return channels
+
+    @property
+    def final(self):
+        """Folder containing the final combinations."""
+        return self.dest / COMBINE_OUTPUT_FOLDER / "Final"
+
+    @property
+    def histograms(self):
+        """Names of the histograms for which a grid is generated."""
+        pinedata = YamlLOJET(**self._yaml_dict)
+        return [h.name for h in pinedata.histograms if h.pineappl]
+
+    def histogram_grid(self, histogram):
+        """Target PineAPPL grid name for a given histogram."""
+        if len(self.histograms) == 1:
+            return self.grid
+        return self.dest / f"{self.name}_{histogram}.pineappl"
+
+    @property
+    def grids(self):
+        """Target PineAPPL grids, one for each histogram."""
+        return {h: self.histogram_grid(h) for h in self.histograms}
+
+    @property
+    def channel_dirs(self):
+        """Folders of the channels prepared for a local run."""
+        return sorted(p.parent for p in self.dest.glob(f"*/{RUNCARD}_warmup.run"))
+
+    def warmup(self, pool):
+        """Run the warmup of every channel in parallel.
+
+        Returns
+        -------
+        dict
+            wall time of the warmup of each channel
+
+        """
+        channels = self.channel_dirs
+        rich.print(f"Running the warmup for {len(channels)} channels")
+        futures = {
+            channel.name: pool.submit(
+                execute, channel / f"{RUNCARD}_warmup.run", channel
+            )
+            for channel in channels
+        }
+        names = {future: name for name, future in futures.items()}
+        timings = {}
+        for done, future in enumerate(concurrent.futures.as_completed(names), 1):
+            timings[names[future]] = future.result()
+            events.emit("progress", done=done, total=len(futures), label="warmups")
+        return timings
+
+    def allocate(self, timings):
+        """Distribute production events and seeds according to the warmup.
+
+        The allocation is only performed if the pinecard defines either a
+        ``cpu_hours`` budget or a ``target_precision``, and the production
+        runcards are regenerated accordingly.
+
+        Parameters
+        ----------
+        timings : dict
+            wall time of the warmup of each channel
+
+        Returns
+        -------
+        dict or None
+            number of seeds for each channel, `None` if no allocation has been
+            performed
+
+        """
+        pinedata = YamlLOJET(**self._yaml_dict)
+        if pinedata.cpu_hours is None and pinedata.target_precision is None:
+            return None
+
+        warmup_events = (
+            _DEFAULTS["warmup"]["events"] * _DEFAULTS["warmup"]["iterations"]
+        )
+        warmups = [
+            allocation.Warmup.load(channel, warmup_events, timings[channel.name])
+            for channel in self.channel_dirs
+        ]
+        allocated = allocation.allocate(
+            warmups,
+            _DEFAULTS["production"]["events"],
+            cpu_hours=pinedata.cpu_hours,
+            precision=pinedata.target_precision,
+        )
+
+        hours = sum(
+            w.cost * allocated[w.channel]["events"] * allocated[w.channel]["seeds"]
+            for w in warmups
+        )
+        rich.print(f"Allocated production budget: {hours / 3600:.3g} CPU hours")
+        for channel, alloc in allocated.items():
+            rich.print(
+                f"{channel}: {alloc['seeds']} seeds x {alloc['events']:.3g} events"
+            )
+            generate_runcard(
+                pinedata,
+                channel,
+                output=self.dest,
+                runcard_name=RUNCARD,
+                is_warmup=False,
+                events=alloc["events"],
+                iterations=_DEFAULTS["production"]["iterations"],
+            )
+        (self.dest / "allocation.yaml").write_text(safe_dump(allocated))
+
+        return {channel: alloc["seeds"] for channel, alloc in allocated.items()}
+
+    @staticmethod
+    def prepare_seed(channel, seed):
+        """Prepare the folder for a production seed, reusing the channel warmup.
+
+        All the files generated during the warmup (i.e. everything but
+        runcards and logs) are copied, such that the vegas grid is available to
+        the production run.
+
+        """
+        seed_dir = channel / f"seed_{seed}"
+        seed_dir.mkdir(exist_ok=True)
+        for artifact in channel.iterdir():
+            if artifact.is_file() and artifact.suffix not in (".run", ".log"):
+                shutil.copy2(artifact, seed_dir)
+        return seed_runcard(channel / f"{RUNCARD}_production.run", seed, seed_dir)
+
+    def production(self, pool, seeds=None):
+        """Run the production seeds of every channel, distributed over the pool.
+
+        Parameters
+        ----------
+        pool : concurrent.futures.Executor
+            executor on which the runs are scheduled
+        seeds : dict or None
+            number of seeds for each channel (if not given, the default is used
+            for all of them)
+
+        """
+        if seeds is None:
+            seeds = {}
+
+        futures = []
+        for channel in self.channel_dirs:
+            nseeds = seeds.get(channel.name, _DEFAULTS["production"]["seeds"])
+            for seed in range(1, nseeds + 1):
+                runcard = self.prepare_seed(channel, seed)
+                futures.append(pool.submit(execute, runcard, runcard.parent))
+
+        rich.print(f"Running {len(futures)} production seeds")
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            future.result()
+            rich.print(f"Production seeds completed: {done}/{len(futures)}")
+            events.emit("progress", done=done, total=len(futures), label="seeds")
+
     def run(self):
-        """Run the corresponding NNLOJET runcard."""
-        raise NotImplementedError("NNLOJET running not implemented outside of dry mode")
+        """Run warmup and production for all the channels.
+
+        Every run is a separate NNLOJET process, and at most as many processes
+        as the configured core budget are run at the same time.
+
+        """
+        if not install.is_exe(configs.configs["commands"]["nnlojet"]):
+            raise FileNotFoundError(
+                f"NNLOJET executable not found: {configs.configs['commands']['nnlojet']}"
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(configs.cores()) as pool:
+            timings = self.warmup(pool)
+            self.production(pool, self.allocate(timings))
 
     def collect_versions(self) -> dict:
         """NNLOJET version."""
         return {"nnlojet_version": "secret"}
 
     def generate_pineappl(self):
-        """Not implemented."""
-        print("Not yet")
+        """Combine seeds and channels, and collect the grids at the chosen order.
+
+        One grid is generated for each histogram, with the name of the dataset
+        if there is only one of them.
+
+        """
+        pinedata = YamlLOJET(**self._yaml_dict)
+        combine.combine(pinedata, self.levels, self.dest)
+
+        order = ORDERS[self.theory.get("PTO")]
+        for histogram, target in self.grids.items():
+            grid = pineappl.grid.Grid.read(
+                str(self.final / f"{order}.{histogram}.pineappl")
+            )
+            grid.optimize()
+            grid.write(str(target))
 
     def results(self):
-        """Not implemented."""
-        print("Good luck")
+        """Collect the combined results for the histogram of the main grid."""
+        return self.observable_results(self.histograms[0])
+
+    def observable_results(self, observable):
+        """Collect the combined results for a given histogram."""
+        order = ORDERS[self.theory.get("PTO")]
+        table = combine.Table.load(self.final / f"{order}.{observable}.dat")
+
+        return pd.DataFrame(
+            {
+                "result": table.values[:, 0],
+                "error": table.errors[:, 0],
+                "sv_min": table.values.min(axis=1),
+                "sv_max": table.values.max(axis=1),
+            }
+        )
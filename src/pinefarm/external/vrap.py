@@ -24,7 +24,7 @@ import yaml
 from ekobox import genpdf
 from lhapdf_management import environment
 
-from .. import configs, install
+from .. import configs, events, install, metrics
 from . import interface
 
 _PINEAPPL = "test.pineappl.lz4"
@@ -122,11 +122,21 @@ class Vrap(interface.External):
         self._partial_results = []
         self._is_pos = is_pos
 
+    def features(self):
+        """Add the number of kinematic cards (i.e. of vrap runs)."""
+        features = super().features()
+        features["size"] = len(self._kin_cards)
+        return features
+
     def _prepare_fake_pdf(self):
         """Prepare the fake PDF when running a positivity runcard."""
         if self._is_pos:
             gen_pos_pdf(self.pdf)
 
+    def prepare_shared(self, folder):
+        """Generate the fake PDF once for all the theories."""
+        self._prepare_fake_pdf()
+
     def run(self):
         """Run vrap for the given runcards.
 
@@ -138,6 +148,7 @@ class Vrap(interface.External):
         self._prepare_fake_pdf()
 
         for b, kin_card in enumerate(self._kin_cards):
+            events.emit("progress", done=b, total=len(self._kin_cards), label="cards")
             sp.run(
                 [configs.configs["commands"]["vrap"], self._input_card, kin_card],
                 cwd=self.dest,
@@ -175,6 +186,13 @@ class Vrap(interface.External):
             # Apply cfactors if needed
             self._partial_results.append((cv, stat))
 
+        events.emit(
+            "progress",
+            done=len(self._kin_cards),
+            total=len(self._kin_cards),
+            label="cards",
+        )
+
     def generate_pineappl(self):
         """If the run contain more than one grid, merge them all."""
         if len(self._partial_grids) > 1:
@@ -196,6 +214,10 @@ class Vrap(interface.External):
                     # Now merge it into the main grid!
                     main_grid.merge(tmp_grid)
             main_grid.write(self.grid)
+            metrics.inc(
+                "merged_bytes_total",
+                sum(path.stat().st_size for path in self._partial_grids),
+            )
 
     def results(self):
         """Combinesthe results of the partial runs of vrap in order to compare with the generated grid."""
@@ -225,4 +247,4 @@ class Vrap(interface.External):
     @staticmethod
     def install():
         """Execute installer."""
-        install.hawaiian_vrap()
+        install.toolchain(["vrap"])
@@ -1,5 +1,8 @@
 """yadism interface."""
 
+import concurrent.futures
+import itertools
+import math
 from functools import reduce
 
 import pandas as pd
@@ -8,26 +11,66 @@ import yadism
 import yadism.output
 import yaml
 
-from .. import configs, log, tools
+from .. import configs, log, pdftable, tools
 from . import interface
 
 
+def shards(observables, n):
+    """Split the kinematics of the observables in at most ``n`` shards.
+
+    Points at the same scale are kept together, since yadism reuses the
+    computation among them.
+
+    Parameters
+    ----------
+    observables : dict
+        kinematics of each observable, as in the ``observables`` section of the
+        observable card
+    n : int
+        maximum number of shards
+
+    Returns
+    -------
+    list(dict)
+        indices of the points of each observable in each shard
+
+    """
+    parts = [{} for _ in range(n)]
+    for name, kinematics in observables.items():
+        size = math.ceil(len(kinematics) / n)
+        order = sorted(range(len(kinematics)), key=lambda i: kinematics[i]["Q2"])
+        k = 0
+        for _, group in itertools.groupby(order, key=lambda i: kinematics[i]["Q2"]):
+            if len(parts[k].get(name, [])) >= size and k < n - 1:
+                k += 1
+            parts[k].setdefault(name, []).extend(group)
+    return [part for part in parts if part]
+
+
+def _run_shard(theory, obs):
+    """Run yadism on a subset of the kinematics (in a worker process)."""
+    return yadism.run_yadism(theory, obs)
+
+
 class Yadism(interface.External):
     """Interface provider."""
 
     kind = "DIS"
 
     def __init__(self, pinecard, theorycard, *args, **kwargs):
+        # the theory is modified below, keep the caller's one untouched
+        theorycard = dict(theorycard)
         # Default to including scale information unless explicitly avoided
         theorycard.setdefault("FactScaleVar", True)
         theorycard.setdefault("RenScaleVar", True)
 
         super().__init__(pinecard, theorycard, *args, **kwargs)
+        self._out = None
+        self._archive = None
+        self._applied = None
 
         # load runcards
-        with open(
-            configs.configs["paths"]["runcards"] / self.name / "observable.yaml"
-        ) as o:
+        with open(self.source / "observable.yaml") as o:
             self.obs = yaml.safe_load(o)
 
         # deactivate TMC for positivity observables
@@ -35,11 +78,104 @@ class Yadism(interface.External):
         if self.obs["NCPositivityCharge"] is not None:
             self.theory["TMC"] = 0
 
+    def features(self):
+        """Add the number of kinematic points."""
+        features = super().features()
+        features["size"] = sum(len(kins) for kins in self.obs["observables"].values())
+        return features
+
     @property
     def output(self):
         """Return yadism output path."""
         return self.grid.with_suffix(".tar")
 
+    @property
+    def out(self):
+        """Yadism output.
+
+        Kept in memory after :meth:`run`, and otherwise loaded from the archive
+        (e.g. when finalizing a previous run, or reusing its ``generate``
+        stage). If it has not been archived (``yadism::archive`` disabled), it
+        is computed again.
+
+        """
+        if self._out is None:
+            self.wait_archive()
+            if self.output.exists():
+                self._out = yadism.output.Output.load_tar(self.output)
+            else:
+                print(f"No yadism output archived in '{self.output}', computing it")
+                self._out = self.compute()
+        return self._out
+
+    def archive(self):
+        """Dump the output to the tar archive, in a background thread.
+
+        The errors are raised by :meth:`wait_archive`.
+
+        """
+        executor = concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix=f"{self.name}-archive"
+        )
+        self._archive = executor.submit(self._out.dump_tar, self.output)
+        executor.shutdown(wait=False)
+
+    def wait_archive(self):
+        """Wait for the archive to be written (if any).
+
+        Raises
+        ------
+        Exception
+            the error raised while archiving, in which case the incomplete
+            archive is removed
+
+        """
+        if self._archive is None:
+            return
+        archive, self._archive = self._archive, None
+        try:
+            archive.result()
+        except Exception:
+            self.output.unlink(missing_ok=True)
+            raise
+
+    def compute(self):
+        """Compute the output, splitting the kinematics over worker processes.
+
+        The partial outputs are joined, such that the points are in the same
+        order as in the observable card (and as in a serial run).
+
+        """
+        npoints = self.features()["size"]
+        jobs = min(configs.cores(), npoints)
+        if jobs <= 1:
+            return yadism.run_yadism(self.theory, self.obs)
+
+        parts = shards(self.obs["observables"], jobs)
+        cards = [
+            dict(
+                self.obs,
+                observables={
+                    name: [self.obs["observables"][name][i] for i in indices]
+                    for name, indices in part.items()
+                },
+            )
+            for part in parts
+        ]
+        print(f"Splitting {npoints} points in {len(parts)} shards")
+        with concurrent.futures.ProcessPoolExecutor(len(parts)) as pool:
+            outputs = list(pool.map(_run_shard, [self.theory] * len(parts), cards))
+
+        out = outputs[0]
+        out.observables = self.obs
+        for name, kinematics in self.obs["observables"].items():
+            results = [None] * len(kinematics)
+            for part, partial in zip(parts, outputs):
+                for j, i in enumerate(part.get(name, [])):
+                    results[i] = partial[name][j]
+            out[name] = results
+        return out
+
     def run(self):
         """Run program."""
         print("Running yadism...")
@@ -48,46 +184,79 @@ class Yadism(interface.External):
         run_log = self.dest / "run.log"
         with log.Tee(run_log, stderr=True):
             try:
-                out = yadism.run_yadism(self.theory, self.obs)
+                self._out = self.compute()
+                self._applied = None
             except Exception:
                 raise log.WhileRedirectedError(file=run_log)
 
-        # dump output
-        out.dump_tar(self.output)
+        if configs.configs.get("yadism", {}).get("archive", True):
+            self.archive()
+
+    @property
+    def grids(self):
+        """Target PineAPPL grids, one for each observable.
+
+        The grid is named after the dataset if there is a single observable,
+        otherwise the observable name is appended.
+
+        """
+        observables = list(self.obs["observables"])
+        if len(observables) == 1:
+            return {observables[0]: self.grid}
+        return {obs: self.dest / f"{self.name}_{obs}.pineappl" for obs in observables}
 
     def generate_pineappl(self):
-        """Generate grid."""
-        out = yadism.output.Output.load_tar(self.output)
-        yadbox.export.dump_pineappl_to_file(
-            out, str(self.grid), next(iter(self.obs["observables"].keys()))
-        )
+        """Generate a grid for each observable."""
+        for observable, grid in self.grids.items():
+            yadbox.export.dump_pineappl_to_file(self.out, str(grid), observable)
 
     def results(self):
+        """Apply PDF to the output of the first observable."""
+        return self.observable_results(next(iter(self.grids)))
+
+    def applied(self):
+        """Apply the PDF to the output, centrally and for the scale variations.
+
+        The output of all the observables is convolved at once, so it is
+        computed only once, and shared by :meth:`observable_results`.
+
+        Returns
+        -------
+        yadism.output.PDFOutput
+            central result
+        list(tuple(float, float, yadism.output.PDFOutput))
+            renormalization and factorization scale ratios, and the
+            corresponding result, for each scale variation
+
+        """
+        if self._applied is None:
+            pdf = pdftable.load(self.pdf)
+
+            def apply(xiR, xiF):
+                return self.out.apply_pdf_alphas_alphaqed_xir_xif(
+                    pdf,
+                    pdf.alphasQ,
+                    lambda _muR: 0.0,
+                    xiR,
+                    xiF,
+                )
+
+            self._applied = (
+                apply(1.0, 1.0),
+                [(xiR, xiF, apply(xiR, xiF)) for xiR, xiF, _xiFR in tools.nine_points],
+            )
+        return self._applied
+
+    def observable_results(self, observable):
         """Apply PDF to output."""
-        import lhapdf  # pylint: disable=import-error
-
-        pdf = lhapdf.mkPDF(self.pdf)
-        out = yadism.output.Output.load_tar(self.output)
-        pdf_out = out.apply_pdf_alphas_alphaqed_xir_xif(
-            pdf,
-            lambda muR: lhapdf.mkAlphaS(self.pdf).alphasQ(muR),
-            lambda _muR: 0,
-            1.0,
-            1.0,
-        )
-        pdf_out = next(iter(pdf_out.tables.values()))
+        central, variations = self.applied()
+        # the cached table is shared by all the calls
+        pdf_out = central.tables[observable].copy()
 
         sv_pdf_out = []
-        for xiR, xiF, _xiFR in tools.nine_points:
-            sv_point = out.apply_pdf_alphas_alphaqed_xir_xif(
-                pdf,
-                lambda muR: lhapdf.mkAlphaS(self.pdf).alphasQ(muR),
-                lambda _muR: 0.0,
-                xiR,
-                xiF,
-            )
+        for xiR, xiF, sv_point in variations:
             df = (
-                next(iter(sv_point.tables.values()))
+                sv_point.tables[observable]
                 .rename({"result": (xiR, xiF)}, axis=1)
                 .drop("error", axis=1)
             )
@@ -118,3 +287,8 @@ class Yadism(interface.External):
     def collect_versions(self):
         """No additional programs involved."""
         return {}
+
+    def postprocess(self):
+        """Wait for the archive, then postprocess."""
+        self.wait_archive()
+        super().postprocess()
@@ -0,0 +1,317 @@
+"""History of the runs, and prediction of their resources.
+
+The wall time, the number of cores and the peak memory of each completed
+stage are stored in a SQLite database in the cache, together with the kind of
+runner and some size features of the pinecard (e.g. the number of kinematic
+points) and of the generated grids (bins, channels and orders).
+
+The resources of a new run are estimated from the history, in order of
+preference:
+
+- from the previous runs of the same dataset with the same features
+- from the previous runs of the same dataset
+- from the previous runs of the same runner, with a power law fit of the time
+  in the ``size`` feature (if available for at least two different sizes)
+
+Times are compared in core-seconds, i.e. rescaled by the number of cores
+available to each run.
+"""
+
+import contextlib
+import json
+import resource
+import sqlite3
+import statistics
+import sys
+import time
+
+import numpy as np
+import pineappl
+
+from . import configs
+from .stages import STAGES
+
+DATABASE = "history.sqlite"
+"""Name of the database in the cache folder."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    runner TEXT NOT NULL,
+    theory INTEGER,
+    stage TEXT NOT NULL,
+    wall REAL NOT NULL,
+    cores INTEGER NOT NULL,
+    memory INTEGER,
+    features TEXT NOT NULL,
+    grids TEXT NOT NULL,
+    timestamp REAL NOT NULL
+)
+"""
+
+
+def database():
+    """Path of the history database."""
+    return configs.configs["paths"]["cache"] / DATABASE
+
+
+@contextlib.contextmanager
+def connect(path=None):
+    """Open the database, creating it if needed.
+
+    Each call opens its own connection, such that concurrent runs (threads or
+    processes) can record their stages independently.
+
+    """
+    path = database() if path is None else path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with contextlib.closing(sqlite3.connect(path, timeout=30.0)) as conn:
+        with conn:
+            conn.execute(SCHEMA)
+            yield conn
+
+
+def peak_memory():
+    """Peak resident memory (in bytes) of the process and of its children.
+
+    Returns
+    -------
+    tuple(int, int)
+        peak of the process, and the largest peak of its terminated children
+
+    """
+    scale = 1 if sys.platform == "darwin" else 1024
+    return tuple(
+        resource.getrusage(who).ru_maxrss * scale
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+
+
+def stage_memory(before, after):
+    """Peak memory of a stage, from the peaks before and after it.
+
+    The peaks are never reset, so they are only attributed to the stage if it
+    raised them: otherwise (e.g. in a long-lived process, after a larger run)
+    the peak of the stage is unknown.
+    The peaks are still process-wide, so they are an upper bound when several
+    runs share the same process.
+
+    Parameters
+    ----------
+    before : tuple(int, int)
+        :func:`peak_memory` at the beginning of the stage
+    after : tuple(int, int)
+        :func:`peak_memory` at the end of the stage
+
+    Returns
+    -------
+    int or None
+        peak memory (in bytes), `None` if unknown
+
+    """
+    raised = [peak for peak, previous in zip(after, before) if peak > previous]
+    return max(raised, default=None)
+
+
+def grid_features(runner):
+    """Size of the grids generated by a runner (summed over the grids)."""
+    features = {"bins": 0, "channels": 0, "orders": 0}
+    for grid_path in runner.grids.values():
+        if not grid_path.exists():
+            continue
+        grid = pineappl.grid.Grid.read(str(grid_path))
+        features["bins"] += grid.bins()
+        features["channels"] += len(grid.channels())
+        features["orders"] += len(grid.orders())
+    return features
+
+
+def record(runner, stage, wall, grids=None, memory=None):
+    """Store the resources used by a completed stage.
+
+    Parameters
+    ----------
+    runner : interface.External
+        runner instance
+    stage : str
+        completed stage
+    wall : float
+        wall time of the stage (in seconds)
+    grids : dict or None
+        size of the generated grids (see :func:`grid_features`)
+    memory : int or None
+        peak memory of the stage (see :func:`stage_memory`)
+
+    """
+    with connect() as conn:
+        conn.execute(
+            "INSERT INTO stages (dataset, runner, theory, stage, wall, cores, "
+            "memory, features, grids, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                runner.name,
+                type(runner).__name__,
+                runner.theory.get("ID"),
+                stage,
+                wall,
+                configs.cores(),
+                memory,
+                json.dumps(runner.features(), sort_keys=True),
+                json.dumps(grids or {}, sort_keys=True),
+                time.time(),
+            ),
+        )
+
+
+@contextlib.contextmanager
+def measure(runner, stage, timings=None):
+    """Record the resources of a stage, if it completes successfully.
+
+    The size of the grids is only recorded for the generation stage, and the
+    wall time is also stored in ``timings`` (if given).
+
+    """
+    before = peak_memory()
+    t0 = time.perf_counter()
+    yield
+    wall = time.perf_counter() - t0
+    if timings is not None:
+        timings[stage] = wall
+    record(
+        runner,
+        stage,
+        wall,
+        grid_features(runner) if stage == STAGES[0] else None,
+        memory=stage_memory(before, peak_memory()),
+    )
+
+
+def _power_law(sizes, values, size):
+    """Fit ``value = a * size^b`` and evaluate it."""
+    b, log_a = np.polyfit(np.log(sizes), np.log(values), 1)
+    return float(np.exp(log_a) * size**b)
+
+
+def _estimate(rows, features, rescale=False):
+    """Estimate core-seconds and memory of a stage from its history.
+
+    If ``rescale`` is set, and no row has the same features, the time is
+    fitted as a power law of the ``size`` feature.
+
+    """
+    if not rows:
+        return None
+
+    same = [row for row in rows if row["features"] == features]
+    samples = same or rows
+    memory = max(
+        (row["memory"] for row in samples if row["memory"] is not None), default=None
+    )
+
+    size = features.get("size")
+    sized = [row for row in samples if row["features"].get("size")]
+    if (
+        rescale
+        and not same
+        and size
+        and len({r["features"]["size"] for r in sized}) > 1
+    ):
+        sizes = [row["features"]["size"] for row in sized]
+        times = [row["wall"] * row["cores"] for row in sized]
+        return _power_law(sizes, times, size), memory
+
+    return statistics.median(row["wall"] * row["cores"] for row in samples), memory
+
+
+def predict(runner, cores=None):
+    """Predict the wall time and the peak memory of a run.
+
+    Parameters
+    ----------
+    runner : interface.External
+        runner instance
+    cores : int or None
+        number of cores available to the run (by default, the configured core
+        budget)
+
+    Returns
+    -------
+    dict or None
+        predicted ``wall`` time (in seconds) and peak ``memory`` (in bytes,
+        `None` if never measured), the number of previous stages (``samples``)
+        on which the estimate is based, and whether they belong to the same
+        ``dataset``; `None` if no compatible run is available
+
+    """
+    if not database().exists():
+        return None
+    cores = configs.cores() if cores is None else cores
+    # normalize through JSON, as the stored features
+    features = json.loads(json.dumps(runner.features(), sort_keys=True))
+
+    with connect() as conn:
+        conn.row_factory = sqlite3.Row
+        rows = [
+            dict(row, features=json.loads(row["features"]))
+            for row in conn.execute(
+                "SELECT * FROM stages WHERE runner = ?", (type(runner).__name__,)
+            )
+        ]
+
+    same_dataset = [row for row in rows if row["dataset"] == runner.name]
+    candidates = same_dataset or rows
+
+    wall = 0.0
+    memory = None
+    samples = 0
+    for stage in STAGES:
+        stage_rows = [row for row in candidates if row["stage"] == stage]
+        estimate = _estimate(stage_rows, features, rescale=not same_dataset)
+        if estimate is None:
+            continue
+        wall += estimate[0] / cores
+        if estimate[1] is not None:
+            memory = max(memory or 0, estimate[1])
+        samples += len(stage_rows)
+
+    if samples == 0:
+        return None
+    return {
+        "wall": wall,
+        "memory": memory,
+        "samples": samples,
+        "dataset": bool(same_dataset),
+    }
+
+
+def cost(dataset):
+    """Predict the core-seconds of a dataset, from its previous runs.
+
+    Unlike :func:`predict`, it does not need a runner instance (e.g. to rank
+    the jobs of a queue, before they are assigned to a worker).
+
+    Parameters
+    ----------
+    dataset : str
+        dataset name
+
+    Returns
+    -------
+    float or None
+        predicted core-seconds of all the stages, `None` if the dataset was
+        never run
+
+    """
+    if not database().exists():
+        return None
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT stage, wall * cores FROM stages WHERE dataset = ?", (dataset,)
+        ).fetchall()
+    if not rows:
+        return None
+
+    return sum(
+        statistics.median(seconds for name, seconds in rows if name == stage)
+        for stage in {name for name, _ in rows}
+    )
@@ -20,7 +20,7 @@ class Info:
         return self.external.kind
 
 
-def label(dataset: str) -> Info:
+def label(dataset: str, runcards_path=None) -> Info:
     """Generate associated Info type."""
-    ext_tool, color = decide_external_tool(dataset)
+    ext_tool, color = decide_external_tool(dataset, runcards_path)
     return Info(color=color, external=ext_tool)
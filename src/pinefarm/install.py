@@ -1,5 +1,8 @@
 """Install tools."""
 
+import concurrent.futures
+import contextvars
+import functools
 import os
 import pathlib
 import shutil
@@ -7,6 +10,7 @@ import subprocess
 import sys
 import tarfile
 import tempfile
+import time
 
 import lhapdf_management
 import pkgconfig
@@ -21,6 +25,23 @@ PINEAPPL_REPO = "https://github.com/N3PDF/pineappl.git"
 LHAPDF_VERSION = "LHAPDF-6.5.4"
 "Version of LHAPDF to be used by default (if not already available)."
 
+INDEX_TTL = 7 * 24 * 3600
+"Default maximum age (in seconds) of the PDF sets index."
+
+_CORES = contextvars.ContextVar("cores", default=None)
+"Share of the core budget of the installation step being executed."
+
+
+def build_cores():
+    """Number of cores used by a build.
+
+    It is the share of the installation step, when installing the toolchain
+    (see :func:`toolchain`), and the whole core budget otherwise.
+
+    """
+    cores = _CORES.get()
+    return configs.cores() if cores is None else cores
+
 
 def init_prefix():
     """Set up paths."""
@@ -86,6 +107,17 @@ def mg5amc():
     return is_exe(mg5_exe)
 
 
+def vrap_version_file():
+    """File recording the version of the installed vrap.
+
+    Vrap does not install any version information itself, so it is recorded
+    by :func:`hawaiian_vrap`, in the same ``version = <version>`` format of
+    the MG5aMC@NLO ``VERSION`` file.
+
+    """
+    return configs.configs["paths"]["prefix"] / "share" / "hawaiian_vrap" / "VERSION"
+
+
 def hawaiian_vrap():
     """Install a version of vrap flavoured with pineappl from https://github.com/NNPDF/hawaiian_vrap.
 
@@ -129,7 +161,13 @@ def hawaiian_vrap():
             cwd=build_dir,
             check=True,
         )
-        subprocess.run(["make", "install"], cwd=build_dir, check=True)
+        subprocess.run(
+            ["make", f"-j{build_cores()}", "install"], cwd=build_dir, check=True
+        )
+
+    version = vrap_version_file()
+    version.parent.mkdir(parents=True, exist_ok=True)
+    version.write_text(f"version = {vrap.VERSION}\n")
 
     return is_exe(vrapx)
 
@@ -169,6 +207,34 @@ def cargo():
     return str(cargo_home / "bin" / "cargo")
 
 
+def cargo_c():
+    """Initialize `cargo-c <https://github.com/lu-zero/cargo-c>`_, needed to build the PineAPPL CAPI.
+
+    Nothing is done if the CAPI is already available.
+
+    Returns
+    -------
+    bool
+        whether `cargo-c` is now available (or not needed)
+
+    """
+    if pkgconfig.exists("pineappl_capi"):
+        return True
+
+    cargo_exe = cargo()
+
+    def installed():
+        """Define availability condition."""
+        check = subprocess.run(
+            [cargo_exe, "cinstall", "--version"], capture_output=True
+        )
+        return check.returncode == 0
+
+    if not installed():
+        subprocess.run([cargo_exe, "install", f"--jobs={build_cores()}", "cargo-c"])
+    return installed()
+
+
 def pineappl(capi=True, cli=False):
     """Initialize `PineAPPL <https://github.com/N3PDF/pineappl>`_.
 
@@ -214,11 +280,11 @@ def pineappl(capi=True, cli=False):
             )
 
         cargo_exe = cargo()
-        subprocess.run([cargo_exe] + "install --force cargo-c".split())
+        _ = cargo_c()
 
         subprocess.run(
-            [cargo_exe]
-            + "cinstall --release --prefix".split()
+            [cargo_exe, "cinstall", f"--jobs={build_cores()}"]
+            + "--release --prefix".split()
             + [
                 str(configs.configs["paths"]["prefix"]),
                 "--manifest-path=pineappl_capi/Cargo.toml",
@@ -229,8 +295,8 @@ def pineappl(capi=True, cli=False):
     if cli and not cli_installed():
         cargo_exe = cargo()
         subprocess.run(
-            [cargo_exe]
-            + "install --path pineappl_cli --root".split()
+            [cargo_exe, "install", f"--jobs={build_cores()}"]
+            + "--path pineappl_cli --root".split()
             + [str(configs.configs["paths"]["prefix"])],
             cwd=configs.configs["paths"]["pineappl"],
         )
@@ -253,6 +319,33 @@ def update_lhapdf_path(path):
     lhapdf_management.environment.datapath = pathlib.Path(path)
 
 
+@functools.lru_cache(maxsize=None)
+def lhapdf_datadir():
+    """Determine the data folder of the available LHAPDF installation.
+
+    The result is computed only once per process.
+
+    Returns
+    -------
+    pathlib.Path or None
+        LHAPDF data folder, if LHAPDF is available
+
+    """
+    if shutil.which("lhapdf-config") is None and not pkgconfig.exists("lhapdf"):
+        return None
+    lhapdf_data = pathlib.Path(
+        subprocess.run("lhapdf-config --datadir".split(), capture_output=True)
+        .stdout.decode()
+        .strip()
+    )
+    if not lhapdf_data.exists():
+        lhapdf_data = (
+            pathlib.Path(pkgconfig.variables("lhapdf")["datarootdir"]).absolute()
+            / "LHAPDF"
+        )
+    return lhapdf_data
+
+
 def lhapdf_conf(pdf):
     """Initialize `LHAPDF <https://lhapdf.hepforge.org/>`_.
 
@@ -265,27 +358,13 @@ def lhapdf_conf(pdf):
     # user settings *always* take precedence
     if os.environ.get("LHAPDF_DATA_PATH") is not None:
         return
-    if shutil.which("lhapdf-config") is not None or pkgconfig.exists("lhapdf"):
-        lhapdf_data = pathlib.Path(
-            subprocess.run("lhapdf-config --datadir".split(), capture_output=True)
-            .stdout.decode()
-            .strip()
-        )
-        if not lhapdf_data.exists():
-            lhapdf_data = (
-                pathlib.Path(pkgconfig.variables("lhapdf")["datarootdir"]).absolute()
-                / "LHAPDF"
-            )
+    lhapdf_data = lhapdf_datadir()
+    if lhapdf_data is not None:
         update_lhapdf_path(lhapdf_data)
         # attempt to determine if it is possible to get the required PDF in the
         # existing folder (if possible return)
-        try:
-            if os.access(lhapdf_data, os.W_OK) or pdf in (
-                x.name for x in lhapdf_management.pdf_list("--installed")
-            ):
-                return
-        except PermissionError:
-            pass
+        if os.access(lhapdf_data, os.W_OK) or pdf_installed(pdf, lhapdf_data):
+            return
 
     lhapdf_data = configs.configs["paths"]["lhapdf_data_alternative"]
     lhapdf_data.mkdir(parents=True, exist_ok=True)
@@ -295,6 +374,111 @@ def lhapdf_conf(pdf):
     update_lhapdf_path(lhapdf_data)
 
 
+def pdf_installed(pdf, datapath):
+    """Check whether a PDF set is installed in the given LHAPDF data folder."""
+    return (datapath / pdf / f"{pdf}.info").exists()
+
+
+def update_pdf_index(datapath):
+    """Refresh the PDF sets index, if older than the configured TTL.
+
+    A failure is tolerated if an index is already available (e.g. offline).
+
+    Parameters
+    ----------
+    datapath : pathlib.Path
+        LHAPDF data folder
+
+    """
+    ttl = configs.configs.get("lhapdf", {}).get("index_ttl", INDEX_TTL)
+    index = datapath / lhapdf_management.environment.index_filename
+    with tools.file_lock(datapath / ".index.lock"):
+        if index.exists() and time.time() - index.stat().st_mtime < ttl:
+            return
+        try:
+            if lhapdf_management.pdf_update():
+                return
+        # survive even if it's not possible to write 'pdfsets.index'
+        except PermissionError:
+            return
+    if not index.exists():
+        print("Unable to download the PDF sets index")
+
+
+def _pdf_from_mirror(pdf, datapath):
+    """Install a PDF set from the local mirror, if available there."""
+    tarball = configs.configs["paths"]["lhapdf_mirror"] / f"{pdf}.tar.gz"
+    if not tarball.exists():
+        return False
+    # extract aside, and move in place atomically
+    with tempfile.TemporaryDirectory(dir=datapath) as tmp:
+        with tarfile.open(tarball, "r:gz") as tar:
+            tar.extractall(tmp)
+        os.replace(pathlib.Path(tmp) / pdf, datapath / pdf)
+    return True
+
+
+def pdf(name):
+    """Install a PDF set, unless already available.
+
+    No network access is attempted if the set is already installed, or it is
+    available in the ``paths::lhapdf_mirror`` folder. The installation is
+    guarded by a file lock, so it is safe among concurrent processes.
+
+    Parameters
+    ----------
+    name : str
+        LHAPDF name of the set
+
+    Returns
+    -------
+    bool
+        whether the set is now installed
+
+    """
+    datapath = lhapdf_management.environment.datapath
+    if pdf_installed(name, datapath):
+        return True
+
+    with tools.file_lock(datapath / f".{name}.lock"):
+        # it might have been installed while waiting for the lock
+        if pdf_installed(name, datapath):
+            return True
+        if _pdf_from_mirror(name, datapath):
+            print(f"✓ Installed {name} from the local mirror")
+            return True
+
+    update_pdf_index(datapath)
+    with tools.file_lock(datapath / f".{name}.lock"):
+        if not pdf_installed(name, datapath):
+            lhapdf_management.pdf_install(name)
+    return pdf_installed(name, datapath)
+
+
+def pdfs(names, jobs=None):
+    """Install several PDF sets concurrently.
+
+    Parameters
+    ----------
+    names : list(str)
+        LHAPDF names of the sets
+    jobs : int or None
+        number of concurrent installations (default: the configured core
+        budget)
+
+    Returns
+    -------
+    dict
+        whether each set is now installed
+
+    """
+    names = list(dict.fromkeys(names))
+    if jobs is None:
+        jobs = configs.cores()
+    with concurrent.futures.ThreadPoolExecutor(max(min(jobs, len(names)), 1)) as pool:
+        return dict(zip(names, pool.map(pdf, names)))
+
+
 def lhapdf():
     """Install `LHAPDF <https://lhapdf.hepforge.org/>`_ C++ library.
 
@@ -320,14 +504,18 @@ def lhapdf():
     lhapdf_code = lhapdf_dest / LHAPDF_VERSION
 
     lhapdf_dest.mkdir(exist_ok=True)
-    with requests.get(
-        f"https://lhapdf.hepforge.org/downloads/?f={lhapdf_tar.name}"
-    ) as r:
-        with open(lhapdf_tar, "wb") as f:
-            f.write(r.content)
-
-    with tarfile.open(lhapdf_tar, "r:gz") as tar:
-        tar.extractall(lhapdf_dest)
+    # skip the steps already done by a previous attempt
+    if not lhapdf_tar.exists():
+        with requests.get(
+            f"https://lhapdf.hepforge.org/downloads/?f={lhapdf_tar.name}"
+        ) as r:
+            partial = lhapdf_tar.with_name(f".{lhapdf_tar.name}.part")
+            partial.write_bytes(r.content)
+        os.replace(partial, lhapdf_tar)
+
+    if not lhapdf_code.exists():
+        with tarfile.open(lhapdf_tar, "r:gz") as tar:
+            tar.extractall(lhapdf_dest)
 
     env = os.environ.copy()
     env["PYTHON"] = sys.executable
@@ -336,19 +524,118 @@ def lhapdf():
         env=env,
         cwd=lhapdf_code,
     )
-    subprocess.run("make", cwd=lhapdf_code)
+    subprocess.run(["make", f"-j{build_cores()}"], cwd=lhapdf_code)
     subprocess.run("make install".split(), cwd=lhapdf_code)
 
     return installed()
 
 
+STEPS = {
+    "lhapdf": ((), lhapdf),
+    "cargo-c": ((), cargo_c),
+    "pineappl": (("lhapdf", "cargo-c"), pineappl),
+    "mg5amc": ((), mg5amc),
+    "vrap": (("lhapdf", "pineappl"), hawaiian_vrap),
+}
+"""Installation steps, with their dependencies."""
+
+
+def _step(name, cores):
+    """Execute an installation step, with its share of the cores."""
+    _CORES.set(cores)
+    return STEPS[name][1]()
+
+
+def toolchain(targets, jobs=None):
+    """Install programs together with their dependencies, concurrently.
+
+    The installation steps form a dependency graph (see :data:`STEPS`): each
+    of them is started as soon as all its dependencies are completed, and
+    those already installed are skipped by the installers themselves.
+    The steps depending on a failed one, or on one raising an exception, are
+    not attempted.
+
+    The core budget (``resources::cores``) is split among the steps running at
+    the same time: the steps started together share the cores not used by the
+    running ones (at least one each).
+
+    Parameters
+    ----------
+    targets : list(str)
+        programs to be installed
+    jobs : int or None
+        maximum number of concurrent steps (default: no limit)
+
+    Returns
+    -------
+    dict
+        outcome of each step (falsy if failed)
+
+    """
+    needed = {}
+
+    def collect(name):
+        if name not in needed:
+            for dependency in STEPS[name][0]:
+                collect(dependency)
+            needed[name] = STEPS[name][0]
+
+    for target in targets:
+        collect(target)
+
+    budget = configs.cores()
+    slots = jobs or len(needed)
+    outcomes = {}
+    with concurrent.futures.ThreadPoolExecutor(slots) as pool:
+        running = {}
+        while needed or running:
+            ready = []
+            for name, dependencies in list(needed.items()):
+                if not all(d in outcomes for d in dependencies):
+                    continue
+                if all(outcomes[d] for d in dependencies):
+                    ready.append(name)
+                else:
+                    del needed[name]
+                    print(f"✗ Skipped {name}, since a dependency failed")
+                    outcomes[name] = False
+            ready = ready[: slots - len(running)]
+            free = budget - sum(cores for _, cores in running.values())
+            for name in ready:
+                del needed[name]
+                cores = max(free // len(ready), 1)
+                future = pool.submit(contextvars.copy_context().run, _step, name, cores)
+                running[future] = (name, cores)
+            if not running:
+                continue
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name, _ = running.pop(future)
+                try:
+                    outcomes[name] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"✗ Failed {name}: {e}")
+                    outcomes[name] = False
+
+    return outcomes
+
+
 def update_environ():
-    """Adjust necessary environment files."""
+    """Adjust necessary environment files.
+
+    The operation is idempotent, so it can be repeated for each run.
+    If the prefix has been imported from a snapshot, it is also checked against
+    the expected installation (see :func:`pinefarm.snapshot.check`).
+
+    """
+    from . import snapshot
 
     def prepend(name, value):
-        if name not in os.environ:
-            os.environ[name] = ""
-        os.environ[name] = str(value) + os.pathsep + os.environ[name]
+        entries = os.environ.get(name, "").split(os.pathsep)
+        if str(value) not in entries:
+            os.environ[name] = os.pathsep.join([str(value)] + entries)
 
     lib = configs.configs["paths"]["lib"]
     pyver = ".".join(sys.version.split(".")[:2])
@@ -359,10 +646,12 @@ def update_environ():
         pythonpath = lib.with_name("lib64") / f"python{pyver}" / "site-packages"
 
     prepend("PYTHONPATH", pythonpath)
-    sys.path.insert(0, pythonpath.as_posix())
+    if pythonpath.as_posix() not in sys.path:
+        sys.path.insert(0, pythonpath.as_posix())
     prepend("PATH", configs.configs["paths"]["bin"])
     prepend("LD_LIBRARY_PATH", lib)
     prepend("PKG_CONFIG_PATH", lib / "pkgconfig")
+    snapshot.check(configs.configs["paths"]["prefix"].absolute())
 
 
 def nnlojet():
@@ -0,0 +1,72 @@
+"""Thin client of the :mod:`service <pinefarm.daemon>`.
+
+Importing ``pinefarm`` loads all the commands and their dependencies, which
+is most of the overhead the service is meant to remove.
+Scripts and pipelines can instead run this file, which only uses the standard
+library, as::
+
+    python ipc.py <SOCKET> <OPERATION> [<JSON ARGUMENTS>]
+
+e.g.::
+
+    python ipc.py .prefix/cache/serve.sock convolve '{"grid": "/abs/grid.pineappl.lz4", "pdf": "NNPDF40_nnlo_as_01180"}'
+
+printing the JSON response (or the error, exiting with a non-zero code).
+Paths are resolved by the service, so they have to be absolute.
+"""
+
+import json
+import socket
+import sys
+
+
+def request(path, op, timeout=None, **payload):
+    """Send a request to the service.
+
+    Parameters
+    ----------
+    path : os.PathLike
+        path of the socket
+    op : str
+        operation (see :attr:`pinefarm.daemon.Service.OPERATIONS`)
+    timeout : float or None
+        timeout of the whole request (in seconds), waiting indefinitely if
+        `None`
+    payload : dict
+        arguments of the operation
+
+    Returns
+    -------
+    dict
+        response
+
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        sock.sendall((json.dumps({"op": op, **payload}) + "\n").encode())
+        with sock.makefile("rb") as fd:
+            response = json.loads(fd.readline())
+    if "error" in response:
+        raise RuntimeError(f"Service error: {response['error']}")
+    return response
+
+
+def main(argv=None):
+    """Entry point of the thin client."""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (2, 3):
+        print(__doc__, file=sys.stderr)
+        return 2
+    path, op, *arguments = argv
+    try:
+        response = request(path, op, **(json.loads(arguments[0]) if arguments else {}))
+    except (OSError, RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(response))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
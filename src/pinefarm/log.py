@@ -1,8 +1,13 @@
 """Logging tools."""
 
+import contextlib
+import contextvars
 import pathlib
 import subprocess as sp
 import sys
+import threading
+
+from . import events
 
 
 class WhileRedirectedError(RuntimeError):
@@ -24,81 +29,127 @@ class WhileRedirectedError(RuntimeError):
         self.file = file.absolute() if isinstance(file, pathlib.Path) else file
 
 
-class ChildStream:
-    """Inner stream."""
+_sinks = contextvars.ContextVar("sinks", default=())
+"""Active :class:`Tee` sinks, in the current context (thread or task)."""
+_install_lock = threading.Lock()
+_muted = 0
+"""Number of active :func:`muted` contexts (process-wide)."""
+
+
+class Dispatcher:
+    """Process-wide replacement of a standard stream.
+
+    The writes are forwarded to the wrapped stream, and to the :class:`Tee`
+    sinks active in the current context, such that concurrent runs only log
+    their own output.
 
-    def __init__(self, parent):
-        self.parent = parent
+    Parameters
+    ----------
+    stream : io.TextIOBase
+        wrapped stream
+    name : str
+        ``stdout`` or ``stderr``
+
+    """
+
+    def __init__(self, stream, name):
+        self.stream = stream
+        self.name = name
 
     def write(self, data):
         """Write to stream."""
-        self.parent.write(data, self)
+        for sink in _sinks.get():
+            if self.name in sink.streams:
+                sink.file.write(data)
+        if _muted:
+            return len(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        """Flush stream."""
+        for sink in _sinks.get():
+            sink.file.flush()
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _install():
+    """Replace the standard streams with dispatchers (only once)."""
+    with _install_lock:
+        if not isinstance(sys.stdout, Dispatcher):
+            sys.stdout = Dispatcher(sys.stdout, "stdout")
+        if not isinstance(sys.stderr, Dispatcher):
+            sys.stderr = Dispatcher(sys.stderr, "stderr")
 
-    def __getattribute__(self, name):
-        if name[0] != "_" and name not in ["parent", "write"]:
-            return super().__getattribute__("parent").__getattribute__(name)
-        return super().__getattribute__(name)
+
+def terminal():
+    """Original standard output, bypassing the dispatcher."""
+    _install()
+    return sys.stdout.stream
+
+
+@contextlib.contextmanager
+def muted():
+    """Stop writing the standard streams to the terminal, in all the threads.
+
+    The :class:`Tee` sinks still receive the output.
+
+    """
+    global _muted  # pylint: disable=global-statement
+    _install()
+    with _install_lock:
+        _muted += 1
+    try:
+        yield
+    finally:
+        with _install_lock:
+            _muted -= 1
 
 
 class Tee:
     """Context manager to tee stdout to file.
 
+    The redirection only affects the current context (thread or task), so
+    several of them can be active concurrently.
+
     Parameters
     ----------
     name : str or pathlib.Path
         path to redirect stdout to
+    stdout : bool
+        whether to redirect stdout
+    stderr : bool
+        whether to redirect stderr
 
     """
 
     def __init__(self, name, stdout=True, stderr=False):
         self.file = open(name, "w")
-        self.stdout = ChildStream(self) if stdout else sys.stdout
-        self.stderr = ChildStream(self) if stderr else sys.stderr
+        self.streams = {
+            stream
+            for stream, active in [("stdout", stdout), ("stderr", stderr)]
+            if active
+        }
+        self._token = None
 
     def __enter__(self):
-        self.stdout_bk = sys.stdout
-        self.stderr_bk = sys.stderr
-        sys.stdout = self.stdout
-        sys.stderr = self.stderr
+        _install()
+        self._token = _sinks.set(_sinks.get() + (self,))
         return self
 
     def __exit__(self, exc_type, exc, _):
+        _sinks.reset(self._token)
         if exc_type is WhileRedirectedError:
-            self.write(
-                f"Error occurred while the output was redirected to '{exc.file}'",
-                self.stderr,
-            )
-        sys.stdout = self.stdout_bk
-        sys.stderr = self.stderr_bk
+            msg = f"Error occurred while the output was redirected to '{exc.file}'"
+            self.file.write(msg)
+            sys.stderr.write(msg)
         self.file.flush()
         self.file.close()
 
-    def write(self, data, stream):
-        """Write to stream."""
-        self.file.write(data)
-        if stream is self.stdout:
-            self.stdout_bk.write(data)
-        elif stream is self.stderr:
-            self.stderr_bk.write(data)
-
-    def flush(self):
-        """Flush stream."""
-        self.file.flush()
-
-    def __getattribute__(self, name):
-        if name[0] != "_" and name not in [
-            "file",
-            "stdout",
-            "stderr",
-            "stdout_bk",
-            "stderr_bk",
-            "write",
-        ]:
-            return super().__getattribute__("file").__getattribute__(name)
-        return super().__getattribute__(name)
-
 
-def subprocess(*args, cwd, out):
+def subprocess(*args, cwd, out, progress=None):
     """Wrap :class:`subprocess.Popen` to print the output to screen and capture it.
 
     Parameters
@@ -109,6 +160,9 @@ def subprocess(*args, cwd, out):
         directory where to execute the command
     out : path-like or str
         file to which (also) redirect the output
+    progress : callable or None
+        parser of the output lines, returning the ``done``, ``total`` and
+        ``label`` of a :mod:`progress event <pinefarm.events>` (or `None`)
 
     Returns
     -------
@@ -129,5 +183,7 @@ def subprocess(*args, cwd, out):
                 print(line)
 
                 fd.write(line + "\n")
+                if progress is not None and (status := progress(line)) is not None:
+                    events.emit("progress", **status)
     except Exception:
         raise WhileRedirectedError(file=out)
@@ -0,0 +1,191 @@
+"""Metrics of the runs, exported for the Prometheus node exporter.
+
+Counters and gauges are updated in memory by the runs (and from the
+:mod:`events <pinefarm.events>` they emit), and periodically written by a
+background thread to a file in the text exposition format, suitable for the
+textfile collector of the node exporter.
+
+The export is enabled by setting ``paths::metrics`` (where ``{pid}`` is
+replaced with the process ID, such that several processes on the same node do
+not overwrite each other), and the update interval by ``metrics::interval``.
+The file is removed at the end of the export, such that the series of the
+finished processes are not exported forever.
+"""
+
+import contextlib
+import os
+import resource
+import tempfile
+import threading
+
+from . import configs, events
+
+PREFIX = "pinefarm_"
+"""Prefix of all the metric names."""
+INTERVAL = 15.0
+"""Default interval between updates of the metrics file (in seconds)."""
+
+METRICS = {
+    "jobs_running": ("gauge", "Jobs currently running", ()),
+    "jobs_completed_total": ("counter", "Jobs completed successfully", ()),
+    "jobs_failed_total": ("counter", "Jobs failed", ()),
+    "stage_seconds_total": ("counter", "Wall time spent in each stage", ("stage",)),
+    "stage_runs_total": ("counter", "Executions of each stage", ("stage",)),
+    "compressed_bytes_total": (
+        "counter",
+        "Bytes read and written by the grids compression",
+        ("direction",),
+    ),
+    "merged_bytes_total": ("counter", "Bytes of the merged grids", ()),
+    "grid_bytes": ("gauge", "Size of the latest generated grids", ("grid",)),
+    "child_cpu_seconds_total": ("counter", "CPU time of the child processes", ()),
+}
+"""Type, description and labels of the metrics."""
+
+_values = {}
+_lock = threading.Lock()
+
+
+def _key(name, labels):
+    """Identify a sample."""
+    if name not in METRICS or set(labels) != set(METRICS[name][2]):
+        raise KeyError(f"Unknown metric '{name}' with labels {list(labels)}")
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1.0, **labels):
+    """Increase a counter (or gauge)."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0.0) + value
+
+
+def set_value(name, value, **labels):
+    """Set the value of a gauge (or of a counter tracked elsewhere)."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = float(value)
+
+
+class _Jobs:
+    """Track jobs and stages from the events."""
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _close(self, job, now):
+        """Account the time of the current stage of a job."""
+        stage, start = self.stages.pop(job, (None, None))
+        if stage is not None:
+            inc("stage_seconds_total", now - start, stage=stage)
+            inc("stage_runs_total", stage=stage)
+        return stage is not None
+
+    def __call__(self, event):
+        if event.job is None:
+            return
+        with self._lock:
+            if event.kind == "stage":
+                if not self._close(event.job, event.time):
+                    inc("jobs_running")
+                self.stages[event.job] = (event.data["stage"], event.time)
+            elif event.kind in ("finished", "failed"):
+                if self._close(event.job, event.time):
+                    inc("jobs_running", -1)
+                inc(
+                    f"jobs_{'completed' if event.kind == 'finished' else 'failed'}_total"
+                )
+
+
+def _escape(value):
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    """Format the labels of a sample."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render():
+    """Render all the metrics in the text exposition format."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    set_value("child_cpu_seconds_total", usage.ru_utime + usage.ru_stime)
+
+    with _lock:
+        values = dict(_values)
+
+    lines = []
+    for name, (kind, description, labels) in METRICS.items():
+        samples = sorted((k, v) for k, v in values.items() if k[0] == name)
+        if not samples and labels:
+            continue
+        lines.append(f"# HELP {PREFIX}{name} {description}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        if not samples:
+            lines.append(f"{PREFIX}{name} 0")
+        for (_, labels), value in samples:
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    """Write the metrics file atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=".", suffix=".tmp", delete=False
+    ) as fd:
+        fd.write(render())
+    os.chmod(fd.name, 0o644)
+    os.replace(fd.name, path)
+
+
+def target():
+    """Path of the metrics file, if the export is enabled."""
+    path = configs.configs.get("paths", {}).get("metrics")
+    if path is None:
+        return None
+    return path.with_name(path.name.format(pid=os.getpid()))
+
+
+@contextlib.contextmanager
+def exporting(path=None, interval=None):
+    """Track the jobs, and periodically export the metrics in a background thread.
+
+    Nothing is done if the export is not enabled. The metrics file is removed
+    when leaving the context.
+
+    Parameters
+    ----------
+    path : pathlib.Path or None
+        metrics file (by default, ``paths::metrics``)
+    interval : float or None
+        interval between updates (by default, ``metrics::interval``)
+
+    """
+    path = target() if path is None else path
+    if path is None:
+        yield
+        return
+    if interval is None:
+        interval = configs.configs.get("metrics", {}).get("interval", INTERVAL)
+
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            write(path)
+
+    thread = threading.Thread(target=loop, name="metrics", daemon=True)
+    with events.subscribed(_Jobs()):
+        write(path)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+            path.unlink(missing_ok=True)
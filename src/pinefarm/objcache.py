@@ -0,0 +1,219 @@
+"""Content-addressed cache of compiled Fortran objects.
+
+The cache wraps the compiler: each compilation of a single source file
+(``-c``) is identified by the hash of the compiler, of the flags, of the
+source and of all the files it includes (or the modules it uses), and its
+object is stored in the cache.
+Later compilations with the same hash copy the object, instead of compiling
+it again, while all the other invocations (e.g. linking) are forwarded to the
+compiler.
+
+Sources defining modules are never cached, since their compilation also
+produces the module files.
+
+The wrapper is invoked as::
+
+    python objcache.py <CACHE> <COMPILER> <ARGS>...
+
+running this file as a script, without importing the whole package, since it
+is executed for each compilation (hence only the standard library is used).
+"""
+
+import hashlib
+import os
+import pathlib
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SOURCES = (".f", ".for", ".f77", ".f90", ".F", ".F90")
+"""Suffixes of the Fortran sources."""
+INCLUDE = re.compile(r"^\s*#?\s*include\s*['\"]([^'\"]+)['\"]", re.I | re.M)
+USE = re.compile(r"^\s*use\s*(?:,\s*\w+\s*::)?\s*(\w+)", re.I | re.M)
+MODULE = re.compile(r"^\s*module\s+(?!procedure\b)\w+\s*$", re.I | re.M)
+
+
+def wrapper(compiler, cache):
+    """Content of a shell script wrapping a compiler with the cache.
+
+    Parameters
+    ----------
+    compiler : os.PathLike
+        actual compiler
+    cache : os.PathLike
+        cache folder
+
+    Returns
+    -------
+    str
+        shell script
+
+    """
+    command = [sys.executable, str(pathlib.Path(__file__).resolve()), str(cache)]
+    command.append(str(compiler))
+    return "#!/bin/sh\nexec " + " ".join(shlex.quote(c) for c in command) + ' "$@"\n'
+
+
+def parse(args):
+    """Identify a cacheable compilation.
+
+    Returns
+    -------
+    dict or None
+        ``source``, ``output``, include ``dirs`` and the ``flags`` (without
+        source and output), or `None` if the invocation is not cacheable
+
+    """
+    if "-c" not in args:
+        return None
+
+    sources = []
+    flags = []
+    dirs = []
+    output = None
+    it = iter(args)
+    for arg in it:
+        if arg == "-o":
+            output = next(it, None)
+        elif arg in ("-I", "-J"):
+            folder = next(it, "")
+            dirs.append(folder)
+            flags.extend([arg, folder])
+        elif arg.startswith(("-I", "-J")):
+            dirs.append(arg[2:])
+            flags.append(arg)
+        elif not arg.startswith("-") and pathlib.Path(arg).suffix in SOURCES:
+            sources.append(arg)
+        else:
+            flags.append(arg)
+
+    if len(sources) != 1:
+        return None
+    source = pathlib.Path(sources[0])
+    if output is None:
+        output = source.with_suffix(".o").name
+    return {
+        "source": source,
+        "output": pathlib.Path(output),
+        "dirs": [pathlib.Path(d) for d in dirs],
+        "flags": flags,
+    }
+
+
+def _find(name, folders):
+    """Find a file in a list of folders."""
+    for folder in folders:
+        path = folder / name
+        if path.is_file():
+            return path
+    return None
+
+
+def dependencies(source, dirs):
+    """Collect the files a source depends on, recursively.
+
+    Parameters
+    ----------
+    source : pathlib.Path
+        Fortran source
+    dirs : list(pathlib.Path)
+        include folders, in addition to the one of the source and to the
+        working directory
+
+    Returns
+    -------
+    dict
+        content of each dependency (`None` if not found, e.g. intrinsic
+        modules), by name
+    bool
+        whether the source (or an included file) defines a module
+
+    """
+    folders = [source.parent, pathlib.Path("."), *dirs]
+    deps = {}
+    defines_module = False
+    pending = [source]
+    while pending:
+        text = pending.pop().read_text(errors="replace")
+        defines_module |= MODULE.search(text) is not None
+        for name in INCLUDE.findall(text):
+            if name in deps:
+                continue
+            path = _find(name, folders)
+            deps[name] = None if path is None else path.read_bytes()
+            if path is not None:
+                pending.append(path)
+        for module in USE.findall(text):
+            name = f"{module.lower()}.mod"
+            if name not in deps:
+                path = _find(name, folders)
+                deps[name] = None if path is None else path.read_bytes()
+    return deps, defines_module
+
+
+def key(compiler, job):
+    """Hash identifying a compilation, or `None` if not cacheable."""
+    deps, defines_module = dependencies(job["source"], job["dirs"])
+    if defines_module:
+        return None
+
+    exe = pathlib.Path(shutil.which(compiler) or compiler).resolve()
+    stat = exe.stat()
+    h = hashlib.sha256()
+    for part in (str(exe), str(stat.st_size), str(stat.st_mtime_ns), *job["flags"]):
+        h.update(part.encode() + b"\0")
+    h.update(job["source"].read_bytes())
+    for name in sorted(deps):
+        h.update(name.encode() + b"\0")
+        h.update(b"-" if deps[name] is None else deps[name])
+    return h.hexdigest()
+
+
+def _copy(src, dst):
+    """Copy a file atomically."""
+    with tempfile.NamedTemporaryFile(
+        dir=dst.parent, prefix=f".{dst.name}", delete=False
+    ) as fd:
+        tmp = fd.name
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def compile_cached(compiler, args, cache):
+    """Compile, reusing the cached object if available.
+
+    Returns
+    -------
+    int
+        exit code of the compiler
+
+    """
+    job = parse(args)
+    digest = None if job is None else key(compiler, job)
+    if digest is None:
+        return subprocess.call([compiler, *args])
+
+    cached = cache / digest[:2] / f"{digest}.o"
+    if cached.exists():
+        _copy(cached, job["output"])
+        return 0
+
+    code = subprocess.call([compiler, *args])
+    if code == 0 and job["output"].exists():
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        _copy(job["output"], cached)
+    return code
+
+
+def main(argv=None):
+    """Entry point of the compiler wrapper."""
+    argv = sys.argv[1:] if argv is None else argv
+    cache, compiler, *args = argv
+    return compile_cached(compiler, args, pathlib.Path(cache))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Tabulated PDF values on the nodes of a grid.
+
+A convolution evaluates the PDF and the strong coupling through Python
+callbacks on each node of the grid, repeating the same interpolation for every
+grid and scale variation.
+The values are instead tabulated once for each PDF member on the union of the
+grid nodes, and stored in the cache as ``.npy`` files, which are loaded as
+read-only memory maps, such that concurrent processes share the same pages.
+The files are keyed by the nodes and by the ``DataVersion`` of the set, such
+that an updated set is tabulated again.
+
+The LHAPDF members themselves are loaded through :func:`load`, such that a
+long-lived process (e.g. the :mod:`service <pinefarm.daemon>`) can provide the
+members it keeps loaded.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+
+_provider = contextvars.ContextVar("provider", default=None)
+"""Function loading the PDF members, if not LHAPDF itself."""
+
+
+def load(name):
+    """Load a PDF member, through the current provider (if any).
+
+    Parameters
+    ----------
+    name : str
+        ``<set>`` or ``<set>/<member>``
+
+    Returns
+    -------
+    lhapdf.PDF
+        loaded member (or an object with the same interface)
+
+    """
+    provider = _provider.get()
+    if provider is not None:
+        return provider(name)
+    import lhapdf  # pylint: disable=import-error,import-outside-toplevel
+
+    return lhapdf.mkPDF(name)
+
+
+@contextlib.contextmanager
+def provided(provider):
+    """Load the PDF members with ``provider``, within the context.
+
+    Parameters
+    ----------
+    provider : callable
+        function loading a member from its name (see :func:`load`)
+
+    """
+    token = _provider.set(provider)
+    try:
+        yield
+    finally:
+        _provider.reset(token)
+
+
+def nodes(grid, xi):
+    """Collect the nodes on which a grid requires the PDF values.
+
+    Parameters
+    ----------
+    grid : pineappl.grid.Grid
+        grid to be convolved
+    xi : list(tuple(float))
+        scale variations, as passed to the convolution
+
+    Returns
+    -------
+    numpy.ndarray
+        PIDs
+    numpy.ndarray
+        momentum fractions
+    numpy.ndarray
+        squared scales, including the variations of both the factorization and
+        renormalization scales
+
+    """
+    info = grid.evolve_info(np.ones(len(grid.orders()), dtype=bool))
+    factors = {f for variation in xi for f in variation[:2]}
+    # computed as in the convolution, such that the nodes match exactly
+    q2 = {float(f * f * mu2) for f in factors for mu2 in info.fac1}
+    q2 |= {float(f * f * mu2) for f in factors for mu2 in info.ren1}
+    return (
+        np.asarray(sorted(info.pids1), dtype=int),
+        np.asarray(sorted(info.x1), dtype=float),
+        np.asarray(sorted(q2), dtype=float),
+    )
+
+
+def _save(array, path):
+    """Write an ``.npy`` file atomically."""
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, suffix=".tmp", delete=False
+    ) as fd:
+        np.save(fd, array)
+    os.replace(fd.name, path)
+
+
+class PDFTable:
+    """PDF member tabulated on a fixed set of nodes.
+
+    The interface mimics the LHAPDF one, and values requested outside the
+    nodes are computed by LHAPDF itself.
+
+    Parameters
+    ----------
+    set_name : str
+        LHAPDF set name
+    member : int
+        member of the set
+    pids : numpy.ndarray
+        PIDs
+    x : numpy.ndarray
+        momentum fractions
+    q2 : numpy.ndarray
+        squared scales
+    cache : os.PathLike or None
+        folder in which the tables are stored (tabulated in memory if `None`)
+
+    """
+
+    def __init__(self, set_name, member, pids, x, q2, cache=None):
+        self.set_name = set_name
+        self.member = member
+        self._pdf = None
+        self.pids = {int(pid): i for i, pid in enumerate(pids)}
+        self.x = {float(v): i for i, v in enumerate(x)}
+        self.q2 = {float(v): i for i, v in enumerate(q2)}
+
+        if cache is None:
+            self.xfx, self.alphas = self.tabulate(pids, x, q2)
+            return
+
+        key = hashlib.sha256(self.version.encode())
+        for array in (pids, x, q2):
+            key.update(np.ascontiguousarray(array).tobytes())
+        self.key = key.hexdigest()[:16]
+
+        folder = pathlib.Path(cache) / "pdf_tables" / set_name
+        path = folder / f"{member:04d}_{self.key}.npy"
+        alphas_path = path.with_suffix(".alphas.npy")
+        if not (path.exists() and alphas_path.exists()):
+            folder.mkdir(parents=True, exist_ok=True)
+            xfx, alphas = self.tabulate(pids, x, q2)
+            _save(alphas, alphas_path)
+            _save(xfx, path)
+        self.xfx = np.load(path, mmap_mode="r")
+        self.alphas = np.load(alphas_path, mmap_mode="r")
+
+    @classmethod
+    def for_grid(cls, grid, set_name, member=0, xi=((1.0, 1.0, 1.0),), cache=None):
+        """Tabulate a PDF member on the nodes of a grid.
+
+        Parameters
+        ----------
+        grid : pineappl.grid.Grid
+            grid to be convolved
+        set_name : str
+            LHAPDF set name
+        member : int
+            member of the set
+        xi : list(tuple(float))
+            scale variations, as passed to the convolution
+        cache : os.PathLike or None
+            folder in which the tables are stored
+
+        """
+        return cls(set_name, member, *nodes(grid, xi), cache=cache)
+
+    @property
+    def pdf(self):
+        """LHAPDF member, loaded on first use."""
+        if self._pdf is None:
+            self._pdf = load(f"{self.set_name}/{self.member}")
+        return self._pdf
+
+    @property
+    def version(self):
+        """Version of the set data (empty if not declared)."""
+        return str(self.pdf.info().get_entry("DataVersion", ""))
+
+    def tabulate(self, pids, x, q2):
+        """Evaluate the PDF and the strong coupling on the nodes."""
+        xfx = np.empty((len(pids), len(x), len(q2)))
+        for i, pid in enumerate(pids):
+            for j, xj in enumerate(x):
+                for k, q2k in enumerate(q2):
+                    xfx[i, j, k] = self.pdf.xfxQ2(int(pid), float(xj), float(q2k))
+        alphas = np.array([self.pdf.alphasQ2(float(v)) for v in q2])
+        return xfx, alphas
+
+    def xfxQ2(self, pid, x, q2):  # pylint: disable=invalid-name
+        """Compute ``x * f(x, Q2)``, LHAPDF-like."""
+        try:
+            return float(self.xfx[self.pids[pid], self.x[x], self.q2[q2]])
+        except KeyError:
+            return self.pdf.xfxQ2(pid, x, q2)
+
+    def alphasQ2(self, q2):  # pylint: disable=invalid-name
+        """Compute the strong coupling, LHAPDF-like."""
+        try:
+            return float(self.alphas[self.q2[q2]])
+        except KeyError:
+            return self.pdf.alphasQ2(q2)
@@ -0,0 +1,176 @@
+"""Removal of the negligible contributions from a grid.
+
+The contributions of each channel and order are computed with a reference PDF,
+over the nine points scale variations (such that the orders containing the
+scale logarithms are also probed).
+The channels and orders are removed from the smallest one, as long as their
+combined contribution (the sum of their absolute values) stays below
+``threshold`` times the total, in absolute value, for every bin and scale
+variation, such that many small contributions cannot add up beyond it.
+
+Bins are never removed, since their number and order is bound to the data.
+"""
+
+import json
+import os
+import pathlib
+import time
+
+import numpy as np
+import pineappl
+
+from . import pdftable, tools
+
+ULPS = 64
+"""Tolerance used to identify equivalent channels."""
+
+
+def _convolve(grid, pdf, order_mask=None, channel_mask=None):
+    """Convolve a grid over the nine points scale variations."""
+    return grid.convolve(
+        pdg_convs=grid.convolutions,
+        xfxs=[pdf.xfxQ2] * len(grid.convolutions),
+        alphas=pdf.alphasQ2,
+        order_mask=np.array([] if order_mask is None else order_mask, dtype=bool),
+        channel_mask=np.array([] if channel_mask is None else channel_mask, dtype=bool),
+        xi=tools.nine_points,
+    )
+
+
+def negligible(grid, pdf, threshold):
+    """Find the negligible channels and orders of a grid.
+
+    Parameters
+    ----------
+    grid : pineappl.grid.Grid
+        grid to be inspected
+    pdf : pdftable.PDFTable
+        reference PDF
+    threshold : float
+        relative tolerance on each bin, for all the removed contributions
+        together
+
+    Returns
+    -------
+    list(int)
+        indices of the negligible channels
+    list(int)
+        indices of the negligible orders
+
+    """
+    total = np.abs(_convolve(grid, pdf))
+    # the channels and orders share the same budget
+    budget = threshold * total
+
+    def small(masks, key):
+        nonlocal budget
+        contributions = [np.abs(_convolve(grid, pdf, **{key: mask})) for mask in masks]
+        # largest relative contribution over bins and scales (infinite if the
+        # total vanishes where the contribution does not)
+        relative = [
+            np.max(
+                np.divide(c, total, out=np.where(c > 0, np.inf, 0.0), where=total > 0)
+            )
+            for c in contributions
+        ]
+        indices = []
+        for i in sorted(range(len(masks)), key=lambda i: relative[i]):
+            if np.any(contributions[i] > budget):
+                break
+            budget = budget - contributions[i]
+            indices.append(i)
+        return sorted(indices)
+
+    channels = small(np.eye(len(grid.channels()), dtype=bool), "channel_mask")
+    orders = small(np.eye(len(grid.orders()), dtype=bool), "order_mask")
+    return channels, orders
+
+
+def _write(grid, path):
+    """Write a grid, compressing it according to its extension."""
+    if path.suffix == ".lz4":
+        grid.write_lz4(str(path))
+    else:
+        grid.write(str(path))
+
+
+def _timing(grid, pdf):
+    """Measure the time (in seconds) of a full convolution."""
+    t0 = time.perf_counter()
+    _convolve(grid, pdf)
+    return time.perf_counter() - t0
+
+
+def slim(path, pdf_name, threshold, output=None, cache=None):
+    """Remove the negligible contributions from a grid.
+
+    The report is stored in the ``slimming`` metadata of the resulting grid.
+
+    Parameters
+    ----------
+    path : os.PathLike
+        grid to be slimmed
+    pdf_name : str
+        reference PDF (``<set>`` or ``<set>/<member>``)
+    threshold : float
+        relative tolerance below which contributions are discarded
+    output : os.PathLike or None
+        path of the slimmed grid (by default the input is overwritten)
+    cache : os.PathLike or None
+        folder in which the PDF values are cached
+
+    Returns
+    -------
+    dict
+        report of the removed contributions, with size (in bytes) and
+        convolution time (in seconds) before and after
+
+    """
+    path = pathlib.Path(path)
+    output = path if output is None else pathlib.Path(output)
+
+    grid = pineappl.grid.Grid.read(str(path))
+    set_name, _, member = pdf_name.partition("/")
+    pdf = pdftable.PDFTable.for_grid(
+        grid, set_name, int(member or 0), xi=tools.nine_points, cache=cache
+    )
+
+    report = {
+        "threshold": threshold,
+        "pdf": pdf_name,
+        "channels": len(grid.channels()),
+        "orders": len(grid.orders()),
+        "bytes": [path.stat().st_size],
+        "time": [_timing(grid, pdf)],
+    }
+
+    channels, orders = negligible(grid, pdf, threshold)
+    # keep at least one channel and one order, to preserve a valid grid
+    if len(channels) < len(grid.channels()):
+        grid.delete_channels(channels)
+    else:
+        channels = []
+    if len(orders) < len(grid.orders()):
+        grid.delete_orders(orders)
+    else:
+        orders = []
+    grid.dedup_channels(ULPS)
+    grid.optimize()
+
+    report["deleted_channels"] = channels
+    report["deleted_orders"] = orders
+    report["merged_channels"] = (
+        report["channels"] - len(channels) - len(grid.channels())
+    )
+    report["time"].append(_timing(grid, pdf))
+
+    # the final size is only known after writing, so the report is stored in
+    # the grid written first to a temporary file
+    tmp = output.with_name(output.name + ".tmp" + output.suffix)
+    _write(grid, tmp)
+    report["bytes"].append(tmp.stat().st_size)
+    grid.set_metadata("slimming", json.dumps(report))
+    _write(grid, tmp)
+    os.replace(tmp, output)
+
+    return report
@@ -0,0 +1,361 @@
+"""Relocatable snapshots of the prefix.
+
+Building the prefix (LHAPDF, the PineAPPL CAPI, MG5aMC@NLO with its converted
+models, Vrap) from source takes a long time, and it is the same on every node.
+A snapshot packs the installed prefix in a compressed archive, with a manifest
+listing the versions of the programs, the checksum of each file, and the files
+referring to the absolute path of the prefix.
+
+Importing a snapshot verifies the checksums, and rewrites those references
+(and the absolute symbolic links) to the new prefix, such that it can be
+unpacked under a different root.
+References inside binary files cannot be rewritten: they are listed in the
+manifest, and the binaries rely on the environment set by
+:func:`pinefarm.install.update_environ` instead.
+
+The build trees and the cache are not part of the snapshot.
+"""
+
+import datetime
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import platform
+import shutil
+import sys
+import tarfile
+import tempfile
+import warnings
+
+from . import __version__, configs, install
+
+MANIFEST = "snapshot.json"
+"""Name of the manifest, in the archive and in the imported prefix."""
+EXCLUDED = ("cache", "cargo", "pineappl", "lhapdf")
+"""Entries of the prefix not included in the snapshot (cache and build trees)."""
+CHUNK = 1 << 20
+"""Size of the blocks read from the files."""
+
+
+UNKNOWN = "unknown"
+"""Version recorded for the programs installed without version information."""
+
+
+def expected():
+    """Versions of the programs installed by this version of pinefarm."""
+    from .external import mg5, vrap
+
+    return {
+        "lhapdf": install.LHAPDF_VERSION.split("-", 1)[1],
+        "mg5amc": pathlib.PurePosixPath(mg5.URL).name.split(".tar")[0].lstrip("v"),
+        "vrap": vrap.VERSION,
+    }
+
+
+def _python():
+    """Version of the Python interpreter (for the installed bindings)."""
+    return ".".join(sys.version.split(".")[:2])
+
+
+def _field(path, key, separator):
+    """Read the value of a ``key<separator>value`` line from a file, if any."""
+    if not path.exists():
+        return None
+    for line in path.read_text().splitlines():
+        name, found, value = line.partition(separator)
+        if found and name.strip() == key:
+            return value.strip()
+    return None
+
+
+def programs():
+    """Versions of the programs installed in the prefix.
+
+    The versions are read from the installation itself: the ``Version`` of the
+    pkg-config files of LHAPDF and of the PineAPPL CAPI, the ``VERSION`` file
+    of MG5aMC@NLO and the version recorded by the Vrap installation (see
+    :func:`pinefarm.install.vrap_version_file`).
+    The programs installed without such information are reported as
+    :data:`UNKNOWN`.
+
+    """
+    paths = configs.configs["paths"]
+    commands = configs.configs["commands"]
+    pkgconfig = paths["lib"] / "pkgconfig"
+    mg5 = pathlib.Path(commands["mg5"])
+
+    found = {}
+    for name, program, metadata, key, separator in (
+        ("lhapdf", pkgconfig / "lhapdf.pc", pkgconfig / "lhapdf.pc", "Version", ":"),
+        (
+            "pineappl",
+            pkgconfig / "pineappl_capi.pc",
+            pkgconfig / "pineappl_capi.pc",
+            "Version",
+            ":",
+        ),
+        ("mg5amc", mg5, mg5.parent.parent / "VERSION", "version", "="),
+        ("vrap", commands["vrap"], install.vrap_version_file(), "version", "="),
+    ):
+        if pathlib.Path(program).exists():
+            found[name] = _field(metadata, key, separator) or UNKNOWN
+    return found
+
+
+def _scan(path, needle=None):
+    """Checksum a file, possibly looking for a string in it.
+
+    Returns
+    -------
+    str
+        SHA-256 of the content
+    bool
+        whether the string is contained
+    bool
+        whether the file is binary
+
+    """
+    digest = hashlib.sha256()
+    found = binary = False
+    tail = b""
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(CHUNK), b""):
+            digest.update(chunk)
+            binary |= b"\0" in chunk
+            if needle is not None:
+                found |= needle in tail + chunk
+                tail = chunk[-len(needle) :]
+    return digest.hexdigest(), found, binary
+
+
+def _entries(root):
+    """Walk a prefix, yielding the relative paths of its entries."""
+    for folder, dirs, files in os.walk(root):
+        folder = pathlib.Path(folder)
+        if folder == root:
+            dirs[:] = [d for d in dirs if d not in EXCLUDED]
+            files = [f for f in files if f != MANIFEST]
+        dirs.sort()
+        for name in dirs + sorted(files):
+            yield (folder / name).relative_to(root)
+
+
+def dump(archive):
+    """Pack the prefix in a snapshot.
+
+    Parameters
+    ----------
+    archive : pathlib.Path
+        compressed tarball to write
+
+    Returns
+    -------
+    dict
+        manifest of the snapshot
+
+    """
+    prefix = configs.configs["paths"]["prefix"].absolute()
+    needle = str(prefix).encode()
+    manifest = {
+        "prefix": str(prefix),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "pinefarm": __version__,
+        "python": _python(),
+        "machine": platform.machine(),
+        "versions": programs(),
+        "files": {},
+        "relocate": [],
+        "binaries": [],
+    }
+
+    tmp = archive.with_name(archive.name + ".part")
+    with tarfile.open(tmp, "w:gz", compresslevel=6) as tar:
+        for rel in _entries(prefix):
+            path = prefix / rel
+            if path.is_file() and not path.is_symlink():
+                digest, found, binary = _scan(path, needle)
+                manifest["files"][rel.as_posix()] = digest
+                if found:
+                    manifest["binaries" if binary else "relocate"].append(
+                        rel.as_posix()
+                    )
+            tar.add(path, arcname=rel.as_posix(), recursive=False)
+
+        content = json.dumps(manifest, indent=2).encode()
+        info = tarfile.TarInfo(MANIFEST)
+        info.size = len(content)
+        info.mtime = int(datetime.datetime.now().timestamp())
+        with tempfile.TemporaryFile() as fd:
+            fd.write(content)
+            fd.seek(0)
+            tar.addfile(info, fd)
+    os.replace(tmp, archive)
+
+    return manifest
+
+
+def verify(root, files):
+    """Check the content of the files against their checksums.
+
+    Raises
+    ------
+    ValueError
+        if any file is missing or altered
+
+    """
+    corrupted = [
+        rel
+        for rel, digest in files.items()
+        if not (root / rel).is_file() or _scan(root / rel)[0] != digest
+    ]
+    if corrupted:
+        raise ValueError(
+            f"Snapshot corrupted, {len(corrupted)} files altered or missing: "
+            + ", ".join(corrupted[:5])
+        )
+
+
+def relocate(root, manifest, prefix):
+    """Rewrite the references to the original prefix.
+
+    Parameters
+    ----------
+    root : pathlib.Path
+        folder where the snapshot has been unpacked
+    manifest : dict
+        manifest of the snapshot
+    prefix : pathlib.Path
+        new prefix
+
+    """
+    old = manifest["prefix"]
+    for rel in manifest["relocate"]:
+        path = root / rel
+        path.write_bytes(path.read_bytes().replace(old.encode(), str(prefix).encode()))
+
+    for rel in _entries(root):
+        path = root / rel
+        if path.is_symlink():
+            target = os.readlink(path)
+            if target == old or target.startswith(old + os.sep):
+                path.unlink()
+                path.symlink_to(str(prefix) + target[len(old) :])
+
+
+def load(archive):
+    """Unpack a snapshot in the prefix.
+
+    The entries of the snapshot replace the existing ones in the prefix.
+
+    Parameters
+    ----------
+    archive : pathlib.Path
+        snapshot tarball
+
+    Returns
+    -------
+    dict
+        manifest of the snapshot, as imported
+
+    """
+    prefix = configs.configs["paths"]["prefix"].absolute()
+    prefix.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=prefix.parent, prefix=".snapshot-") as tmp:
+        root = pathlib.Path(tmp)
+        with tarfile.open(archive, "r:*") as tar:
+            members = tar.getmembers()
+            for member in members:
+                name = pathlib.PurePosixPath(member.name)
+                if name.is_absolute() or ".." in name.parts:
+                    raise ValueError(f"Invalid entry '{member.name}' in '{archive}'")
+            # absolute symbolic links are expected, and relocated below
+            options = {"filter": "tar"} if hasattr(tarfile, "tar_filter") else {}
+            tar.extractall(root, members=members, **options)
+
+        manifest = json.loads((root / MANIFEST).read_text())
+        (root / MANIFEST).unlink()
+        verify(root, manifest["files"])
+        relocate(root, manifest, prefix)
+
+        manifest["exported_from"] = manifest["prefix"]
+        manifest["prefix"] = str(prefix)
+        manifest["imported"] = datetime.datetime.now().isoformat(timespec="seconds")
+        (root / MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+        for entry in sorted(root.iterdir()):
+            dest = prefix / entry.name
+            if dest.is_dir() and not dest.is_symlink():
+                shutil.rmtree(dest)
+            elif dest.exists() or dest.is_symlink():
+                dest.unlink()
+            os.replace(entry, dest)
+
+    return manifest
+
+
+def problems(manifest, prefix):
+    """Compare an imported snapshot with the expected installation.
+
+    Parameters
+    ----------
+    manifest : dict
+        manifest of the imported snapshot
+    prefix : pathlib.Path
+        current prefix
+
+    Returns
+    -------
+    list(str)
+        mismatches found (empty if the snapshot is consistent)
+
+    """
+    found = []
+    if manifest["prefix"] != str(prefix.absolute()):
+        found.append(
+            f"snapshot relocated to '{manifest['prefix']}', but the prefix is "
+            f"'{prefix.absolute()}' (import it again)"
+        )
+    if manifest["python"] != _python():
+        found.append(
+            f"snapshot built for Python {manifest['python']}, running {_python()}"
+        )
+    if manifest["machine"] != platform.machine():
+        found.append(
+            f"snapshot built for {manifest['machine']}, running on {platform.machine()}"
+        )
+    versions = expected()
+    for name, version in manifest["versions"].items():
+        if name in versions and versions[name] != version:
+            found.append(f"{name} {version} in the snapshot, expected {versions[name]}")
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def check(prefix):
+    """Warn if the snapshot imported in the prefix does not match the configs.
+
+    Nothing is checked if the prefix was not imported from a snapshot.
+    The check is only done once for each prefix.
+
+    Parameters
+    ----------
+    prefix : pathlib.Path
+        prefix to check
+
+    Returns
+    -------
+    tuple(str)
+        mismatches found
+
+    """
+    path = prefix / MANIFEST
+    if not path.exists():
+        return ()
+
+    found = tuple(problems(json.loads(path.read_text()), prefix))
+    for problem in found:
+        warnings.warn(f"Imported snapshot mismatch: {problem}")
+    return found
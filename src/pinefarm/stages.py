@@ -0,0 +1,261 @@
+"""Incremental reruns, based on the inputs of each stage.
+
+A run is split in three stages, possibly followed by an optional one:
+
+- ``generate``: running the external program and producing the grids
+- ``annotate``: comparing the grids to the original results and adding the
+  versions metadata
+- ``postprocess``: running ``postrun.sh``, adding the pinecard metadata and
+  compressing the grids
+- ``evolve`` (optional): evolving the grids into FK tables, in the
+  ``fktables`` subfolder (see :mod:`pinefarm.evolution`)
+
+The hash of the inputs of each completed stage is recorded in the manifest of
+the run folder, together with a snapshot of the grids at the end of the stage.
+A new run for the same pinecard and theory reuses the latest run folder with
+the same generation inputs, and only executes the stages whose inputs changed.
+"""
+
+import fcntl
+import hashlib
+import importlib.metadata
+import json
+import os
+import shutil
+
+import yaml
+
+from . import __version__
+
+STAGES = ("generate", "annotate", "postprocess", "evolve")
+"""Stages of a run, in order."""
+FINAL = "postprocess"
+"""Stage producing the final grids (the following ones only add outputs)."""
+FKTABLES = "fktables"
+"""Folder containing the FK tables, produced by the ``evolve`` stage."""
+MANIFEST = "manifest.yaml"
+"""Name of the manifest file in a run folder."""
+SNAPSHOTS = "stages"
+"""Folder containing the snapshots of the grids at the end of each stage."""
+POSTPROCESS_FILES = ("metadata.txt", "postrun.sh")
+"""Pinecard files only affecting the postprocessing."""
+FICLONE = 0x40049409
+"""Linux ``ioctl`` cloning a file, sharing its blocks until modified."""
+
+
+def digest(*parts):
+    """Hash JSON-serializable objects."""
+    content = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def files_digest(folder, include=None, exclude=()):
+    """Hash the content of all the files in a folder.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        folder to be hashed, recursively
+    include : list(str) or None
+        if given, only hash these files (relative paths)
+    exclude : list(str)
+        files to be skipped (relative paths)
+
+    Returns
+    -------
+    dict
+        hash of each file, indexed by relative path
+
+    """
+    hashes = {}
+    for path in sorted(folder.rglob("*")):
+        rel = path.relative_to(folder).as_posix()
+        if not path.is_file() or rel in exclude:
+            continue
+        if include is not None and rel not in include:
+            continue
+        hashes[rel] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return hashes
+
+
+def manifest(runner, slim=None, evolve=False):
+    """Compute the hash of the inputs of each stage.
+
+    Each stage also depends on the inputs of the previous ones.
+    The optional ``evolve`` stage is only included if requested.
+
+    Parameters
+    ----------
+    runner : interface.External
+        runner instance
+    slim : float or None
+        slimming threshold
+    evolve : bool
+        whether the grids are evolved
+
+    Returns
+    -------
+    dict
+        inputs hash, for each stage
+
+    """
+    generate = digest(runner.generation_inputs(), slim)
+    annotate = digest(generate, runner.pdf, __version__)
+    postprocess = digest(
+        annotate, files_digest(runner.source, include=POSTPROCESS_FILES)
+    )
+    hashes = dict(zip(STAGES, (generate, annotate, postprocess)))
+    if evolve:
+        # the theory is part of the generation inputs
+        hashes["evolve"] = digest(postprocess, importlib.metadata.version("eko"))
+    return hashes
+
+
+def load(folder):
+    """Load the manifest of a run folder (empty if not available)."""
+    path = folder / MANIFEST
+    if not path.exists():
+        return {}
+    return yaml.safe_load(path.read_text()) or {}
+
+
+def _grids(folder):
+    """Grids stored at the top level of a run folder."""
+    return [
+        p
+        for p in folder.iterdir()
+        if p.is_file() and p.name.endswith((".pineappl", ".pineappl.lz4"))
+    ]
+
+
+def record(folder, stage, hashes):
+    """Mark a stage as completed.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        run folder
+    stage : str
+        completed stage
+    hashes : dict
+        inputs hash, for each stage
+
+    """
+    if STAGES.index(stage) < STAGES.index(FINAL):
+        snapshot = folder / SNAPSHOTS / stage
+        # the folder might be shared with a previous run
+        shutil.rmtree(snapshot, ignore_errors=True)
+        snapshot.mkdir(parents=True)
+        for grid in _grids(folder):
+            shutil.copy2(grid, snapshot / grid.name)
+
+    content = load(folder)
+    content[stage] = hashes[stage]
+    (folder / MANIFEST).write_text(yaml.safe_dump(content))
+
+
+def completed(folder, hashes):
+    """Stages of a run folder that can be reused.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+        run folder
+    hashes : dict
+        inputs hash, for each stage
+
+    Returns
+    -------
+    tuple(str)
+        leading stages whose inputs are unchanged
+
+    """
+    previous = load(folder)
+    done = []
+    for stage in STAGES:
+        if stage not in hashes or previous.get(stage) != hashes[stage]:
+            break
+        done.append(stage)
+    return tuple(done)
+
+
+def _link_or_copy(src, dst):
+    """Hard link a file, or copy it if not possible."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _clone_or_copy(src, dst):
+    """Copy a file, as a copy-on-write clone if supported by the filesystem."""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def reuse(runner, hashes):
+    """Reuse the outputs of the latest compatible run.
+
+    The top level files of the previous run folder are copied, and the grids
+    are restored from the snapshot of the last reusable stage.
+    The subfolders are copied as well (as copy-on-write clones, where
+    supported), since the following stages (e.g. ``postrun.sh``) could modify
+    them in place. They are only hard linked if the final grids are reused, and
+    no stage modifying them is executed.
+    The FK tables are only reused if the ``evolve`` stage is.
+
+    Parameters
+    ----------
+    runner : interface.External
+        runner instance, whose output folder is populated
+    hashes : dict
+        inputs hash, for each stage
+
+    Returns
+    -------
+    tuple(str)
+        stages that do not need to be executed again
+
+    """
+    results = runner.dest.parent
+    candidates = sorted(
+        results.glob(f"{runner.theory['ID']}-{runner.name}-*"), reverse=True
+    )
+    for previous in candidates:
+        if previous == runner.dest or not previous.is_dir():
+            continue
+        done = completed(previous, hashes)
+        if done:
+            break
+    else:
+        return ()
+
+    final = FINAL in done
+    grids = set(_grids(previous))
+    for path in previous.iterdir():
+        if path.name == MANIFEST or (path in grids and not final):
+            continue
+        if path.name == FKTABLES and "evolve" not in done:
+            continue
+        if path.is_dir():
+            shutil.copytree(
+                path,
+                runner.dest / path.name,
+                copy_function=_link_or_copy if final else _clone_or_copy,
+                dirs_exist_ok=True,
+            )
+        else:
+            shutil.copy2(path, runner.dest / path.name)
+
+    if not final:
+        for grid in (previous / SNAPSHOTS / done[-1]).iterdir():
+            shutil.copy2(grid, runner.dest / grid.name)
+
+    content = {stage: hashes[stage] for stage in done}
+    (runner.dest / MANIFEST).write_text(yaml.safe_dump(content))
+    print(f"Reusing the stages {', '.join(done)} from {previous}")
+    return done
@@ -6,10 +6,10 @@ import more_itertools
 import pandas as pd
 import pineappl
 
-from . import tools
+from . import pdftable, tools
 
 
-def convolute_grid(grid, pdf_name, integrated=False):
+def convolute_grid(grid, pdf_name, integrated=False, cache=None):
     """Call `convolute` via PineAPPL CLI.
 
     Parameters
@@ -20,6 +20,9 @@ def convolute_grid(grid, pdf_name, integrated=False):
         PDF name
     integrated : bool
         whether the bins have to be integrated with bins normalizations
+    cache : os.PathLike or None
+        folder in which the PDF values on the grid nodes are cached (see
+        :class:`pinefarm.pdftable.PDFTable`)
 
     Returns
     -------
@@ -27,10 +30,15 @@ def convolute_grid(grid, pdf_name, integrated=False):
         (essential) output splitted by line
 
     """
-    import lhapdf  # pylint: disable=import-error
-
-    pdf = lhapdf.mkPDF(pdf_name)
+    set_name, _, member = pdf_name.partition("/")
     loaded_grid = pineappl.grid.Grid.read(str(grid))
+    pdf = pdftable.PDFTable.for_grid(
+        loaded_grid,
+        set_name,
+        int(member or 0),
+        xi=tools.nine_points,
+        cache=cache,
+    )
     pineappl_results = loaded_grid.convolve(
         pdg_convs=loaded_grid.convolutions,
         xfxs=[pdf.xfxQ2],
@@ -50,7 +58,7 @@ def convolute_grid(grid, pdf_name, integrated=False):
     return df
 
 
-def print_table(pineappl_results, external_results, dest):
+def print_table(pineappl_results, external_results, dest, filename="results.log"):
     """Print comparison table to screen.
 
     Parameters
@@ -60,7 +68,9 @@ def print_table(pineappl_results, external_results, dest):
     external_results : pandas.DataFrame
         results from the external program
     dest : pathlib.Path
-        path to output file
+        path to output folder
+    filename : str
+        name of the output file
 
     """
     comparison = pd.DataFrame()
@@ -115,6 +125,6 @@ def print_table(pineappl_results, external_results, dest):
 
     comp_str = f"{header}\n{comp_str}"
 
-    with open(dest / "results.log", "w") as fd:
+    with open(dest / filename, "w") as fd:
         fd.write(comp_str)
     print(comp_str)
@@ -1,6 +1,8 @@
 """Auxilariy tools."""
 
+import contextlib
 import datetime
+import fcntl
 import itertools
 import subprocess
 import time
@@ -10,16 +12,22 @@ import pineappl
 import pygit2
 import rich
 
-from . import configs
+from . import configs, metrics
 
 
 def create_output_folder(name, theoryid):
     """Create output folder.
 
+    The folder is created atomically, and a numeric suffix is appended to the
+    timestamp if a folder with the same name already exists (e.g. for runs
+    started in the same second).
+
     Parameters
     ----------
     name : str
         dataset name
+    theoryid : int
+        theory ID
 
     Returns
     -------
@@ -27,15 +35,40 @@ def create_output_folder(name, theoryid):
         path to output folder
 
     """
-    target = configs.configs["paths"]["results"] / (
+    results = configs.configs["paths"]["results"]
+    results.mkdir(exist_ok=True, parents=True)
+    base = (
         str(theoryid)
         + "-"
         + name
         + "-"
         + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     )
-    target.mkdir(exist_ok=True, parents=True)
-    return target
+    for attempt in itertools.count():
+        target = results / (base if attempt == 0 else f"{base}_{attempt}")
+        try:
+            target.mkdir()
+        except FileExistsError:
+            continue
+        return target
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a file, shared among processes.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        lock file (created if not existing)
+
+    """
+    with open(path, "a") as fd:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
 
 
 def print_time(t0, what=None):
@@ -80,6 +113,10 @@ def compress(path):
     ) as fd:
         fd.write(path.read_bytes())
 
+    metrics.inc("compressed_bytes_total", path.stat().st_size, direction="in")
+    metrics.inc(
+        "compressed_bytes_total", compressed_path.stat().st_size, direction="out"
+    )
     return compressed_path
 
 
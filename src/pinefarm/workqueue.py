@@ -0,0 +1,452 @@
+"""Pull-based work queue, to spread runs over several nodes.
+
+A coordinator stores the jobs (pinecard, theory card and PDF) in a SQLite
+database, and serves them over TCP to the workers, which pull one job at a
+time, run it and report back the outcome.
+
+The protocol consists of JSON messages, one per line, each request being
+answered by a single response on the same connection.
+
+A leased job has to be renewed by the worker with heartbeats: if the lease
+expires (e.g. because the worker died), the job is queued again, up to a
+maximum number of attempts.
+
+The pending jobs are leased longest first, according to the ``estimate`` of
+their cost given at submission (the jobs without one first, as possibly the
+longest), such that the shortest jobs fill the gaps at the end of the queue.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import traceback
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+"""Default address of the coordinator."""
+LEASE = 600.0
+"""Default lease duration (in seconds)."""
+ATTEMPTS = 3
+"""Default maximum number of attempts for each job."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    pinecard TEXT NOT NULL,
+    theory TEXT NOT NULL,
+    pdf TEXT NOT NULL,
+    estimate REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    expires REAL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    timings TEXT,
+    output TEXT,
+    error TEXT
+)
+"""
+
+
+def parse_address(address):
+    """Split a ``host:port`` address."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class Coordinator:
+    """Job queue, stored in a SQLite database.
+
+    Parameters
+    ----------
+    database : pathlib.Path
+        path of the database (created if not existing)
+    lease : float
+        lease duration (in seconds)
+    attempts : int
+        maximum number of attempts of each job, before considering it failed
+
+    """
+
+    OPERATIONS = ("submit", "lease", "heartbeat", "complete", "status")
+    """Operations available to the clients."""
+
+    def __init__(self, database, lease=LEASE, attempts=ATTEMPTS):
+        self.database = database
+        self.lease_time = lease
+        self.attempts = attempts
+        self._lock = threading.Lock()
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute(SCHEMA)
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+            # databases created before the estimates were stored
+            if "estimate" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN estimate REAL")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection to the database, in a transaction."""
+        with contextlib.closing(sqlite3.connect(self.database, timeout=30.0)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def submit(self, jobs):
+        """Add jobs to the queue.
+
+        Parameters
+        ----------
+        jobs : list(dict)
+            jobs, with ``pinecard`` name, ``theory`` card and ``pdf`` name,
+            and optionally the ``estimate`` of their cost (e.g. in
+            core-seconds), used to lease the longest jobs first
+
+        Returns
+        -------
+        dict
+            ``ids`` of the new jobs
+
+        """
+        ids = []
+        with self._lock, self.connect() as conn:
+            for job in jobs:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (pinecard, theory, pdf, estimate, submitted) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        job["pinecard"],
+                        json.dumps(job["theory"]),
+                        job["pdf"],
+                        job.get("estimate"),
+                        time.time(),
+                    ),
+                )
+                ids.append(cursor.lastrowid)
+        return {"ids": ids}
+
+    def _expire(self, conn, now):
+        """Queue again the jobs with an expired lease."""
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, "
+            "error = 'lease expired too many times' "
+            "WHERE status = 'leased' AND expires < ? AND attempts >= ?",
+            (now, now, self.attempts),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = 'pending', worker = NULL, expires = NULL "
+            "WHERE status = 'leased' AND expires < ?",
+            (now,),
+        )
+
+    def lease(self, worker):
+        """Lease the longest pending job.
+
+        The jobs without an estimate come first, and the ties are broken by
+        submission order.
+
+        Parameters
+        ----------
+        worker : str
+            worker name
+
+        Returns
+        -------
+        dict
+            leased ``job`` (`None` if there is no pending job), including its
+            ``attempt`` number and the ``lease`` duration
+
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            self._expire(conn, now)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' "
+                "ORDER BY estimate IS NOT NULL, estimate DESC, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return {"job": None}
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, expires = ?, "
+                "attempts = attempts + 1, started = ? WHERE id = ?",
+                (worker, now + self.lease_time, now, row["id"]),
+            )
+        return {
+            "job": {
+                "id": row["id"],
+                "pinecard": row["pinecard"],
+                "theory": json.loads(row["theory"]),
+                "pdf": row["pdf"],
+                "attempt": row["attempts"] + 1,
+                "lease": self.lease_time,
+            }
+        }
+
+    def _owned(self, conn, job, worker, attempt):
+        """Check whether a job is still leased by a worker."""
+        row = conn.execute(
+            "SELECT status, worker, attempts FROM jobs WHERE id = ?", (job,)
+        ).fetchone()
+        return (
+            row is not None
+            and row["status"] == "leased"
+            and row["worker"] == worker
+            and row["attempts"] == attempt
+        )
+
+    def heartbeat(self, job, worker, attempt):
+        """Renew the lease of a job.
+
+        Returns
+        -------
+        dict
+            whether the job is still leased by the worker (``ok``)
+
+        """
+        with self._lock, self.connect() as conn:
+            if not self._owned(conn, job, worker, attempt):
+                return {"ok": False}
+            conn.execute(
+                "UPDATE jobs SET expires = ? WHERE id = ?",
+                (time.time() + self.lease_time, job),
+            )
+        return {"ok": True}
+
+    def complete(
+        self, job, worker, attempt, status, timings=None, output=None, error=None
+    ):
+        """Store the outcome of a job.
+
+        Outcomes of expired leases are discarded, since the job might have been
+        leased again in the meanwhile.
+
+        Returns
+        -------
+        dict
+            whether the outcome has been accepted (``ok``)
+
+        """
+        with self._lock, self.connect() as conn:
+            if not self._owned(conn, job, worker, attempt):
+                return {"ok": False}
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, timings = ?, output = ?, "
+                "error = ?, expires = NULL WHERE id = ?",
+                (status, time.time(), json.dumps(timings), output, error, job),
+            )
+        return {"ok": True}
+
+    def status(self):
+        """List all the jobs.
+
+        Returns
+        -------
+        dict
+            ``jobs``, with their status, worker, attempts, timings and output
+
+        """
+        with self._lock, self.connect() as conn:
+            self._expire(conn, time.time())
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job["theory"] = json.loads(job["theory"]).get("ID")
+            job["timings"] = json.loads(job["timings"] or "null")
+            jobs.append(job)
+        return {"jobs": jobs}
+
+    def dispatch(self, message):
+        """Execute a request and produce the response."""
+        op = message.pop("op", None)
+        if op not in self.OPERATIONS:
+            return {"error": f"Unknown operation '{op}'"}
+        try:
+            return getattr(self, op)(**message)
+        except Exception as e:  # pylint: disable=broad-except
+            return {"error": repr(e)}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer the requests of a single connection."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.coordinator.dispatch(json.loads(line))
+            except json.JSONDecodeError as e:
+                response = {"error": repr(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """TCP server exposing a coordinator."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, coordinator, address=DEFAULT_ADDRESS):
+        self.coordinator = coordinator
+        super().__init__(parse_address(address), _Handler)
+
+
+def request(address, op, timeout=30.0, **payload):
+    """Send a request to the coordinator.
+
+    Parameters
+    ----------
+    address : str
+        ``host:port`` of the coordinator
+    op : str
+        operation (see :attr:`Coordinator.OPERATIONS`)
+    timeout : float
+        connection timeout (in seconds)
+    payload : dict
+        arguments of the operation
+
+    Returns
+    -------
+    dict
+        response
+
+    """
+    with socket.create_connection(parse_address(address), timeout=timeout) as sock:
+        sock.sendall((json.dumps({"op": op, **payload}) + "\n").encode())
+        with sock.makefile("rb") as fd:
+            response = json.loads(fd.readline())
+    if "error" in response:
+        raise RuntimeError(f"Coordinator error: {response['error']}")
+    return response
+
+
+def execute(job):
+    """Run a job through the ``run`` pipeline.
+
+    Returns
+    -------
+    str
+        status of the job (``done``, or ``prepared`` if the runner only
+        prepares the run files)
+    dict
+        wall time of each executed stage
+    str
+        output folder
+
+    """
+    # pylint: disable=import-outside-toplevel
+    from . import stages
+    from .cli import run
+
+    runner = run.build_runner(job["pinecard"], job["theory"], job["pdf"])
+    run.install_reqs(runner, job["pdf"])
+    skip = stages.reuse(runner, stages.manifest(runner))
+    if not skip and not run.prepare(runner):
+        return "prepared", {}, str(runner.dest)
+    timings = run.run_dataset(runner, skip=skip)
+    return "done", timings, str(runner.dest)
+
+
+class Worker:
+    """Pull and execute jobs from a coordinator.
+
+    Parameters
+    ----------
+    address : str
+        ``host:port`` of the coordinator
+    name : str or None
+        worker name (by default, host name and process ID)
+    poll : float
+        interval (in seconds) between requests, when the queue is empty
+    execute : callable
+        function running a job (see :func:`execute`)
+
+    """
+
+    def __init__(self, address, name=None, poll=5.0, execute=execute):
+        self.address = address
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.poll = poll
+        self.execute = execute
+
+    def _heartbeat(self, job, stop):
+        """Renew the lease of a job, until stopped."""
+        while not stop.wait(job["lease"] / 3):
+            try:
+                request(
+                    self.address,
+                    "heartbeat",
+                    job=job["id"],
+                    worker=self.name,
+                    attempt=job["attempt"],
+                )
+            except OSError:
+                # the coordinator might be temporarily unreachable
+                pass
+
+    def run_job(self, job):
+        """Execute a leased job, and report its outcome."""
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job, stop), daemon=True)
+        beat.start()
+        t0 = time.perf_counter()
+        try:
+            status, timings, output = self.execute(job)
+            error = None
+        except Exception:  # pylint: disable=broad-except
+            status, timings, output = "failed", {}, None
+            error = traceback.format_exc()
+        finally:
+            stop.set()
+            beat.join()
+        timings = dict(timings, total=time.perf_counter() - t0)
+
+        return request(
+            self.address,
+            "complete",
+            job=job["id"],
+            worker=self.name,
+            attempt=job["attempt"],
+            status=status,
+            timings=timings,
+            output=output,
+            error=error,
+        )
+
+    def run(self, drain=False):
+        """Process jobs.
+
+        Parameters
+        ----------
+        drain : bool
+            stop as soon as the queue is empty (otherwise, wait for new jobs
+            indefinitely)
+
+        Returns
+        -------
+        int
+            number of processed jobs
+
+        """
+        processed = 0
+        while True:
+            job = request(self.address, "lease", worker=self.name)["job"]
+            if job is None:
+                if drain:
+                    return processed
+                time.sleep(self.poll)
+                continue
+
+            print(
+                f"Running job {job['id']}: {job['pinecard']} (attempt {job['attempt']})"
+            )
+            self.run_job(job)
+            processed += 1
@@ -0,0 +1,31 @@
+import click.testing
+
+from pinefarm.cli import autogen
+
+
+def fake_main(dataset, target, output, select_obs=None, cache=None):
+    if dataset == "BROKEN":
+        raise ValueError("no metadata")
+    return [output]
+
+
+def test_runcards_failure(monkeypatch, tmp_path):
+    monkeypatch.setattr(autogen, "main", fake_main)
+    monkeypatch.setattr(
+        autogen, "expand_datasets", lambda datasets, cache=None: list(datasets)
+    )
+    monkeypatch.setattr(
+        autogen.configs,
+        "configs",
+        {"paths": {"cache": tmp_path, "runcards": tmp_path}},
+    )
+
+    result = click.testing.CliRunner().invoke(
+        autogen.runcards, ["GOOD", "BROKEN", "-j", "1"]
+    )
+    assert result.exit_code == 1
+    assert "1 of 2 datasets failed: BROKEN" in result.output
+    assert "NNLOJET_GOOD" in result.output
+
+    result = click.testing.CliRunner().invoke(autogen.runcards, ["GOOD", "-j", "1"])
+    assert result.exit_code == 0
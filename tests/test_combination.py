@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from pinefarm import combination
+
+
+def test_trim_mask():
+    values = np.array([[1.0, 2.0], [1.1, 2.0], [0.9, 2.0], [10.0, 2.1]])
+    errors = np.full_like(values, 0.1)
+
+    mask = combination.trim_mask(values, errors, threshold=3.5, fraction=0.25)
+    # only the outlier of the first quantity, the second one is compatible
+    np.testing.assert_array_equal(mask[:, 0], [False, False, False, True])
+    assert not mask[:, 1].any()
+
+    # no determination discarded without a fraction, or with too few runs
+    assert not combination.trim_mask(values, errors, 3.5, 0.0).any()
+    assert not combination.trim_mask(values[:2], errors[:2], 3.5, 1.0).any()
+
+
+def test_trim_mask_fraction():
+    values = np.array([[0.0], [0.0], [0.0], [5.0], [-6.0]])
+    errors = np.full_like(values, 0.1)
+    # two outliers, but at most ceil(0.2 * 5) = 1 discarded: the farthest one
+    mask = combination.trim_mask(values, errors, threshold=3.5, fraction=0.2)
+    np.testing.assert_array_equal(mask[:, 0], [False, False, False, False, True])
+
+
+def test_weighted_average():
+    values = np.array([[1.0, 4.0], [3.0, 4.0]])
+    errors = np.array([[1.0, 0.0], [2.0, 0.0]])
+
+    mean, error, weights = combination.weighted_average(values, errors)
+    # inverse-variance weights 1 and 1/4
+    np.testing.assert_allclose(weights[:, 0], [0.8, 0.2])
+    np.testing.assert_allclose(mean[0], 0.8 * 1.0 + 0.2 * 3.0)
+    np.testing.assert_allclose(error[0], np.sqrt(1.0 / (1.0 + 0.25)))
+    # vanishing errors: equal weights
+    np.testing.assert_allclose(weights[:, 1], [0.5, 0.5])
+    np.testing.assert_allclose(mean[1], 4.0)
+    np.testing.assert_allclose(error[1], 0.0)
+
+
+def test_weighted_average_trim():
+    values = np.array([[1.0], [1.0], [1.0], [100.0]])
+    errors = np.ones_like(values)
+
+    mean, _, weights = combination.weighted_average(values, errors, trim=(3.5, 0.25))
+    assert weights[3, 0] == 0.0
+    np.testing.assert_allclose(weights.sum(axis=0), 1.0)
+    np.testing.assert_allclose(mean, [1.0])
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_merge_grids(tmp_path, jobs):
+    pineappl = pytest.importorskip("pineappl")
+    interp = pineappl.interpolation
+
+    def grid(value):
+        conv = pineappl.convolutions.Conv(
+            convolution_types=pineappl.convolutions.ConvType(
+                polarized=False, time_like=False
+            ),
+            pid=2212,
+        )
+        grid = pineappl.grid.Grid(
+            pid_basis=pineappl.pids.PidBasis.Pdg,
+            channels=[pineappl.boc.Channel([([2], 1.0)])],
+            orders=[pineappl.boc.Order(0, 0, 0, 0, 0)],
+            bins=pineappl.boc.BinsWithFillLimits.from_fill_limits(
+                fill_limits=[0.0, 1.0, 2.0]
+            ),
+            convolutions=[conv],
+            interpolations=[
+                interp.Interp(
+                    min=10,
+                    max=1e3,
+                    nodes=50,
+                    order=3,
+                    reweight_meth=interp.ReweightingMethod.NoReweight,
+                    map=interp.MappingMethod.ApplGridH0,
+                    interpolation_meth=interp.InterpolationMethod.Lagrange,
+                ),
+                interp.Interp(
+                    min=1e-5,
+                    max=1,
+                    nodes=40,
+                    order=3,
+                    reweight_meth=interp.ReweightingMethod.ApplGridX,
+                    map=interp.MappingMethod.ApplGridF2,
+                    interpolation_meth=interp.InterpolationMethod.Lagrange,
+                ),
+            ],
+            kinematics=[pineappl.boc.Kinematics.Scale(0), pineappl.boc.Kinematics.X(0)],
+            scale_funcs=pineappl.boc.Scales(
+                ren=pineappl.boc.ScaleFuncForm.Scale(0),
+                fac=pineappl.boc.ScaleFuncForm.Scale(0),
+                frg=pineappl.boc.ScaleFuncForm.NoScale(0),
+            ),
+        )
+        for bin_ in range(2):
+            grid.set_subgrid(
+                0,
+                bin_,
+                0,
+                pineappl.subgrid.ImportSubgridV1(
+                    array=np.array([[value * (bin_ + 1)]]),
+                    node_values=[[100.0], [0.1]],
+                ).into(),
+            )
+        return grid
+
+    paths = []
+    for i, value in enumerate([1.0, 2.0, 3.0, 4.0, 5.0]):
+        paths.append(tmp_path / f"{i}.pineappl")
+        grid(value).write(str(paths[-1]))
+    factors = [[0.2, 0.1]] * len(paths)
+
+    output = tmp_path / "merged.pineappl"
+    combination.merge_grids(paths, output, factors=factors, jobs=jobs)
+    merged = pineappl.grid.Grid.read(str(output))
+    arrays = [
+        merged.subgrid(0, bin_, 0).to_array(merged.subgrid(0, bin_, 0).shape)
+        for bin_ in range(2)
+    ]
+    np.testing.assert_allclose(arrays[0], [[0.2 * 15.0]])
+    np.testing.assert_allclose(arrays[1], [[0.1 * 30.0]])
@@ -0,0 +1,126 @@
+import click.testing
+import numpy as np
+import pytest
+
+from pinefarm import configs, constraints
+
+pineappl = pytest.importorskip("pineappl")
+
+BULK = """\
+name: POS_M1
+kind: positivity
+pid: 1
+hadron_pid: 2212
+xgrid: [0.1, 0.2]
+q2: 5.0
+---
+name: INTEG_M2
+kind: integrability
+hadron_pid: 2212
+flavour: 200
+xgrid: [0.001, 0.01]
+"""
+
+
+class FakePDF:
+    """LHAPDF-like PDF, with different values for each flavour."""
+
+    @staticmethod
+    def xfxQ2(pid, x, q2):
+        x = np.asarray(x)
+        return (pid + 10) * x * (1 - x)
+
+    @staticmethod
+    def alphasQ2(q2):
+        return 0.118
+
+
+@pytest.fixture
+def runcards(tmp_path):
+    folder = tmp_path / "runcards"
+    pinecard = folder / "POS_A"
+    pinecard.mkdir(parents=True)
+    (pinecard / "positivity.yaml").write_text(
+        "pid: 2\nhadron_pid: 2212\nxgrid: [1.0e-3, 0.1, 0.5]\nq2: 5.0\n"
+    )
+    (pinecard / "metadata.txt").write_text("arxiv=none\n")
+    (folder / "OTHER").mkdir()
+    (tmp_path / "bulk.yaml").write_text(BULK)
+    return folder
+
+
+def test_load_cards(runcards, tmp_path):
+    assert constraints.discover(runcards) == [runcards / "POS_A"]
+
+    cards = constraints.load_cards([runcards / "POS_A", tmp_path / "bulk.yaml"])
+    assert [(c.name, c.kind) for c in cards] == [
+        ("POS_A", "positivity"),
+        ("POS_M1", "positivity"),
+        ("INTEG_M2", "integrability"),
+    ]
+    assert cards[0].pinecard == runcards / "POS_A"
+    assert cards[1].pinecard is None
+    assert "name" not in cards[1].runcard and "kind" not in cards[1].runcard
+
+
+def test_load_cards_errors(runcards, tmp_path):
+    with pytest.raises(ValueError, match="Duplicate cards: INTEG_M2, POS_M1"):
+        constraints.load_cards([tmp_path / "bulk.yaml"] * 2)
+    with pytest.raises(ValueError, match="not a positivity or integrability"):
+        constraints.load_cards([runcards / "OTHER"])
+
+    unknown = tmp_path / "unknown.yaml"
+    unknown.write_text("name: X\nkind: other\n")
+    with pytest.raises(ValueError, match="Unknown kind 'other'"):
+        constraints.load_cards([unknown])
+    (tmp_path / "nameless.yaml").write_text("kind: positivity\n")
+    with pytest.raises(ValueError, match="Card without name"):
+        constraints.load_cards([tmp_path / "nameless.yaml"])
+
+    (runcards / "POS_A" / "postrun.sh").touch()
+    with pytest.raises(ValueError, match="postrun script"):
+        constraints.load_cards([runcards / "POS_A"])
+
+
+def test_generate(runcards, tmp_path):
+    cards = constraints.load_cards([runcards / "POS_A", tmp_path / "bulk.yaml"])
+    dest = tmp_path / "out"
+    dest.mkdir()
+    reports = constraints.generate(cards, dest, {"ID": 0, "Q0": 1.65}, jobs=2)
+
+    assert [r["bins"] for r in reports] == [3, 2, 1]
+    assert all(r["difference"] is None for r in reports)
+    grid = pineappl.grid.Grid.read(str(dest / "POS_A.pineappl.lz4"))
+    assert grid.metadata["arxiv"] == "none"
+    assert "pinecard" in grid.metadata
+    grid = pineappl.grid.Grid.read(str(dest / "INTEG_M2.pineappl.lz4"))
+    assert grid.metadata["integrability_version"] == "1.0"
+
+    # the integrability grids need the scale of the theory
+    with pytest.raises(ValueError, match="requires the theory Q0"):
+        constraints.generate(cards, dest, {"ID": 0})
+
+
+def test_check(runcards, tmp_path):
+    pdf = FakePDF()
+    for card in constraints.load_cards([runcards / "POS_A", tmp_path / "bulk.yaml"]):
+        grid = constraints.build(card, q2=1.65**2)
+        assert constraints.check(grid, card, pdf, q2=1.65**2) < 1e-8
+
+
+def test_command(monkeypatch, runcards, tmp_path):
+    from pinefarm.cli import constraints as cli
+
+    paths = configs.paths(configs.basic_paths(tmp_path))
+    monkeypatch.setattr(cli.configs, "configs", {"paths": paths})
+    (tmp_path / "theory.yaml").write_text("ID: 400\nQ0: 1.65\n")
+
+    result = click.testing.CliRunner().invoke(
+        cli.subcommand,
+        [str(tmp_path / "theory.yaml"), "--no-check", "-j", "1"],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    (output,) = (tmp_path / "results").iterdir()
+    assert output.name.startswith("400-constraints")
+    assert [p.name for p in output.iterdir()] == ["POS_A.pineappl.lz4"]
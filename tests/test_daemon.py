@@ -0,0 +1,51 @@
+import os
+import stat
+import sys
+import types
+
+from pinefarm import daemon, pdftable
+
+
+def test_socket_permissions(tmp_path):
+    path = tmp_path / "serve.sock"
+    mask = os.umask(0o022)
+    try:
+        with daemon.Server(types.SimpleNamespace(), path):
+            mode = stat.S_IMODE(path.stat().st_mode)
+            assert mode & 0o077 == 0
+        # the umask of the process is restored
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(mask)
+    assert not path.exists()
+
+
+def test_run_shared_pdfs(monkeypatch, tmp_path):
+    loaded = []
+
+    def mkPDF(set_name, member):
+        loaded.append((set_name, member))
+        return types.SimpleNamespace(alphasQ=lambda q: 0.118, name=set_name)
+
+    monkeypatch.setitem(sys.modules, "lhapdf", types.SimpleNamespace(mkPDF=mkPDF))
+    monkeypatch.setattr(daemon.install, "init_prefix", lambda: None)
+    monkeypatch.setattr(daemon.install, "update_environ", lambda: None)
+    from pinefarm.cli import run
+
+    monkeypatch.setattr(run, "install_reqs", lambda runner, pdf: None)
+
+    def main(pinecard, theory, pdf, **kwargs):
+        # as the runners do, e.g. in the comparison with the original results
+        member = pdftable.load(pdf)
+        assert member.alphasQ(91.2) == 0.118
+        assert pdftable.load(f"{pdf}/0").name == pdf
+        return types.SimpleNamespace(dest=tmp_path / pinecard)
+
+    monkeypatch.setattr(run, "main", main)
+
+    service = daemon.Service(jobs=1)
+    for _ in range(2):
+        assert service.run("card", 400, "SET") == {"output": str(tmp_path / "card")}
+    # loaded once, and kept for the following runs
+    assert loaded == [("SET", 0)]
+    assert service.status()["pdfs"] == ["SET/0"]
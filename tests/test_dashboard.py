@@ -0,0 +1,41 @@
+from pinefarm import dashboard, events
+from pinefarm.external import mg5
+
+
+def event(kind, time, **data):
+    return events.Event(job="TEST", kind=kind, data=data, time=time)
+
+
+def test_mg5_progress():
+    status = mg5.progress("INFO:  Idle: 3,  Running: 2,  Completed: 5 [ 1m 3s ]")
+    assert status == {"done": 5, "total": 10, "label": "channels"}
+    assert mg5.progress("INFO: Compiling the sources") is None
+
+
+def test_rate():
+    job = dashboard.Job("TEST", 0.0)
+    job.update(event("stage", 0.0, stage="generate"))
+    assert job.rate() is None
+
+    job.update(event("progress", 10.0, done=2, total=20, label="channels"))
+    # a single point is not enough
+    assert job.rate() is None
+    job.update(event("progress", 70.0, done=5, total=20, label="channels"))
+    assert job.rate() == 3.0
+    name, stage, _, progress, rate, eta = job.row(70.0)
+    assert (name, stage, progress, rate, eta) == (
+        "TEST",
+        "generate",
+        "channels 5/20",
+        "3.00/min",
+        "5m00s",
+    )
+
+    # the rate restarts for new kinds of steps, and new stages
+    job.update(event("progress", 80.0, done=1, total=10, label="seeds"))
+    assert job.rate() is None
+    job.update(event("stage", 90.0, stage="annotate"))
+    assert job.progress is None and job.rate() is None
+
+    job.update(event("finished", 100.0))
+    assert job.row(200.0)[1:3] == ("[green]finished[/]", "1m40s")
@@ -0,0 +1,36 @@
+import pytest
+
+from pinefarm.cli import diff
+
+
+def test_collector_limit():
+    found = diff._Collector(2)
+    found.add("bins", "", "first")
+    found.add("bins", "", "second")
+    assert len(found.differences) == 2
+
+    with pytest.raises(diff._Enough):
+        found.add("bins", "", "third")
+    assert [d.detail for d in found.differences] == ["first", "second"]
+
+
+def test_collector_unlimited():
+    found = diff._Collector(None)
+    for i in range(100):
+        found.add("values", str(i), "")
+    assert len(found.differences) == 100
+
+
+def test_match(tmp_path):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    for name in ("a.pineappl.lz4", "b.pineappl.lz4", "notes.txt"):
+        (first / name).touch()
+    for name in ("a.pineappl.lz4", "c.pineappl"):
+        (second / name).touch()
+
+    pairs, unmatched = diff.match(first, second)
+    assert pairs == [(first / "a.pineappl.lz4", second / "a.pineappl.lz4")]
+    assert unmatched == [first / "b.pineappl.lz4", second / "c.pineappl"]
@@ -0,0 +1,81 @@
+import os
+import types
+
+import pytest
+
+from pinefarm import evolution
+
+
+def operator(folder, name, size, mtime):
+    path = folder / f"{name}.tar"
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_evict(tmp_path):
+    old, middle, recent = (
+        operator(tmp_path, name, 10, mtime)
+        for name, mtime in (("old", 1000), ("middle", 2000), ("recent", 3000))
+    )
+    (tmp_path / ".old.lock").touch()
+
+    # within the limit
+    assert evolution.evict(tmp_path, 30) == []
+    # the least recently used first
+    assert evolution.evict(tmp_path, 25) == [old]
+    assert sorted(tmp_path.glob("*.tar")) == [middle, recent]
+    # the operators in use are kept, even beyond the limit
+    assert evolution.evict(tmp_path, 5, keep=[middle]) == [recent]
+    assert list(tmp_path.glob("*.tar")) == [middle]
+    assert (tmp_path / ".old.lock").exists()
+
+
+def test_evict_reused(tmp_path):
+    first = operator(tmp_path, "first", 10, 1000)
+    second = operator(tmp_path, "second", 10, 2000)
+    # reusing an operator marks it as recently used
+    os.utime(first)
+    assert evolution.evict(tmp_path, 10) == [second]
+
+
+def info(x, mu2):
+    return types.SimpleNamespace(x1=x, fac1=mu2)
+
+
+def convolution(polarized=False, time_like=False):
+    return types.SimpleNamespace(
+        convolution_types=types.SimpleNamespace(
+            polarized=polarized, time_like=time_like
+        )
+    )
+
+
+def test_operator_card():
+    card = evolution.operator_card(
+        info([0.5, 1e-3, 1.0, 0.1, 1e-2], [100.0, 4.0]), convolution(time_like=True)
+    )
+    assert card["interpolation_xgrid"] == [1e-3, 1e-2, 0.1, 0.5, 1.0]
+    assert card["mugrid"] == [2.0, 10.0]
+    assert card["interpolation_polynomial_degree"] == 4
+    assert (card["polarized"], card["time_like"]) == (False, True)
+
+    # the degree is limited by the number of nodes
+    card = evolution.operator_card(info([0.1, 1.0], [4.0]), convolution())
+    assert card["interpolation_polynomial_degree"] == 1
+
+
+def test_key():
+    pytest.importorskip("eko")
+    theory = {"ID": 400, "PTO": 1, "Comments": "first", "alphas": 0.118}
+    card = evolution.operator_card(info([1e-3, 0.1, 1.0], [4.0]), convolution())
+    key = evolution.key(theory, card)
+    assert len(key) == 32
+
+    # independent of the theory ID, the comments and the order of the entries
+    renamed = {"alphas": 0.118, "PTO": 1, "Comments": "second", "ID": 700}
+    assert evolution.key(renamed, dict(reversed(list(card.items())))) == key
+    # but not of the physics
+    assert evolution.key(dict(theory, PTO=2), card) != key
+    other = evolution.operator_card(info([1e-3, 0.1, 1.0], [4.0]), convolution(True))
+    assert evolution.key(theory, other) != key
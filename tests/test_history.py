@@ -0,0 +1,29 @@
+import types
+
+from pinefarm import history
+
+
+def test_stage_memory():
+    # a new peak of the process, or of a generator subprocess
+    assert history.stage_memory((100, 10), (200, 10)) == 200
+    assert history.stage_memory((100, 10), (100, 300)) == 300
+    # below the peaks of the previous jobs of a long-lived process
+    assert history.stage_memory((100, 10), (100, 10)) is None
+
+
+def test_measure(monkeypatch, tmp_path):
+    monkeypatch.setattr(history, "database", lambda: tmp_path / "history.sqlite")
+    monkeypatch.setattr(history.configs, "cores", lambda: 2)
+    peaks = iter([(1000, 0), (1000, 0), (1000, 0), (1000, 500)])
+    monkeypatch.setattr(history, "peak_memory", lambda: next(peaks))
+    runner = types.SimpleNamespace(
+        name="TEST", theory={"ID": 400, "PTO": 0}, features=lambda: {"size": 3}
+    )
+
+    for stage in ("annotate", "postprocess"):
+        with history.measure(runner, stage):
+            pass
+
+    with history.connect() as conn:
+        memory = dict(conn.execute("SELECT stage, memory FROM stages"))
+    assert memory == {"annotate": None, "postprocess": 500}
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from pinefarm import install
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Fake installation steps, recording the cores of their builds."""
+    cores = {}
+    started = threading.Barrier(2, timeout=5)
+
+    def step(name, fail=False, wait=False):
+        def installer():
+            if wait:
+                # run together with the other independent step
+                started.wait()
+            cores[name] = install.build_cores()
+            if fail:
+                raise RuntimeError("build failed")
+            return True
+
+        return installer
+
+    monkeypatch.setattr(
+        install,
+        "STEPS",
+        {
+            "a": ((), step("a", wait=True)),
+            "b": ((), step("b", wait=True)),
+            "c": (("a", "b"), step("c")),
+            "broken": (("a",), step("broken", fail=True)),
+            "d": (("broken",), step("d")),
+        },
+    )
+    monkeypatch.setattr(install.configs, "configs", {"resources": {"cores": 8}})
+    return cores
+
+
+def test_toolchain_cores(steps):
+    outcomes = install.toolchain(["c"])
+    assert outcomes == {"a": True, "b": True, "c": True}
+    # the independent steps share the budget, the last one gets all of it
+    assert steps == {"a": 4, "b": 4, "c": 8}
+    # outside of the toolchain, the whole budget
+    assert install.build_cores() == 8
+
+
+def test_toolchain_failure(steps, capsys):
+    outcomes = install.toolchain(["c", "d"])
+    assert outcomes["c"] and outcomes["a"] and outcomes["b"]
+    assert outcomes["broken"] is False
+    assert outcomes["d"] is False
+    assert "d" not in steps
+    out = capsys.readouterr().out
+    assert "Failed broken: build failed" in out
+    assert "Skipped d" in out
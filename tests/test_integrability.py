@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from pinefarm.external import integrability
+
+pytest.importorskip("pineappl")
+
+RUNCARD = {"hadron_pid": 2212, "flavour": 200, "xgrid": [1e-5, 1e-4, 1e-3, 1e-2]}
+Q2 = 2.0
+
+
+class FakePDF:
+    """LHAPDF-like PDF, with different values for each flavour."""
+
+    @staticmethod
+    def xfxQ2(pid, x, q2):
+        x = np.asarray(x)
+        return (pid + 10) * x * (1 - x)
+
+
+def test_build_grid():
+    grid = integrability.build_grid(RUNCARD, Q2)
+
+    # a single bin, integrated over the whole x grid
+    assert grid.bins() == 1
+    limits = np.array(grid.bin_limits())[0]
+    np.testing.assert_allclose(limits, [[Q2, Q2], [1e-5, 1e-2]])
+
+    pdf = FakePDF()
+    convolved = grid.convolve(
+        pdg_convs=grid.convolutions,
+        xfxs=[lambda pid, x, q2: float(pdf.xfxQ2(pid, x, q2))],
+        alphas=lambda q2: 0.118,
+    )
+    expected = integrability.predictions(pdf, RUNCARD, Q2)
+    np.testing.assert_allclose(convolved, expected["result"], rtol=1e-10)
@@ -0,0 +1,21 @@
+import time
+
+from pinefarm import metrics
+
+
+def test_exporting(tmp_path):
+    path = tmp_path / "metrics" / "pinefarm.prom"
+    with metrics.exporting(path, interval=0.01):
+        metrics.inc("merged_bytes_total", 10.0)
+        time.sleep(0.1)
+        assert "pinefarm_merged_bytes_total" in path.read_text()
+    # no stale series left after the end of the process
+    assert not path.exists()
+    assert list(path.parent.iterdir()) == []
+
+
+def test_exporting_disabled(monkeypatch):
+    monkeypatch.setattr(metrics.configs, "configs", {})
+    assert metrics.target() is None
+    with metrics.exporting():
+        pass
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from pinefarm.external import mg5
+
+pineappl = pytest.importorskip("pineappl")
+
+
+def histogram(low, high):
+    """Grid of a single-bin histogram."""
+    interp = pineappl.interpolation
+    grid = pineappl.grid.Grid(
+        pid_basis=pineappl.pids.PidBasis.Pdg,
+        channels=[pineappl.boc.Channel([([2, 2], 1.0)])],
+        orders=[pineappl.boc.Order(0, 0, 0, 0, 0)],
+        bins=pineappl.boc.BinsWithFillLimits.from_fill_limits(fill_limits=[low, high]),
+        convolutions=[
+            pineappl.convolutions.Conv(
+                convolution_types=pineappl.convolutions.ConvType(
+                    polarized=False, time_like=False
+                ),
+                pid=2212,
+            )
+        ]
+        * 2,
+        interpolations=[
+            interp.Interp(
+                min=10,
+                max=1e3,
+                nodes=50,
+                order=3,
+                reweight_meth=interp.ReweightingMethod.NoReweight,
+                map=interp.MappingMethod.ApplGridH0,
+                interpolation_meth=interp.InterpolationMethod.Lagrange,
+            )
+        ]
+        + [
+            interp.Interp(
+                min=1e-5,
+                max=1,
+                nodes=40,
+                order=3,
+                reweight_meth=interp.ReweightingMethod.ApplGridX,
+                map=interp.MappingMethod.ApplGridF2,
+                interpolation_meth=interp.InterpolationMethod.Lagrange,
+            )
+        ]
+        * 2,
+        kinematics=[
+            pineappl.boc.Kinematics.Scale(0),
+            pineappl.boc.Kinematics.X(0),
+            pineappl.boc.Kinematics.X(1),
+        ],
+        scale_funcs=pineappl.boc.Scales(
+            ren=pineappl.boc.ScaleFuncForm.Scale(0),
+            fac=pineappl.boc.ScaleFuncForm.Scale(0),
+            frg=pineappl.boc.ScaleFuncForm.NoScale(0),
+        ),
+    )
+    x = np.array([0.1, 0.2])
+    subgrid = pineappl.subgrid.ImportSubgridV1(
+        array=np.ones((1, 2, 2)), node_values=[[100.0], x, x]
+    )
+    grid.set_subgrid(0, 0, 0, subgrid.into())
+    return grid
+
+
+def test_merge_histograms(tmp_path):
+    run = tmp_path / "Events" / "run_01"
+    run.mkdir(parents=True)
+    # more than 10 histograms, such that the names are not in numeric order
+    rows = []
+    for index in range(12):
+        low, high = float(10 * index), float(10 * index + 5)
+        histogram(low, high).write(str(run / f"amcblast_obs_{index}.pineappl"))
+        rows.append(f"  {low:+.7e}   {high:+.7e}   {1.0:+.7e}   {0.1:+.7e}")
+    (run / "MADatNLO.HwU").write_text("\n".join(["<histogram> 1", *rows]) + "\n")
+
+    grid = mg5.merge_histograms(tmp_path)
+    limits = np.array(grid.bin_limits())[:, 0, :]
+    np.testing.assert_allclose(limits, mg5.hwu_table(tmp_path)[:, :2])
+
+
+def test_launch_features():
+    assert mg5.launch_features("launch @OUTPUT@\nset nevents 20000\n") == {
+        "seeds": 1,
+        "events": 20000,
+        "size": 20000,
+    }
+    launch = "#parallel_seeds 4\nlaunch @OUTPUT@\nset req_acc_FO 0.01\n"
+    assert mg5.launch_features(launch) == {
+        "seeds": 4,
+        "accuracy": 0.01,
+        "size": pytest.approx(4e4),
+    }
+    assert mg5.launch_features("launch @OUTPUT@\n") == {"seeds": 1}
+    assert mg5.launch_features("set nevents @NEVENTS@\n") == {"seeds": 1}
+
+
+def test_features(tmp_path):
+    (tmp_path / "TEST_JETS").mkdir()
+    (tmp_path / "TEST_JETS" / "launch.txt").write_text(
+        "#parallel_seeds 2\nlaunch @OUTPUT@\nset nevents 1000\n"
+    )
+    runner = mg5.Mg5.__new__(mg5.Mg5)
+    runner.name = "TEST_JETS"
+    runner.theory = {"PTO": 1}
+    runner._runcards_path = tmp_path
+    assert runner.features() == {"pto": 1, "seeds": 2, "events": 1000, "size": 2000}
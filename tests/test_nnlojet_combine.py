@@ -0,0 +1,64 @@
+import logging
+
+import numpy as np
+import pytest
+
+from pinefarm import combination
+from pinefarm.external.nnlojet import combine
+
+
+def write_seed(folder, seed, value, error, grid=True):
+    seed_dir = folder / f"seed_{seed}"
+    seed_dir.mkdir(parents=True)
+    (seed_dir / f"LO.obs.s{seed}.dat").write_text(
+        "#labels: lower[1] upper[2] tot_scale01[3] tot_scale01_Err[4]\n"
+        f"0.0 1.0 {value} {error}\n"
+        f"1.0 2.0 {2 * value} {error}\n"
+    )
+    if grid:
+        (seed_dir / f"LO.obs.s{seed}.pine").touch()
+
+
+def test_table_roundtrip(tmp_path):
+    write_seed(tmp_path, 1, 1.5, 0.1)
+    path = tmp_path / "seed_1" / "LO.obs.s1.dat"
+    table = combine.Table.load(path)
+    assert table.labels == ["lower", "upper", "tot_scale01"]
+    np.testing.assert_allclose(table.values[:, 0], [1.5, 3.0])
+
+    table.dump(tmp_path / "copy.dat")
+    copy = combine.Table.load(tmp_path / "copy.dat")
+    np.testing.assert_allclose(copy.bins, table.bins)
+    np.testing.assert_allclose(copy.errors, table.errors)
+
+
+def test_combine_seeds_incomplete(tmp_path, monkeypatch, caplog):
+    write_seed(tmp_path, 1, 1.0, 1.0)
+    write_seed(tmp_path, 2, 3.0, 1.0)
+    # crashed seed, with the table but without the grid
+    write_seed(tmp_path, 3, 100.0, 1.0, grid=False)
+
+    merged = {}
+
+    def merge_grids(paths, output, factors=None, pool=None):
+        merged["paths"] = [p.parent.name for p in paths]
+        merged["factors"] = factors
+
+    monkeypatch.setattr(combination, "merge_grids", merge_grids)
+    with caplog.at_level(logging.WARNING):
+        table = combine.combine_seeds(tmp_path, "obs", grid=tmp_path / "out")
+
+    assert "incomplete seed" in caplog.text and "seed_3" in caplog.text
+    assert merged["paths"] == ["seed_1", "seed_2"]
+    assert np.asarray(merged["factors"]).shape == (2, 2)
+    np.testing.assert_allclose(table.values[:, 0], [2.0, 4.0])
+
+    # without a grid the table is enough
+    table = combine.combine_seeds(tmp_path, "obs")
+    assert table.values.shape == (2, 1)
+
+
+def test_combine_seeds_none(tmp_path):
+    write_seed(tmp_path, 1, 1.0, 1.0, grid=False)
+    with pytest.raises(FileNotFoundError, match="No complete seed"):
+        combine.combine_seeds(tmp_path, "obs", grid=tmp_path / "out")
@@ -0,0 +1,38 @@
+from pinefarm.external.nnlojet import runner as nnlojet
+
+CARD = {
+    "runname": "TEST",
+    "process": {"proc": "Z", "sqrts": 13000},
+    "channels": {"LO": "LO", "R": "R", "V": "V", "RRa_1": "RRa", "RV": "RV"},
+    "selectors": [],
+    "histograms": [],
+}
+
+
+def runner(pto, card=CARD):
+    instance = nnlojet.NNLOJET.__new__(nnlojet.NNLOJET)
+    instance.theory = {"PTO": pto}
+    instance._yaml_dict = card
+    return instance
+
+
+def test_features():
+    defaults = nnlojet._DEFAULTS
+    events = (
+        defaults["warmup"]["events"] * defaults["warmup"]["iterations"]
+        + defaults["production"]["events"]
+        * defaults["production"]["iterations"]
+        * defaults["production"]["seeds"]
+    )
+    assert runner(0).features() == {
+        "pto": 0,
+        "channels": 1,
+        "events": events,
+        "size": events,
+    }
+    features = runner(2).features()
+    assert features["channels"] == 5
+    assert features["size"] == 5 * events
+    assert "cpu_hours" not in features
+
+    assert runner(1, dict(CARD, cpu_hours=100.0)).features()["cpu_hours"] == 100.0
@@ -0,0 +1,77 @@
+import numpy as np
+
+from pinefarm import pdftable
+
+
+class FakeInfo:
+    def __init__(self, version):
+        self.version = version
+
+    def get_entry(self, key, fallback=None):
+        return {"DataVersion": self.version}.get(key, fallback)
+
+
+class FakePDF:
+    """Analytic PDF, counting its evaluations."""
+
+    def __init__(self, version=1, scale=1.0):
+        self.version = version
+        self.scale = scale
+        self.calls = 0
+
+    def info(self):
+        return FakeInfo(self.version)
+
+    def xfxQ2(self, pid, x, q2):
+        self.calls += 1
+        return self.scale * pid * x * (1.0 - x) * np.log(q2)
+
+    def alphasQ2(self, q2):
+        return self.scale * 0.118 / np.log(q2)
+
+
+PIDS = np.array([-1, 1, 21])
+X = np.array([1e-3, 0.1, 0.5])
+Q2 = np.array([10.0, 100.0])
+
+
+def test_lookup(tmp_path):
+    pdf = FakePDF()
+    with pdftable.provided(lambda name: pdf):
+        table = pdftable.PDFTable("SET", 0, PIDS, X, Q2, cache=tmp_path)
+    tabulated = pdf.calls
+    assert tabulated == PIDS.size * X.size * Q2.size
+
+    for pid in PIDS:
+        for x in X:
+            for q2 in Q2:
+                assert table.xfxQ2(int(pid), x, q2) == pdf.xfxQ2(int(pid), x, q2)
+    for q2 in Q2:
+        assert table.alphasQ2(q2) == pdf.alphasQ2(q2)
+    pdf.calls = tabulated
+    # read from the table
+    table.xfxQ2(21, 0.1, 10.0)
+    assert pdf.calls == tabulated
+
+    # off the nodes, through the PDF itself
+    assert table.xfxQ2(2, 0.1, 10.0) == pdf.xfxQ2(2, 0.1, 10.0)
+    assert table.xfxQ2(21, 0.2, 10.0) == pdf.xfxQ2(21, 0.2, 10.0)
+    assert table.alphasQ2(50.0) == pdf.alphasQ2(50.0)
+
+
+def test_cache_version(tmp_path):
+    def table(pdf):
+        with pdftable.provided(lambda name: pdf):
+            return pdftable.PDFTable("SET", 0, PIDS, X, Q2, cache=tmp_path)
+
+    first = table(FakePDF())
+    # reused from the cache
+    same = FakePDF()
+    assert table(same).key == first.key and same.calls == 0
+
+    # the set is updated under the same name
+    updated = FakePDF(version=2, scale=2.0)
+    second = table(updated)
+    assert second.key != first.key and updated.calls > 0
+    assert second.xfxQ2(21, 0.1, 10.0) == 2 * first.xfxQ2(21, 0.1, 10.0)
+    assert len(list((tmp_path / "pdf_tables" / "SET").glob("*.alphas.npy"))) == 2
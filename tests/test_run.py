@@ -0,0 +1,43 @@
+import types
+
+import click
+import pytest
+
+from pinefarm.cli import run
+
+
+@pytest.fixture
+def fake_sweep(monkeypatch, tmp_path):
+    """Sweep with fake runners, failing for the theory ID 2."""
+
+    def build_runner(pinecard, theory, pdf):
+        dest = tmp_path / f"{theory['ID']}-{pinecard}"
+        return types.SimpleNamespace(
+            name=pinecard, dest=dest, prepare_shared=lambda shared: None
+        )
+
+    def run_dataset(runner, **kwargs):
+        if runner.dest.name.startswith("2-"):
+            raise RuntimeError("failed")
+        runner.dest.mkdir()
+
+    monkeypatch.setattr(run, "load_theory", lambda path: {"ID": path})
+    monkeypatch.setattr(run, "build_runner", build_runner)
+    monkeypatch.setattr(run, "install_reqs", lambda runner, pdf: None)
+    monkeypatch.setattr(run, "prepare", lambda runner, dry, shared: True)
+    monkeypatch.setattr(run, "run_dataset", run_dataset)
+    monkeypatch.setattr(run.history, "predict", lambda runner: None)
+
+
+def test_sweep(fake_sweep, tmp_path):
+    runners = run.sweep("card", [1, 3], "pdf", force=True, jobs=2)
+    assert sorted(runners) == [1, 3]
+    assert (tmp_path / "1-card").is_dir()
+
+
+def test_sweep_failure(fake_sweep, tmp_path):
+    with pytest.raises(click.ClickException, match="1 of 3 theories failed: 2"):
+        run.sweep("card", [1, 2, 3], "pdf", force=True, jobs=2)
+    # the other theories are completed anyway
+    assert (tmp_path / "1-card").is_dir()
+    assert (tmp_path / "3-card").is_dir()
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from pinefarm import slimming
+
+pineappl = pytest.importorskip("pineappl")
+
+PIDS = [21, 1, -1, 2, -2, 3, -3, 4, -4, 5, -5]
+
+
+class FakePDF:
+    """Constant PDF, suppressing the quarks with respect to the gluon."""
+
+    def xfxQ2(self, pid, x, q2):
+        weight = 1.0 if pid == 21 else 0.06
+        return weight * np.ones_like(np.asarray(x, dtype=float))
+
+    def alphasQ2(self, q2):
+        return 0.118 * np.ones_like(np.asarray(q2, dtype=float))
+
+
+def grid_with_channels(pids):
+    """Single-bin grid, with an identical subgrid for each channel."""
+    interp = pineappl.interpolation
+    grid = pineappl.grid.Grid(
+        pid_basis=pineappl.pids.PidBasis.Pdg,
+        channels=[pineappl.boc.Channel([([pid, pid], 1.0)]) for pid in pids],
+        orders=[pineappl.boc.Order(0, 0, 0, 0, 0)],
+        bins=pineappl.boc.BinsWithFillLimits.from_fill_limits(fill_limits=[0.0, 1.0]),
+        convolutions=[
+            pineappl.convolutions.Conv(
+                convolution_types=pineappl.convolutions.ConvType(
+                    polarized=False, time_like=False
+                ),
+                pid=2212,
+            )
+        ]
+        * 2,
+        interpolations=[
+            interp.Interp(
+                min=10,
+                max=1e3,
+                nodes=50,
+                order=3,
+                reweight_meth=interp.ReweightingMethod.NoReweight,
+                map=interp.MappingMethod.ApplGridH0,
+                interpolation_meth=interp.InterpolationMethod.Lagrange,
+            )
+        ]
+        + [
+            interp.Interp(
+                min=1e-5,
+                max=1,
+                nodes=40,
+                order=3,
+                reweight_meth=interp.ReweightingMethod.ApplGridX,
+                map=interp.MappingMethod.ApplGridF2,
+                interpolation_meth=interp.InterpolationMethod.Lagrange,
+            )
+        ]
+        * 2,
+        kinematics=[
+            pineappl.boc.Kinematics.Scale(0),
+            pineappl.boc.Kinematics.X(0),
+            pineappl.boc.Kinematics.X(1),
+        ],
+        scale_funcs=pineappl.boc.Scales(
+            ren=pineappl.boc.ScaleFuncForm.Scale(0),
+            fac=pineappl.boc.ScaleFuncForm.Scale(0),
+            frg=pineappl.boc.ScaleFuncForm.NoScale(0),
+        ),
+    )
+    x = np.array([0.1, 0.2])
+    for channel in range(len(pids)):
+        subgrid = pineappl.subgrid.ImportSubgridV1(
+            array=np.ones((1, 2, 2)), node_values=[[100.0], x, x]
+        )
+        grid.set_subgrid(0, 0, channel, subgrid.into())
+    return grid
+
+
+def test_negligible_combined():
+    grid = grid_with_channels(PIDS)
+    pdf = FakePDF()
+    total = slimming._convolve(grid, pdf)
+    # each quark channel is below the threshold, but not all of them together
+    quark = 0.06**2 / (1.0 + 10 * 0.06**2)
+    threshold = 0.01
+    assert quark < threshold < 10 * quark
+
+    channels, orders = slimming.negligible(grid, pdf, threshold)
+    assert orders == []
+    assert 0 not in channels
+    assert len(channels) == int(threshold / quark)
+
+    keep = np.ones(len(PIDS), dtype=bool)
+    keep[channels] = False
+    slimmed = slimming._convolve(grid, pdf, channel_mask=keep)
+    np.testing.assert_array_less(np.abs(total - slimmed), threshold * np.abs(total))
+
+
+def test_negligible_single():
+    # a channel alone below the threshold is still removed
+    grid = grid_with_channels(PIDS[:2])
+    channels, orders = slimming.negligible(grid, FakePDF(), 0.01)
+    assert channels == [1] and orders == []
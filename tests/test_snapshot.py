@@ -0,0 +1,123 @@
+import os
+import platform
+import tarfile
+
+import pytest
+
+from pinefarm import configs, snapshot
+
+
+def set_paths(monkeypatch, root):
+    paths = configs.paths(configs.basic_paths(root))
+    monkeypatch.setattr(
+        snapshot.configs,
+        "configs",
+        {"paths": paths, "commands": configs.commands(paths)},
+    )
+    return paths
+
+
+@pytest.fixture
+def prefix(monkeypatch, tmp_path):
+    return set_paths(monkeypatch, tmp_path)
+
+
+def install(path, content=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def test_programs(prefix):
+    assert snapshot.programs() == {}
+
+    pkgconfig = prefix["lib"] / "pkgconfig"
+    install(pkgconfig / "lhapdf.pc", "Name: LHAPDF\nVersion: 6.5.3\n")
+    install(pkgconfig / "pineappl_capi.pc", "Version: 1.0.0\n")
+    install(prefix["mg5amc"] / "bin" / "mg5_aMC")
+    install(prefix["mg5amc"] / "VERSION", "version = 3.5.2\ndate = 2023-10-26\n")
+    install(prefix["bin"] / "Vrap")
+    assert snapshot.programs() == {
+        "lhapdf": "6.5.3",
+        "pineappl": "1.0.0",
+        "mg5amc": "3.5.2",
+        "vrap": snapshot.UNKNOWN,
+    }
+
+    install(snapshot.install.vrap_version_file(), "version = 1.5\n")
+    assert snapshot.programs()["vrap"] == "1.5"
+
+
+def test_problems(prefix):
+    manifest = {
+        "prefix": str(prefix["prefix"].absolute()),
+        "python": snapshot._python(),
+        "machine": platform.machine(),
+        "versions": snapshot.expected(),
+    }
+    assert snapshot.problems(manifest, prefix["prefix"]) == []
+
+    manifest["versions"] = dict(manifest["versions"], lhapdf="6.5.3")
+    (problem,) = snapshot.problems(manifest, prefix["prefix"])
+    assert problem.startswith("lhapdf 6.5.3 in the snapshot, expected")
+
+
+def use_prefix(monkeypatch, root):
+    return set_paths(monkeypatch, root)["prefix"].absolute()
+
+
+def test_roundtrip(monkeypatch, tmp_path):
+    old = use_prefix(monkeypatch, tmp_path / "first")
+    install(old / "bin" / "lhapdf-config", f"#!/bin/sh\necho {old}/include\n")
+    install(old / "share" / "data.txt", "no reference\n")
+    (old / "lib").mkdir()
+    (old / "lib" / "libfake.so").write_bytes(b"\0\1" + str(old).encode() + b"\0")
+    (old / "lib" / "libfake.so.1").symlink_to("libfake.so")
+    (old / "share" / "link").symlink_to(old / "share" / "data.txt")
+    install(old / "cache" / "tmp.txt", "not exported\n")
+
+    archive = tmp_path / "snapshot.tar.gz"
+    manifest = snapshot.dump(archive)
+    assert manifest["relocate"] == ["bin/lhapdf-config"]
+    assert manifest["binaries"] == ["lib/libfake.so"]
+    assert "cache/tmp.txt" not in manifest["files"]
+
+    new = use_prefix(monkeypatch, tmp_path / "second")
+    imported = snapshot.load(archive)
+    assert imported["prefix"] == str(new)
+    assert imported["exported_from"] == str(old)
+    assert (new / "bin" / "lhapdf-config").read_text() == (
+        f"#!/bin/sh\necho {new}/include\n"
+    )
+    assert (new / "share" / "data.txt").read_text() == "no reference\n"
+    # binaries are left untouched
+    assert (new / "lib" / "libfake.so").read_bytes() == (
+        old / "lib" / "libfake.so"
+    ).read_bytes()
+    # absolute links point into the new prefix, relative ones are kept
+    assert os.readlink(new / "share" / "link") == str(new / "share" / "data.txt")
+    assert os.readlink(new / "lib" / "libfake.so.1") == "libfake.so"
+    assert not (new / "cache" / "tmp.txt").exists()
+    assert snapshot.problems(imported, new) == []
+
+
+def test_load_altered(monkeypatch, tmp_path):
+    old = use_prefix(monkeypatch, tmp_path / "first")
+    install(old / "share" / "data.txt", "original\n")
+    archive = tmp_path / "snapshot.tar.gz"
+    snapshot.dump(archive)
+
+    # alter a file, keeping the original manifest
+    unpacked = tmp_path / "unpacked"
+    with tarfile.open(archive) as tar:
+        tar.extractall(unpacked)
+    (unpacked / "share" / "data.txt").write_text("altered\n")
+    with tarfile.open(archive, "w:gz") as tar:
+        for entry in sorted(unpacked.iterdir()):
+            tar.add(entry, arcname=entry.name)
+
+    new = use_prefix(monkeypatch, tmp_path / "second")
+    install(new / "share" / "data.txt", "existing\n")
+    with pytest.raises(ValueError, match="1 files altered or missing: share/data.txt"):
+        snapshot.load(archive)
+    # the prefix is left untouched
+    assert (new / "share" / "data.txt").read_text() == "existing\n"
@@ -0,0 +1,54 @@
+import types
+
+import yaml
+
+from pinefarm import stages
+
+HASHES = {"generate": "g", "annotate": "a", "postprocess": "p"}
+
+
+def previous_run(results):
+    """A completed run, with a subfolder and the snapshots of its grids."""
+    previous = results / "1-card-20260101000000"
+    (previous / "process").mkdir(parents=True)
+    (previous / "process" / "events.dat").write_text("previous")
+    (previous / "card.pineappl.lz4").write_text("final")
+    snapshot = previous / stages.SNAPSHOTS / "annotate"
+    snapshot.mkdir(parents=True)
+    (snapshot / "card.pineappl.lz4").write_text("annotated")
+    (previous / stages.MANIFEST).write_text(yaml.safe_dump(HASHES))
+    return previous
+
+
+def runner(results):
+    dest = results / "1-card-20260102000000"
+    dest.mkdir()
+    return types.SimpleNamespace(dest=dest, name="card", theory={"ID": 1})
+
+
+def test_reuse_copies(tmp_path):
+    previous = previous_run(tmp_path)
+    new = runner(tmp_path)
+
+    done = stages.reuse(new, dict(HASHES, postprocess="changed"))
+    assert done == ("generate", "annotate")
+    assert (new.dest / "card.pineappl.lz4").read_text() == "annotated"
+
+    # the postprocessing must not alter the previous run
+    events = new.dest / "process" / "events.dat"
+    assert events.stat().st_ino != (previous / "process" / "events.dat").stat().st_ino
+    events.write_text("rewritten")
+    assert (previous / "process" / "events.dat").read_text() == "previous"
+
+
+def test_reuse_final(tmp_path):
+    previous = previous_run(tmp_path)
+    new = runner(tmp_path)
+
+    assert stages.reuse(new, HASHES) == tuple(HASHES)
+    assert (new.dest / "card.pineappl.lz4").read_text() == "final"
+    assert stages.load(new.dest) == HASHES
+    # nothing is modified any longer, the subfolders can be shared
+    assert (new.dest / "process" / "events.dat").samefile(
+        previous / "process" / "events.dat"
+    )
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from pinefarm import history, workqueue
+
+
+def test_lease_longest_first(tmp_path):
+    coordinator = workqueue.Coordinator(tmp_path / "queue.sqlite")
+    estimates = {"short": 10.0, "long": 1000.0, "unknown": None, "medium": 100.0}
+    coordinator.submit(
+        [
+            {"pinecard": name, "theory": {"ID": 1}, "pdf": "pdf", "estimate": value}
+            for name, value in estimates.items()
+        ]
+        + [{"pinecard": "unestimated", "theory": {"ID": 1}, "pdf": "pdf"}]
+    )
+
+    leased = []
+    while (job := coordinator.lease("worker")["job"]) is not None:
+        leased.append(job["pinecard"])
+    assert leased == ["unknown", "unestimated", "long", "medium", "short"]
+
+
+def test_old_database(tmp_path):
+    database = tmp_path / "queue.sqlite"
+    with sqlite3.connect(database) as conn:
+        conn.execute(workqueue.SCHEMA.replace("    estimate REAL,\n", ""))
+        conn.execute(
+            "INSERT INTO jobs (pinecard, theory, pdf, submitted) "
+            "VALUES ('card', '{}', 'pdf', 0.0)"
+        )
+    conn.close()
+
+    coordinator = workqueue.Coordinator(database)
+    coordinator.submit(
+        [{"pinecard": "long", "theory": {}, "pdf": "pdf", "estimate": 1.0}]
+    )
+    assert coordinator.lease("worker")["job"]["pinecard"] == "card"
+    assert coordinator.lease("worker")["job"]["pinecard"] == "long"
+
+
+def test_cost(monkeypatch, tmp_path):
+    path = tmp_path / "history.sqlite"
+    monkeypatch.setattr(history, "database", lambda: path)
+    assert history.cost("dataset") is None
+
+    with history.connect() as conn:
+        for stage, wall, cores in [
+            ("generate", 10.0, 4),
+            ("generate", 30.0, 4),
+            ("generate", 50.0, 4),
+            ("postprocess", 5.0, 1),
+        ]:
+            conn.execute(
+                "INSERT INTO stages (dataset, runner, stage, wall, cores, features, "
+                "grids, timestamp) VALUES ('dataset', 'Yadism', ?, ?, ?, '{}', '{}', 0)",
+                (stage, wall, cores),
+            )
+    assert history.cost("dataset") == 125.0
+    assert history.cost("other") is None
+
+
+@pytest.fixture
+def server(tmp_path):
+    coordinator = workqueue.Coordinator(tmp_path / "queue.sqlite", lease=0.5)
+    with workqueue.Server(coordinator, "127.0.0.1:0") as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        yield f"{host}:{port}"
+        server.shutdown()
+        thread.join()
+
+
+def test_workers(server, tmp_path):
+    jobs = [
+        {"pinecard": f"card{i}", "theory": {"ID": 400 + i}, "pdf": "pdf"}
+        for i in range(6)
+    ]
+    ids = workqueue.request(server, "submit", jobs=jobs)["ids"]
+
+    # a worker dying without heartbeats
+    lost = workqueue.request(server, "lease", worker="lost")["job"]
+    time.sleep(0.6)
+
+    def execute(job):
+        time.sleep(0.05)
+        dest = tmp_path / f"{job['theory']['ID']}-{job['pinecard']}"
+        return "done", {"generate": 0.05}, str(dest)
+
+    workers = [
+        workqueue.Worker(server, name=f"worker{i}", poll=0.01, execute=execute)
+        for i in range(3)
+    ]
+    processed = []
+    threads = [
+        threading.Thread(target=lambda w=w: processed.append(w.run(drain=True)))
+        for w in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(processed) == len(jobs)
+
+    # the outcome of the expired lease is discarded
+    late = workqueue.request(
+        server,
+        "complete",
+        job=lost["id"],
+        worker="lost",
+        attempt=lost["attempt"],
+        status="done",
+    )
+    assert not late["ok"]
+
+    status = {job["id"]: job for job in workqueue.request(server, "status")["jobs"]}
+    assert sorted(status) == ids
+    for job in status.values():
+        assert job["status"] == "done"
+        assert job["worker"] in {w.name for w in workers}
+        assert job["timings"]["generate"] == 0.05
+        assert job["timings"]["total"] >= 0.05
+        assert job["output"] == str(tmp_path / f"{job['theory']}-{job['pinecard']}")
+    assert status[lost["id"]]["attempts"] == 2
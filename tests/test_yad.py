@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from pinefarm import pdftable, tools
+from pinefarm.external import yad
+
+THEORY = """\
+CKM: 0.97428 0.22530 0.003470 0.22520 0.97345 0.041000 0.00862 0.04030 0.999152
+DAMP: 0
+EScaleVar: 1
+FNS: ZM-VFNS
+GF: 1.1663787e-05
+HQ: POLE
+IB: 0
+IC: 1
+ID: 200
+MP: 0.938
+MW: 80.398
+MZ: 91.1876
+MaxNfAs: 5
+MaxNfPdf: 5
+ModEv: TRN
+ModSV: expanded
+NfFF: 4
+PTO: 0
+Q0: 1.65
+QED: 0
+Qedref: 1.777
+Qmb: 4.92
+Qmc: 1.51
+Qmt: 172.5
+Qref: 91.2
+SIN2TW: 0.23126
+SxOrd: LL
+SxRes: 0
+TMC: 1
+XIF: 1.0
+XIR: 1.0
+alphaqed: 0.007496252
+alphas: 0.118
+fact_to_ren_scale_ratio: 1.0
+global_nx: 0
+kDISbThr: 1.0
+kDIScThr: 1.0
+kDIStThr: 1.0
+kbThr: 1.0
+kcThr: 1.0
+ktThr: 1.0
+mb: 4.92
+mc: 1.51
+mt: 172.5
+n3lo_cf_variation: 0
+nf0: null
+nfref: null
+"""
+
+OBSERVABLE = {
+    "NCPositivityCharge": None,
+    "PolarizationDIS": 0.0,
+    "ProjectileDIS": "electron",
+    "PropagatorCorrection": 0.0,
+    "TargetDIS": "proton",
+    "interpolation_is_log": True,
+    "interpolation_polynomial_degree": 4,
+    "interpolation_xgrid": [1e-4, 1e-3, 1e-2, 0.05, 0.1, 0.2, 0.4, 0.6, 0.8, 1.0],
+    "observables": {
+        "F2_total": [
+            {"Q2": q2, "x": x, "y": 0.5} for q2 in (10.0, 20.0) for x in (0.01, 0.1)
+        ],
+        "FL_total": [
+            {"Q2": 20.0, "x": 0.05, "y": 0.5},
+            {"Q2": 10.0, "x": 0.2, "y": 0.5},
+        ],
+    },
+    "prDIS": "EM",
+}
+
+
+@pytest.fixture
+def runner(tmp_path):
+    def build():
+        pinecard = tmp_path / "runcards" / "DIS"
+        pinecard.mkdir(parents=True, exist_ok=True)
+        (pinecard / "observable.yaml").write_text(yaml.safe_dump(OBSERVABLE))
+        dest = tmp_path / "200-DIS-20260101000000"
+        dest.mkdir(exist_ok=True)
+        return yad.Yadism(
+            "DIS",
+            yaml.safe_load(THEORY),
+            "PDF",
+            runcards_path=tmp_path / "runcards",
+            output_folder=dest,
+        )
+
+    return build
+
+
+def test_archive_failure(runner):
+    yadism = runner()
+    yadism._out = type("Output", (), {})()
+
+    def dump_tar(path):
+        path.write_text("partial")
+        raise OSError("disk full")
+
+    yadism._out.dump_tar = dump_tar
+    yadism.archive()
+    with pytest.raises(OSError, match="disk full"):
+        yadism.wait_archive()
+    # no incomplete archive left to be loaded
+    assert not yadism.output.exists()
+    yadism.wait_archive()
+
+
+def test_out_not_archived(runner, monkeypatch):
+    # e.g. reusing the generation of a run, with the archive disabled
+    yadism = runner()
+    monkeypatch.setattr(yadism, "compute", lambda: "computed")
+    assert yadism.out == "computed"
+
+
+def test_shards():
+    kinematics = OBSERVABLE["observables"]
+    parts = yad.shards(kinematics, 3)
+    # every point in exactly one shard, same scales together
+    for name, points in kinematics.items():
+        indices = sorted(i for part in parts for i in part.get(name, []))
+        assert indices == list(range(len(points)))
+        for part in parts:
+            scales = {points[i]["Q2"] for i in part.get(name, [])}
+            assert all(
+                points[i]["Q2"] not in scales
+                for other in parts
+                if other is not part
+                for i in other.get(name, [])
+            )
+
+
+def test_compute_sharded(runner, monkeypatch):
+    outputs = []
+    for cores in (1, 2):
+        monkeypatch.setattr(yad.configs, "configs", {"resources": {"cores": cores}})
+        outputs.append(runner().compute())
+
+    serial, sharded = outputs
+    for name, points in OBSERVABLE["observables"].items():
+        assert len(sharded[name]) == len(points)
+        for point, first, second in zip(points, serial[name], sharded[name]):
+            assert (second.x, second.Q2) == (point["x"], point["Q2"])
+            assert first.orders.keys() == second.orders.keys()
+            for order, (values, errors) in first.orders.items():
+                np.testing.assert_array_equal(second.orders[order][0], values)
+                np.testing.assert_array_equal(second.orders[order][1], errors)
+
+
+def test_observable_results_applied_once(runner, monkeypatch):
+    yadism = runner()
+
+    class Applied:
+        def __init__(self, xir, xif):
+            self.tables = {
+                name: pd.DataFrame(
+                    {
+                        "x": [0.01, 0.1],
+                        "result": [xir * xif * scale, 2.0 * xir * xif * scale],
+                        "error": [0.0, 0.0],
+                    }
+                )
+                for name, scale in (("F2_total", 1.0), ("FL_total", 0.1))
+            }
+
+    class Output:
+        applications = 0
+
+        def apply_pdf_alphas_alphaqed_xir_xif(self, pdf, alphas, alphaqed, xir, xif):
+            self.applications += 1
+            return Applied(xir, xif)
+
+    yadism._out = Output()
+    pdf = type("PDF", (), {"alphasQ": staticmethod(lambda q: 0.118)})()
+    with pdftable.provided(lambda name: pdf):
+        results = {name: yadism.observable_results(name) for name in yadism.grids}
+    # once for the central value, and once for each scale variation
+    assert yadism._out.applications == 1 + len(tools.nine_points)
+
+    np.testing.assert_allclose(results["FL_total"]["result"], [0.1, 0.2])
+    np.testing.assert_allclose(results["F2_total"]["sv_max"], [4.0, 8.0])
+    np.testing.assert_allclose(results["F2_total"]["sv_min"], [0.25, 0.5])
+    # the cached tables are left untouched
+    assert "sv_max" not in yadism.applied()[0].tables["F2_total"]